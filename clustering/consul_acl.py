@@ -69,6 +69,17 @@ options:
           - the port on which the consul agent is running
         required: false
         default: 8500
+    tokens:
+        description:
+          - a list of acl tokens to reconcile in a single task. Each entry is a
+            dict with a C(name), an optional list of C(rules), an optional
+            C(token_type) and an optional C(state) (present or absent). All
+            existing tokens are fetched with one listing and indexed by name;
+            only tokens whose type or rules differ are updated. When supplied,
+            the name, token, rules and token_type options are ignored.
+        required: false
+        default: None
+        version_added: "2.0"
 """
 
 EXAMPLES = '''
@@ -89,6 +100,22 @@ EXAMPLES = '''
         host: 'consul1.mycluster.io'
         token: '172bd5c8-9fe9-11e4-b1b0-3c15c2c9fd5e'
         state: absent
+
+    - name: reconcile a set of acl tokens in one pass
+      consul_acl:
+        mgmt_token: 'some_management_acl'
+        host: 'consul1.mycluster.io'
+        tokens:
+          - name: 'Foo access'
+            rules:
+              - key: 'foo'
+                policy: read
+          - name: 'Bar access'
+            rules:
+              - key: 'bar'
+                policy: write
+          - name: 'Old access'
+            state: absent
 '''
 
 import sys
@@ -113,7 +140,9 @@ def execute(module):
 
     state = module.params.get('state')
 
-    if state == 'present':
+    if module.params.get('tokens') is not None:
+        reconcile_acls(module)
+    elif state == 'present':
         update_acl(module)
     else:
         remove_acl(module)
@@ -183,23 +212,99 @@ def remove_acl(module):
     module.exit_json(changed=changed, token=token)
 
 
+def reconcile_acls(module):
+    mgmt = module.params.get('mgmt_token')
+    consul = get_consul_api(module, mgmt)
+
+    desired = {}
+    for entry in module.params.get('tokens'):
+        if not isinstance(entry, dict) or not entry.get('name'):
+            module.fail_json(msg="each entry in tokens requires a name")
+        if entry['name'] in desired:
+            module.fail_json(msg="duplicate token name %s" % entry['name'])
+        desired[entry['name']] = entry
+
+    try:
+        existing = index_tokens_by_name(consul.acl.list())
+    except Exception, e:
+        module.fail_json(msg="Could not list acl tokens %s" % e)
+
+    # tokens frequently share a rule set, so each distinct rules string is
+    # parsed at most once per run.
+    parsed = {}
+    created, updated, removed, unchanged = [], [], [], []
+
+    try:
+        for name, entry in desired.iteritems():
+            current = existing.get(name)
+            if entry.get('state', 'present') == 'absent':
+                if current:
+                    consul.acl.destroy(current['ID'])
+                    removed.append(name)
+                continue
+
+            token_type = entry.get('token_type', 'client')
+            supplied_rules = yml_to_rules(module, entry.get('rules'))
+            if not current:
+                rules = None
+                if supplied_rules.are_rules():
+                    rules = supplied_rules.to_hcl()
+                consul.acl.create(name=name, type=token_type, rules=rules)
+                created.append(name)
+                continue
+
+            current_rules = current.get('Rules') or ''
+            if current_rules not in parsed:
+                parsed[current_rules] = parse_hcl_rules(current_rules)
+
+            if (current.get('Type') == token_type and
+                    parsed[current_rules] == supplied_rules):
+                unchanged.append(name)
+            else:
+                consul.acl.update(current['ID'],
+                                  name=name,
+                                  type=token_type,
+                                  rules=supplied_rules.to_hcl())
+                updated.append(name)
+    except Exception, e:
+        module.fail_json(msg="Could not reconcile acl tokens %s" % e)
+
+    module.exit_json(changed=bool(created or updated or removed),
+                     created=sorted(created),
+                     updated=sorted(updated),
+                     removed=sorted(removed),
+                     unchanged=sorted(unchanged))
+
+
+def index_tokens_by_name(tokens):
+    index = {}
+    for token in tokens or []:
+        name = token.get('Name')
+        if name and name not in index:
+            index[name] = token
+    return index
+
+
+def parse_hcl_rules(rule_set):
+    rules = Rules()
+    if rule_set:
+        for rule in hcl.loads(to_ascii(rule_set)).values():
+            for key, policy in rule.iteritems():
+                rules.add_rule(Rule(key, policy['policy']))
+    return rules
+
+
 def load_rules_for_token(module, consul_api, token):
     try:
-        rules = Rules()
         info = consul_api.acl.info(token)
         if info and info['Rules']:
-            rule_set = to_ascii(info['Rules'])
-            for rule in hcl.loads(rule_set).values():
-                for key, policy in rule.iteritems():
-                    rules.add_rule(Rule(key, policy['policy']))
-        return rules
+            return parse_hcl_rules(info['Rules'])
+        return Rules()
     except Exception, e:
         module.fail_json(
             msg="Could not load rule list from retrieved rule data %s, %s" % (
                     token, e))
 
-    return json_to_rules(module, loaded)
-
 def to_ascii(unicode_string):
     if isinstance(unicode_string, unicode):
         return unicode_string.encode('ascii', 'ignore')
@@ -238,24 +343,23 @@ class Rules:
     def to_hcl(self):
 
         rules = ""
-        for key, rule in self.rules.iteritems():
-            rules += template % (key, rule.policy)
+        for key in sorted(self.rules):
+            rules += template % (key, self.rules[key].policy)
 
         return to_ascii(rules)
 
+    def canonical(self):
+        return frozenset(self.rules.itervalues())
+
     def __eq__(self, other):
-        if not (other or isinstance(other, self.__class__)
-                or len(other.rules) == len(self.rules)):
-            return False
+        return (isinstance(other, self.__class__)
+                and self.canonical() == other.canonical())
 
-        for name, other_rule in other.rules.iteritems():
-            if not name in self.rules:
-                return False
-            rule = self.rules[name]
+    def __ne__(self, other):
+        return not self == other
 
-            if not (rule and rule == other_rule):
-                return False
-        return True
+    def __hash__(self):
+        return hash(self.canonical())
 
     def __str__(self):
         return self.to_hcl()
@@ -270,6 +374,10 @@ class Rule:
         return (isinstance(other, self.__class__)
                 and self.key == other.key
                 and self.policy == other.policy)
+
+    def __ne__(self, other):
+        return not self == other
+
     def __hash__(self):
         return hash(self.key) ^ hash(self.policy)
 
@@ -301,6 +409,7 @@ def main():
         rules=dict(default=None, required=False, type='list'),
         state=dict(default='present', choices=['present', 'absent']),
         token=dict(required=False),
+        tokens=dict(default=None, required=False, type='list'),
         token_type=dict(
             required=False, choices=['client', 'management'], default='client')
     )
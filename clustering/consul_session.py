@@ -40,9 +40,12 @@ options:
             required to remove the session. Info for a single session, all the
             sessions for a node or all available sessions can be retrieved by
             specifying info, node or list for the state; for node or info, the
-            node name or session id is required as parameter.
+            node name or session id is required as parameter. Specifying renew
+            keeps the sessions given by id or ids alive for renew_for seconds,
+            renewing each one at half of its TTL; run it with async for long
+            lived locks.
         required: false
-        choices: ['present', 'absent', 'info', 'node', 'list']
+        choices: ['present', 'absent', 'info', 'node', 'list', 'renew']
         default: present
     name:
         description:
@@ -78,6 +81,31 @@ options:
             the associated lock delay has expired.
         required: false
         default: None
+    ttl:
+        description:
+          - the optional TTL in seconds attached to the session when it is
+            created. A session with a TTL is invalidated unless it is renewed
+            before the TTL expires, see state=renew.
+        required: false
+        default: None
+        version_added: "2.0"
+    ids:
+        description:
+          - a list of session ids to keep alive when state is renew. May be
+            combined with id.
+        required: false
+        default: None
+        version_added: "2.0"
+    renew_for:
+        description:
+          - the number of seconds the sessions are kept alive for when state
+            is renew. Sessions are renewed every TTL/2 over a single
+            connection to the agent; any session that is found to be invalid
+            is dropped and reported as expired. The task only reports a change
+            when at least one session was actually renewed.
+        required: false
+        default: 60
+        version_added: "2.0"
     host:
         description:
           - host of the consul agent defaults to localhost
@@ -111,13 +139,29 @@ EXAMPLES = '''
 
 - name: retrieve active sessions
   consul_session: state=list
+
+- name: register a session with a short ttl
+  consul_session:
+    name: short_lived_lock
+    ttl: 10
+  register: lock_session
+
+- name: keep the session alive for an hour in the background
+  consul_session:
+    id: "{{ lock_session.session_id }}"
+    state: renew
+    renew_for: 3600
+  async: 3700
+  poll: 0
 '''
 
 import sys
+import time
 import urllib2
 
 try:
     import consul
+    from consul import NotFound
     from requests.exceptions import ConnectionError
     python_consul_installed = True
 except ImportError, e:
@@ -129,6 +173,8 @@ def execute(module):
 
     if state in ['info', 'list', 'node']:
         lookup_sessions(module)
+    elif state == 'renew':
+        renew_sessions(module)
     elif state == 'present':
         update_session(module)
     else:
@@ -180,25 +226,33 @@ def update_session(module):
     checks = module.params.get('checks')
     datacenter = module.params.get('datacenter')
     node = module.params.get('node')
+    ttl = module.params.get('ttl')
 
     consul = get_consul_api(module)
     changed = True
 
     try:
-        
+        # only pass ttl when requested so older python-consul releases that
+        # do not know the argument keep working
+        extra = {}
+        if ttl:
+            extra['ttl'] = ttl
+
         session = consul.session.create(
             name=name,
             node=node,
             lock_delay=validate_duration('delay', delay),
             dc=datacenter,
-            checks=checks
+            checks=checks,
+            **extra
         )
         module.exit_json(changed=True,
                          session_id=session,
                          name=name,
                          delay=delay,
                          checks=checks,
-                         node=node)
+                         node=node,
+                         ttl=ttl)
     except Exception, e:
         module.fail_json(msg="Could not create/update session %s" % e)
 
@@ -222,6 +276,145 @@ def remove_session(module):
         module.fail_json(msg="Could not remove session with id '%s' %s" % (
                          session_id, e))
 
+def renew_sessions(module):
+    datacenter = module.params.get('datacenter')
+    renew_for = module.params.get('renew_for')
+
+    session_ids = list(module.params.get('ids') or [])
+    if module.params.get('id') and module.params.get('id') not in session_ids:
+        session_ids.append(module.params.get('id'))
+    if not session_ids:
+        module.fail_json(msg="an id or a list of ids is required to renew sessions")
+
+    # a single client is shared by every renewal so the underlying http
+    # connection to the agent is kept alive between requests
+    consul = get_consul_api(module)
+    wheel = TimerWheel()
+    stats = {}
+    expired = []
+
+    try:
+        for session_id in session_ids:
+            info = consul.session.info(session_id, dc=datacenter)
+            if info and isinstance(info, tuple):
+                info = info[1]
+            if not info:
+                expired.append(session_id)
+                continue
+            ttl = duration_to_seconds(info.get('TTL'))
+            if not ttl:
+                module.fail_json(
+                    msg="session '%s' has no TTL and does not need renewing" %
+                        session_id)
+            stats[session_id] = dict(ttl=ttl, renewals=0, latencies=[])
+            wheel.schedule(session_id, ttl / 2.0)
+
+        deadline = time.time() + renew_for
+        while len(wheel) and time.time() < deadline:
+            for session_id in wheel.advance(min(wheel.tick, deadline - time.time())):
+                start = time.time()
+                session_stats = stats[session_id]
+                try:
+                    renewed = consul.session.renew(session_id, dc=datacenter)
+                except NotFound:
+                    # the session was invalidated since the last renewal
+                    session_stats['latencies'].append(time.time() - start)
+                    expired.append(session_id)
+                    continue
+                session_stats['latencies'].append(time.time() - start)
+                session_stats['renewals'] += 1
+                ttl = duration_to_seconds((renewed or {}).get('TTL'))
+                if ttl:
+                    session_stats['ttl'] = ttl
+                wheel.schedule(session_id, session_stats['ttl'] / 2.0)
+    except Exception, e:
+        module.fail_json(msg="Could not renew sessions %s" % e)
+
+    renewals = {}
+    for session_id, session_stats in stats.iteritems():
+        latencies = session_stats.pop('latencies')
+        if latencies:
+            session_stats['latency_min'] = min(latencies)
+            session_stats['latency_max'] = max(latencies)
+            session_stats['latency_avg'] = sum(latencies) / len(latencies)
+        renewals[session_id] = session_stats
+
+    changed = sum([session_stats['renewals'] for session_stats in renewals.values()]) > 0
+    module.exit_json(changed=changed,
+                     sessions=renewals,
+                     expired=expired)
+
+
+class TimerWheel(object):
+    """
+    A hashed timer wheel; each slot covers one tick and timers that are
+    further away than a full revolution carry the number of remaining
+    rounds. Scheduling and expiry are O(1) per timer regardless of how many
+    sessions are being renewed.
+    """
+
+    def __init__(self, tick=0.5, slots=512):
+        self.tick = tick
+        self.slots = [[] for i in range(slots)]
+        self.position = 0
+        self.count = 0
+        self.started = time.time()
+        self.ticks = 0
+
+    def __len__(self):
+        return self.count
+
+    def schedule(self, item, delay):
+        ticks = max(1, int(round(delay / self.tick)))
+        slot = (self.position + ticks) % len(self.slots)
+        rounds = (ticks - 1) // len(self.slots)
+        self.slots[slot].append([rounds, item])
+        self.count += 1
+
+    def advance(self, max_wait):
+        """
+        Sleep until the next tick is due (at most max_wait seconds) and return
+        the items whose timers expired in it.
+        """
+        due = self.started + (self.ticks + 1) * self.tick
+        wait = due - time.time()
+        if wait > max_wait:
+            time.sleep(max(0, max_wait))
+            return []
+        if wait > 0:
+            time.sleep(wait)
+
+        self.ticks += 1
+        self.position = (self.position + 1) % len(self.slots)
+        expired, pending = [], []
+        for timer in self.slots[self.position]:
+            if timer[0] > 0:
+                timer[0] -= 1
+                pending.append(timer)
+            else:
+                expired.append(timer[1])
+        self.slots[self.position] = pending
+        self.count -= len(expired)
+        return expired
+
+
+def duration_to_seconds(duration):
+    if not duration:
+        return None
+    units = [('ns', 1e-9), ('us', 1e-6), ('ms', 1e-3),
+             ('s', 1), ('m', 60), ('h', 3600)]
+    for suffix, multiplier in units:
+        if duration.endswith(suffix) and duration[:-len(suffix)]:
+            try:
+                return float(duration[:-len(suffix)]) * multiplier
+            except ValueError:
+                continue
+    try:
+        return float(duration)
+    except ValueError:
+        return None
+
+
 def validate_duration(name, duration):
     if duration:
         duration_units = ['ns', 'us', 'ms', 's', 'm', 'h']
@@ -246,10 +439,14 @@ def main():
         host=dict(default='localhost'),
         port=dict(default=8500, type='int'),
         id=dict(required=False),
+        ids=dict(default=None, required=False, type='list'),
         name=dict(required=False),
         node=dict(required=False),
+        renew_for=dict(default=60, required=False, type='int'),
+        ttl=dict(default=None, required=False, type='int'),
         state=dict(default='present',
-                   choices=['present', 'absent', 'info', 'node', 'list'])
+                   choices=['present', 'absent', 'info', 'node', 'list',
+                            'renew'])
     )
 
     module = AnsibleModule(argument_spec, supports_check_mode=False)
@@ -88,6 +88,41 @@ options:
             - A redis config value.
         required: false
         default: null
+    config:
+        version_added: 2.0
+        description:
+            - A dict of redis config keys and values to ensure [config command].
+              All current values are read with a single CONFIG GET and every
+              change is sent through one pipeline. Takes precedence over
+              name and value. Booleans are sent as yes/no and memory sizes
+              such as 1gb or 512mb are compared in bytes, the way CONFIG GET
+              reports them.
+        required: false
+        default: null
+    config_rewrite:
+        version_added: 2.0
+        description:
+            - Run CONFIG REWRITE after changing the configuration so the new
+              values are persisted to redis.conf [config command]
+        required: false
+        default: false
+        choices: [ "yes", "no" ]
+    instances:
+        version_added: 2.0
+        description:
+            - A list of instances given as host or host:port to apply the
+              configuration to concurrently, in place of login_host and
+              login_port [config command]. IPv6 addresses must be given in
+              brackets, as [address] or [address]:port.
+        required: false
+        default: null
+    parallel:
+        version_added: 2.0
+        description:
+            - The number of instances configured at the same time when
+              instances is given [config command]
+        required: false
+        default: 10
 
 
 notes:
@@ -119,8 +154,24 @@ EXAMPLES = '''
 
 # Configure local redis to have lua time limit of 100 ms
 - redis: command=config name=lua-time-limit value=100
+
+# Ensure several settings on a set of instances and persist them
+- redis:
+    command: config
+    config_rewrite: yes
+    instances:
+      - cache1.example.com:6379
+      - cache2.example.com:6380
+    config:
+      maxclients: 10000
+      timeout: 300
+      maxmemory-policy: allkeys-lru
 '''
 
+import re
+import threading
+import Queue
+
 try:
     import redis
 except ImportError:
@@ -158,6 +209,102 @@ def flush(client, db=None):
         return False
 
 
+MEMORY_UNITS = {
+    'k': 1000, 'kb': 1024,
+    'm': 1000 * 1000, 'mb': 1024 * 1024,
+    'g': 1000 * 1000 * 1000, 'gb': 1024 * 1024 * 1024,
+}
+MEMORY_RE = re.compile(r'^(\d+)\s*(k|kb|m|mb|g|gb)$', re.IGNORECASE)
+
+
+def normalize_config_value(value):
+    """
+    Returns value the way CONFIG GET reports it: booleans as yes/no and
+    memory sizes such as 1gb or 512m in bytes.
+    """
+    if value is True:
+        return 'yes'
+    if value is False:
+        return 'no'
+    value = str(value).strip()
+    match = MEMORY_RE.match(value)
+    if match:
+        return str(int(match.group(1)) * MEMORY_UNITS[match.group(2).lower()])
+    return value
+
+
+def ensure_config(client, config, rewrite=False, check_mode=False):
+    current = client.config_get('*')
+    changes = {}
+    for name, value in config.iteritems():
+        value = normalize_config_value(value)
+        if current.get(name) != value:
+            changes[name] = {'before': current.get(name), 'after': value}
+
+    if changes and not check_mode:
+        pipe = client.pipeline(transaction=False)
+        for name, change in changes.iteritems():
+            pipe.config_set(name, change['after'])
+        if rewrite:
+            pipe.execute_command('CONFIG REWRITE')
+        pipe.execute()
+    return changes
+
+
+def parse_instance(instance, default_port):
+    """
+    Splits host, host:port, [address] or [address]:port into (host, port).
+    IPv6 addresses must be given in brackets.
+    """
+    if instance.startswith('['):
+        end = instance.find(']')
+        if end < 0:
+            raise ValueError(instance)
+        host, rest = instance[1:end], instance[end + 1:]
+        if not rest:
+            return host, default_port
+        if not rest.startswith(':'):
+            raise ValueError(instance)
+        return host, int(rest[1:])
+    if instance.count(':') > 1:
+        raise ValueError(instance)
+    if ':' not in instance:
+        return instance, default_port
+    host, port = instance.split(':')
+    return host, int(port)
+
+
+def config_instances(instances, password, config, rewrite, check_mode, parallel):
+    pending = Queue.Queue()
+    for instance in instances:
+        pending.put(instance)
+    results = {}
+
+    def worker():
+        while True:
+            try:
+                instance, host, port = pending.get_nowait()
+            except Queue.Empty:
+                return
+            result = {'host': host, 'port': port}
+            try:
+                client = redis.StrictRedis(host=host, port=port, password=password)
+                result['changes'] = ensure_config(client, config, rewrite, check_mode)
+                result['changed'] = bool(result['changes'])
+            except Exception, e:
+                result['failed'] = True
+                result['msg'] = str(e)
+            results[instance] = result
+
+    threads = [threading.Thread(target=worker)
+               for i in range(max(1, min(parallel, len(instances))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
 # ===========================================
 # Module execution.
 #
@@ -175,7 +322,11 @@ def main():
             db=dict(default=None),
             flush_mode=dict(default='all', choices=['all', 'db']),
             name=dict(default=None),
-            value=dict(default=None)
+            value=dict(default=None),
+            config=dict(default=None, type='dict'),
+            config_rewrite=dict(default=False, type='bool'),
+            instances=dict(default=None, type='list'),
+            parallel=dict(default=10, type='int'),
         ),
         supports_check_mode = True
     )
@@ -293,9 +444,44 @@ def main():
                 module.exit_json(changed=True, flushed=True, db=db)
             else:  # Flush never fails :)
                 module.fail_json(msg="Unable to flush '%d' database" % db)
+    elif command == 'config' and (module.params['config'] or
+                                  module.params['instances']):
+        config = module.params['config']
+        if not config:
+            if not module.params['name']:
+                module.fail_json(msg="config or name must be provided")
+            if module.params['value'] is None:
+                module.fail_json(msg="value must be provided with name")
+            config = {module.params['name']: module.params['value']}
+        rewrite = module.params['config_rewrite']
+
+        instances = []
+        if module.params['instances']:
+            try:
+                for instance in module.params['instances']:
+                    host, port = parse_instance(instance, login_port)
+                    instances.append((instance, host, port))
+            except ValueError:
+                module.fail_json(msg="instances must be given as host, host:port, "
+                                     "[address] or [address]:port")
+        else:
+            instances.append(('%s:%d' % (login_host, login_port), login_host, login_port))
+
+        results = config_instances(instances, login_password, config, rewrite,
+                                   module.check_mode, module.params['parallel'])
+        changed = any(r.get('changed') for r in results.values())
+        failed = [i for i, r in results.iteritems() if r.get('failed')]
+        if failed:
+            module.fail_json(msg="unable to configure %s" % ', '.join(sorted(failed)),
+                             changed=changed, instances=results)
+        module.exit_json(changed=changed, config=config, instances=results)
+
     elif command == 'config':
         name = module.params['name']
         value = module.params['value']
+        if not name or value is None:
+            module.fail_json(msg="name and value must be provided")
+        value = normalize_config_value(value)
 
         r = redis.StrictRedis(host=login_host,
                               port=login_port,
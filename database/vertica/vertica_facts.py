@@ -49,6 +49,17 @@ options:
       - The password used to authenticate with.
     required: false
     default: null
+  gather:
+    description:
+      - Comma separated list of the fact families to gather. Only the catalog
+        queries needed for the requested families are run.
+    required: false
+    default: schemas,users,roles,configuration,nodes
+  fetch_size:
+    description:
+      - Number of rows fetched from the server per round trip.
+    required: false
+    default: 1000
 notes:
   - The default authentication assumes that you are either logging in as or sudo'ing
     to the C(dbadmin) account on the host.
@@ -65,6 +76,9 @@ author: "Dariusz Owczarek (@dareko)"
 EXAMPLES = """
 - name: gathering vertica facts
   vertica_facts: db=db_name
+
+- name: gathering only schema and role facts
+  vertica_facts: db=db_name gather=schemas,roles
 """
 
 try:
@@ -74,52 +88,59 @@ except ImportError:
 else:
     pyodbc_found = True
 
+FACT_FAMILIES = ['schemas', 'users', 'roles', 'configuration', 'nodes']
+
 class NotSupportedError(Exception):
     pass
 
 # module specific functions
 
-def get_schema_facts(cursor, schema=''):
-    facts = {}
-    cursor.execute("""
-        select schema_name, schema_owner, create_time
-        from schemata
-        where not is_system_schema and schema_name not in ('public')
-        and (? = '' or schema_name ilike ?)
-    """, schema, schema)
+def fetch_rows(cursor, fetch_size):
     while True:
-        rows = cursor.fetchmany(100)
+        rows = cursor.fetchmany(fetch_size)
         if not rows:
             break
         for row in rows:
-            facts[row.schema_name.lower()] = {
-                'name': row.schema_name,
-                'owner': row.schema_owner,
-                'create_time': str(row.create_time),
-                'usage_roles': [],
-                'create_roles': []}
+            yield row
+
+def split_list(value):
+    if not value:
+        return []
+    return value.replace(' ', '').split(',')
+
+def get_schema_facts(cursor, schema='', fetch_size=1000):
+    facts = {}
+    # grants are folded into one row per schema on the server so only the
+    # aggregated role lists are transferred, not every USAGE grant row
     cursor.execute("""
-        select g.object_name as schema_name, r.name as role_name,
-        lower(g.privileges_description) privileges_description
-        from roles r join grants g
-        on g.grantee = r.name and g.object_type='SCHEMA'
-        and g.privileges_description like '%USAGE%'
-        and g.grantee not in ('public', 'dbadmin')
-        and (? = '' or g.object_name ilike ?)
-    """, schema, schema)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            schema_key = row.schema_name.lower()
-            if 'create' in row.privileges_description:
-                facts[schema_key]['create_roles'].append(row.role_name)
-            else:
-                facts[schema_key]['usage_roles'].append(row.role_name)
+        select s.schema_name, s.schema_owner, s.create_time,
+        g.usage_roles, g.create_roles
+        from schemata s left join (
+            select lower(g.object_name) as schema_key,
+            listagg(case when g.privileges_description not ilike '%CREATE%'
+                then r.name end using parameters max_length=65000) as usage_roles,
+            listagg(case when g.privileges_description ilike '%CREATE%'
+                then r.name end using parameters max_length=65000) as create_roles
+            from roles r join grants g
+            on g.grantee = r.name and g.object_type='SCHEMA'
+            and g.privileges_description like '%USAGE%'
+            and g.grantee not in ('public', 'dbadmin')
+            and (? = '' or g.object_name ilike ?)
+            group by lower(g.object_name)
+        ) g on g.schema_key = lower(s.schema_name)
+        where not s.is_system_schema and s.schema_name not in ('public')
+        and (? = '' or s.schema_name ilike ?)
+    """, schema, schema, schema, schema)
+    for row in fetch_rows(cursor, fetch_size):
+        facts[row.schema_name.lower()] = {
+            'name': row.schema_name,
+            'owner': row.schema_owner,
+            'create_time': str(row.create_time),
+            'usage_roles': split_list(row.usage_roles),
+            'create_roles': split_list(row.create_roles)}
     return facts
 
-def get_user_facts(cursor, user=''):
+def get_user_facts(cursor, user='', fetch_size=1000):
     facts = {}
     cursor.execute("""
         select u.user_name, u.is_locked, u.lock_time,
@@ -130,50 +151,35 @@ def get_user_facts(cursor, user=''):
         where not u.is_super_user
         and (? = '' or u.user_name ilike ?)
      """, user, user)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            user_key = row.user_name.lower()
-            facts[user_key] = {
-                'name': row.user_name,
-                'locked': str(row.is_locked),
-                'password': row.password,
-                'expired': str(row.is_expired),
-                'profile': row.profile_name,
-                'resource_pool': row.resource_pool,
-                'roles': [],
-                'default_roles': []}
-            if row.is_locked:
-                facts[user_key]['locked_time'] = str(row.lock_time)
-            if row.all_roles:
-                facts[user_key]['roles'] = row.all_roles.replace(' ', '').split(',')
-            if row.default_roles:
-                facts[user_key]['default_roles'] = row.default_roles.replace(' ', '').split(',')
+    for row in fetch_rows(cursor, fetch_size):
+        user_key = row.user_name.lower()
+        facts[user_key] = {
+            'name': row.user_name,
+            'locked': str(row.is_locked),
+            'password': row.password,
+            'expired': str(row.is_expired),
+            'profile': row.profile_name,
+            'resource_pool': row.resource_pool,
+            'roles': split_list(row.all_roles),
+            'default_roles': split_list(row.default_roles)}
+        if row.is_locked:
+            facts[user_key]['locked_time'] = str(row.lock_time)
     return facts
 
-def get_role_facts(cursor, role=''):
+def get_role_facts(cursor, role='', fetch_size=1000):
     facts = {}
     cursor.execute("""
         select r.name, r.assigned_roles
         from roles r
         where (? = '' or r.name ilike ?)
     """, role, role)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            role_key = row.name.lower()
-            facts[role_key] = {
-                'name': row.name,
-                'assigned_roles': []}
-            if row.assigned_roles:
-                facts[role_key]['assigned_roles'] = row.assigned_roles.replace(' ', '').split(',')
+    for row in fetch_rows(cursor, fetch_size):
+        facts[row.name.lower()] = {
+            'name': row.name,
+            'assigned_roles': split_list(row.assigned_roles)}
     return facts
 
-def get_configuration_facts(cursor, parameter=''):
+def get_configuration_facts(cursor, parameter='', fetch_size=1000):
     facts = {}
     cursor.execute("""
         select c.parameter_name, c.current_value, c.default_value
@@ -181,35 +187,27 @@ def get_configuration_facts(cursor, parameter=''):
         where c.node_name = 'ALL'
         and (? = '' or c.parameter_name ilike ?)
     """, parameter, parameter)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            facts[row.parameter_name.lower()] = {
-                'parameter_name': row.parameter_name,
-                'current_value': row.current_value,
-                'default_value': row.default_value}
+    for row in fetch_rows(cursor, fetch_size):
+        facts[row.parameter_name.lower()] = {
+            'parameter_name': row.parameter_name,
+            'current_value': row.current_value,
+            'default_value': row.default_value}
     return facts
 
-def get_node_facts(cursor, schema=''):
+def get_node_facts(cursor, schema='', fetch_size=1000):
     facts = {}
     cursor.execute("""
         select node_name, node_address, export_address, node_state, node_type,
             catalog_path
         from nodes
     """)
-    while True:
-        rows = cursor.fetchmany(100)
-        if not rows:
-            break
-        for row in rows:
-            facts[row.node_address] = {
-                'node_name': row.node_name,
-                'export_address': row.export_address,
-                'node_state': row.node_state,
-                'node_type': row.node_type,
-                'catalog_path': row.catalog_path}
+    for row in fetch_rows(cursor, fetch_size):
+        facts[row.node_address] = {
+            'node_name': row.node_name,
+            'export_address': row.export_address,
+            'node_state': row.node_state,
+            'node_type': row.node_type,
+            'catalog_path': row.catalog_path}
     return facts
 
 # module logic
@@ -223,11 +221,20 @@ def main():
             db=dict(default=None),
             login_user=dict(default='dbadmin'),
             login_password=dict(default=None),
+            gather=dict(default=','.join(FACT_FAMILIES)),
+            fetch_size=dict(default=1000, type='int'),
         ), supports_check_mode = True)
 
     if not pyodbc_found:
         module.fail_json(msg="The python pyodbc module is required.")
 
+    gather = filter(None, module.params['gather'].replace(' ', '').split(','))
+    unknown = set(gather) - set(FACT_FAMILIES)
+    if unknown:
+        module.fail_json(msg="Unknown fact families: {0}. Valid families are: {1}.".format(
+            ', '.join(sorted(unknown)), ', '.join(FACT_FAMILIES)))
+    fetch_size = module.params['fetch_size']
+
     db = ''
     if module.params['db']:
         db = module.params['db']
@@ -250,18 +257,18 @@ def main():
     except Exception, e:
         module.fail_json(msg="Unable to connect to database: {0}.".format(e))
         
+    gatherers = {
+        'schemas': get_schema_facts,
+        'users': get_user_facts,
+        'roles': get_role_facts,
+        'configuration': get_configuration_facts,
+        'nodes': get_node_facts}
+
     try:
-        schema_facts = get_schema_facts(cursor)
-        user_facts = get_user_facts(cursor)
-        role_facts = get_role_facts(cursor)
-        configuration_facts = get_configuration_facts(cursor)
-        node_facts = get_node_facts(cursor)
-        module.exit_json(changed=False,
-            ansible_facts={'vertica_schemas': schema_facts,
-                           'vertica_users': user_facts,
-                           'vertica_roles': role_facts,
-                           'vertica_configuration': configuration_facts,
-                           'vertica_nodes': node_facts})
+        facts = {}
+        for family in gather:
+            facts['vertica_' + family] = gatherers[family](cursor, fetch_size=fetch_size)
+        module.exit_json(changed=False, ansible_facts=facts)
     except NotSupportedError, e:
         module.fail_json(msg=str(e))
     except SystemExit:
@@ -27,7 +27,8 @@ options:
   name:
     description:
       - Name of the role to add or remove.
-    required: true
+      - Required unless I(roles) is given.
+    required: false
   assigned_roles:
     description:
       - Comma separated list of roles to assign to the role.
@@ -40,6 +41,18 @@ options:
     required: false
     choices: ['present', 'absent']
     default: present
+  roles:
+    description:
+      - List of roles to reconcile in a single task, each given as a dict
+        taking the I(name), I(assigned_roles) and I(state) options above.
+      - Role facts are loaded once and grants and revokes shared by several
+        roles are issued as a single statement.
+      - The whole list is checked before any statement is run. Vertica
+        commits DDL immediately, so a database error part way through
+        leaves the changes made before it in place.
+      - Mutually exclusive with I(name).
+    required: false
+    default: null
   db:
     description:
       - Name of the Vertica database.
@@ -84,6 +97,16 @@ EXAMPLES = """
 
 - name: creating a new vertica role with other role assigned
   vertica_role: name=role_name assigned_role=other_role_name state=present
+
+- name: creating several roles with their assigned roles
+  vertica_role:
+    db: db_name
+    roles:
+      - name: role_ro
+      - name: role_rw
+        assigned_roles: role_ro
+      - name: role_old
+        state: absent
 """
 
 try:
@@ -99,6 +122,40 @@ class NotSupportedError(Exception):
 class CannotDropError(Exception):
     pass
 
+class GrantBatch(object):
+    """
+    Collects grants and revokes so that every grantee receiving the same
+    privileges is covered by a single statement. Statements that depend on
+    the grants being in place are deferred until after them.
+    """
+
+    def __init__(self):
+        self.revokes = {}
+        self.grants = {}
+        self.deferred = []
+
+    def _add(self, statements, privileges, grantee):
+        key = tuple(sorted(privileges))
+        if key:
+            statements.setdefault(key, []).append(grantee)
+
+    def grant(self, privileges, grantee):
+        self._add(self.grants, privileges, grantee)
+
+    def revoke(self, privileges, grantee):
+        self._add(self.revokes, privileges, grantee)
+
+    def defer(self, query):
+        self.deferred.append(query)
+
+    def flush(self, cursor):
+        for privileges, grantees in self.revokes.iteritems():
+            cursor.execute("revoke {0} from {1}".format(','.join(privileges), ','.join(grantees)))
+        for privileges, grantees in self.grants.iteritems():
+            cursor.execute("grant {0} to {1}".format(','.join(privileges), ','.join(grantees)))
+        for query in self.deferred:
+            cursor.execute(query)
+
 # module specific functions
 
 def get_role_facts(cursor, role=''):
@@ -122,7 +179,11 @@ def get_role_facts(cursor, role=''):
     return facts
 
 def update_roles(role_facts, cursor, role,
-                 existing, required):
+                 existing, required, batch=None):
+    if batch:
+        batch.revoke(set(existing) - set(required), role)
+        batch.grant(set(required) - set(existing), role)
+        return
     for assigned_role in set(existing) - set(required):
         cursor.execute("revoke {0} from {1}".format(assigned_role, role))
     for assigned_role in set(required) - set(existing):
@@ -136,41 +197,93 @@ def check(role_facts, role, assigned_roles):
         return False
     return True
 
-def present(role_facts, cursor, role, assigned_roles):
+def present(role_facts, cursor, role, assigned_roles, batch=None):
     role_key = role.lower()
     if role_key not in role_facts:
         cursor.execute("create role {0}".format(role))
-        update_roles(role_facts, cursor, role, [], assigned_roles)
-        role_facts.update(get_role_facts(cursor, role))
+        update_roles(role_facts, cursor, role, [], assigned_roles, batch)
+        if not batch:
+            role_facts.update(get_role_facts(cursor, role))
         return True
     else:
         changed = False
         if assigned_roles and cmp(sorted(assigned_roles), sorted(role_facts[role_key]['assigned_roles'])) != 0:
             update_roles(role_facts, cursor, role,
-                role_facts[role_key]['assigned_roles'], assigned_roles)
+                role_facts[role_key]['assigned_roles'], assigned_roles, batch)
             changed = True
-        if changed:
+        if changed and not batch:
             role_facts.update(get_role_facts(cursor, role))
         return changed
 
-def absent(role_facts, cursor, role, assigned_roles):
+def absent(role_facts, cursor, role, assigned_roles, batch=None):
     role_key = role.lower()
     if role_key in role_facts:
         update_roles(role_facts, cursor, role,
-            role_facts[role_key]['assigned_roles'], [])
+            role_facts[role_key]['assigned_roles'], [], batch)
+        if batch:
+            batch.defer("drop role {0} cascade".format(role_facts[role_key]['name']))
+            del role_facts[role_key]
+            return True
         cursor.execute("drop role {0} cascade".format(role_facts[role_key]['name']))
         del role_facts[role_key]
         return True
     else:
         return False
 
+def split_roles(roles):
+    if not roles:
+        return []
+    if isinstance(roles, basestring):
+        roles = roles.split(',')
+    return filter(None, [role.strip() for role in roles])
+
+def validate_roles(module, roles):
+    """
+    Rejects malformed or duplicate entries before any role is touched.
+    """
+    seen = set()
+    for entry in roles:
+        if not isinstance(entry, dict) or not entry.get('name'):
+            module.fail_json(msg="Each entry in roles requires a name.")
+        state = entry.get('state', 'present')
+        if state not in ['absent', 'present']:
+            module.fail_json(msg="Invalid state {0} for role {1}.".format(state, entry['name']))
+        role_key = entry['name'].lower()
+        if role_key in seen:
+            module.fail_json(msg="Role {0} is listed more than once.".format(entry['name']))
+        seen.add(role_key)
+
+def reconcile_roles(module, cursor, roles):
+    validate_roles(module, roles)
+    role_facts = get_role_facts(cursor)
+    batch = GrantBatch()
+    changed_roles = []
+    for entry in roles:
+        state = entry.get('state', 'present')
+        role = entry['name']
+        assigned_roles = split_roles(entry.get('assigned_roles'))
+        if module.check_mode:
+            changed = not check(role_facts, role, assigned_roles)
+        elif state == 'absent':
+            changed = absent(role_facts, cursor, role, assigned_roles, batch)
+        else:
+            changed = present(role_facts, cursor, role, assigned_roles, batch)
+        if changed:
+            changed_roles.append(role)
+    if not module.check_mode:
+        batch.flush(cursor)
+        if changed_roles:
+            role_facts = get_role_facts(cursor)
+    return changed_roles, role_facts
+
 # module logic
 
 def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            role=dict(required=True, aliases=['name']),
+            role=dict(default=None, aliases=['name']),
+            roles=dict(default=None, type='list'),
             assigned_roles=dict(default=None, aliases=['assigned_role']),
             state=dict(default='present', choices=['absent', 'present']),
             db=dict(default=None),
@@ -178,16 +291,17 @@ def main():
             port=dict(default='5433'),
             login_user=dict(default='dbadmin'),
             login_password=dict(default=None),
-        ), supports_check_mode = True)
+        ),
+        required_one_of=[['role', 'roles']],
+        mutually_exclusive=[['role', 'roles']],
+        supports_check_mode = True)
 
     if not pyodbc_found:
         module.fail_json(msg="The python pyodbc module is required.")
 
+    roles = module.params['roles']
     role = module.params['role']
-    assigned_roles = []
-    if module.params['assigned_roles']:
-        assigned_roles = module.params['assigned_roles'].split(',')
-        assigned_roles = filter(None, assigned_roles)
+    assigned_roles = split_roles(module.params['assigned_roles'])
     state = module.params['state']
     db = ''
     if module.params['db']:
@@ -211,6 +325,19 @@ def main():
     except Exception, e:
         module.fail_json(msg="Unable to connect to database: {0}.".format(e))
 
+    if roles:
+        try:
+            changed_roles, role_facts = reconcile_roles(module, cursor, roles)
+        except pyodbc.Error, e:
+            module.fail_json(msg=str(e))
+        except SystemExit:
+            # avoid catching this on python 2.4
+            raise
+        except Exception, e:
+            module.fail_json(msg=e)
+        module.exit_json(changed=bool(changed_roles), roles=changed_roles,
+            ansible_facts={'vertica_roles': role_facts})
+
     try:
         role_facts = get_role_facts(cursor)
         if module.check_mode:
@@ -32,7 +32,8 @@ options:
   name:
     description:
       - Name of the schema to add or remove.
-    required: true
+      - Required unless I(schemas) is given.
+    required: false
   usage_roles:
     description:
       - Comma separated list of roles to create and grant usage access to the schema.
@@ -56,6 +57,19 @@ options:
     required: false
     default: present
     choices: ['present', 'absent']
+  schemas:
+    description:
+      - List of schemas to reconcile in a single task, each given as a dict
+        taking the I(name), I(usage_roles), I(create_roles), I(owner) and
+        I(state) options above.
+      - Schema facts are loaded once and grants and revokes shared by
+        several roles are issued as a single statement.
+      - The whole list is checked before any statement is run. Vertica
+        commits DDL immediately, so a database error part way through
+        leaves the changes made before it in place.
+      - Mutually exclusive with I(name).
+    required: false
+    default: null
   db:
     description:
       - Name of the Vertica database.
@@ -108,6 +122,18 @@ EXAMPLES = """
     usage_roles=schema_name_ro,schema_name_rw
     db=db_name
     state=present
+
+- name: creating several schemas with their roles
+  vertica_schema:
+    db: db_name
+    schemas:
+      - name: sales
+        usage_roles: sales_ro
+        create_roles: sales_all
+      - name: finance
+        usage_roles: finance_ro
+      - name: scratch
+        state: absent
 """
 
 try:
@@ -123,6 +149,51 @@ class NotSupportedError(Exception):
 class CannotDropError(Exception):
     pass
 
+class GrantBatch(object):
+    """
+    Collects grants and revokes so that every grantee receiving the same
+    privileges is covered by a single statement. Statements that depend on
+    the grants being in place are deferred until after them.
+    """
+
+    def __init__(self):
+        self.revokes = {}
+        self.grants = {}
+        self.deferred = []
+
+    def _add(self, statements, privileges, grantee):
+        key = tuple(sorted(privileges))
+        if key:
+            statements.setdefault(key, []).append(grantee)
+
+    def grant(self, privileges, grantee):
+        self._add(self.grants, privileges, grantee)
+
+    def revoke(self, privileges, grantee):
+        self._add(self.revokes, privileges, grantee)
+
+    def defer(self, query, drop_error=None):
+        """
+        Queues a statement to run after the grants. When drop_error is set, a
+        database error from the statement is raised as CannotDropError with
+        that message, like the single-object drop does.
+        """
+        self.deferred.append((query, drop_error))
+
+    def flush(self, cursor):
+        for privileges, grantees in self.revokes.iteritems():
+            cursor.execute("revoke {0} from {1}".format(','.join(privileges), ','.join(grantees)))
+        for privileges, grantees in self.grants.iteritems():
+            cursor.execute("grant {0} to {1}".format(','.join(privileges), ','.join(grantees)))
+        for query, drop_error in self.deferred:
+            if not drop_error:
+                cursor.execute(query)
+                continue
+            try:
+                cursor.execute(query)
+            except pyodbc.Error:
+                raise CannotDropError(drop_error)
+
 # module specific functions
 
 def get_schema_facts(cursor, schema=''):
@@ -167,16 +238,26 @@ def get_schema_facts(cursor, schema=''):
 
 def update_roles(schema_facts, cursor, schema,
                  existing, required,
-                 create_existing, create_required):
-    for role in set(existing + create_existing) - set(required + create_required):
+                 create_existing, create_required, batch=None):
+    dropped = set(existing + create_existing) - set(required + create_required)
+    for role in dropped:
         cursor.execute("drop role {0} cascade".format(role))
-    for role in set(create_existing) - set(create_required):
-        cursor.execute("revoke create on schema {0} from {1}".format(schema, role))
+    for role in set(create_existing) - set(create_required) - dropped:
+        if batch:
+            batch.revoke(["create on schema {0}".format(schema)], role)
+        else:
+            cursor.execute("revoke create on schema {0} from {1}".format(schema, role))
     for role in set(required + create_required) - set(existing + create_existing):
         cursor.execute("create role {0}".format(role))
-        cursor.execute("grant usage on schema {0} to {1}".format(schema, role))
+        if batch:
+            batch.grant(["usage on schema {0}".format(schema)], role)
+        else:
+            cursor.execute("grant usage on schema {0} to {1}".format(schema, role))
     for role in set(create_required) - set(create_existing):
-         cursor.execute("grant create on schema {0} to {1}".format(schema, role))
+        if batch:
+            batch.grant(["create on schema {0}".format(schema)], role)
+        else:
+            cursor.execute("grant create on schema {0} to {1}".format(schema, role))
 
 def check(schema_facts, schema, usage_roles, create_roles, owner):
     schema_key = schema.lower()
@@ -190,15 +271,16 @@ def check(schema_facts, schema, usage_roles, create_roles, owner):
         return False
     return True
 
-def present(schema_facts, cursor, schema, usage_roles, create_roles, owner):
+def present(schema_facts, cursor, schema, usage_roles, create_roles, owner, batch=None):
     schema_key = schema.lower()
     if schema_key not in schema_facts:
         query_fragments = ["create schema {0}".format(schema)]
         if owner:
             query_fragments.append("authorization {0}".format(owner))
         cursor.execute(' '.join(query_fragments))
-        update_roles(schema_facts, cursor, schema, [], usage_roles, [], create_roles)
-        schema_facts.update(get_schema_facts(cursor, schema))
+        update_roles(schema_facts, cursor, schema, [], usage_roles, [], create_roles, batch)
+        if not batch:
+            schema_facts.update(get_schema_facts(cursor, schema))
         return True
     else:
         changed = False
@@ -211,17 +293,22 @@ def present(schema_facts, cursor, schema, usage_roles, create_roles, owner):
             cmp(sorted(create_roles), sorted(schema_facts[schema_key]['create_roles'])) != 0:
             update_roles(schema_facts, cursor, schema,
                 schema_facts[schema_key]['usage_roles'], usage_roles,
-                schema_facts[schema_key]['create_roles'], create_roles)
+                schema_facts[schema_key]['create_roles'], create_roles, batch)
             changed = True
-        if changed:
+        if changed and not batch:
             schema_facts.update(get_schema_facts(cursor, schema))
         return changed
 
-def absent(schema_facts, cursor, schema, usage_roles, create_roles):
+def absent(schema_facts, cursor, schema, usage_roles, create_roles, batch=None):
     schema_key = schema.lower()
     if schema_key in schema_facts:
         update_roles(schema_facts, cursor, schema,
-            schema_facts[schema_key]['usage_roles'], [], schema_facts[schema_key]['create_roles'], [])
+            schema_facts[schema_key]['usage_roles'], [], schema_facts[schema_key]['create_roles'], [], batch)
+        if batch:
+            batch.defer("drop schema {0} restrict".format(schema_facts[schema_key]['name']),
+                "Dropping schema {0} failed due to dependencies.".format(schema_facts[schema_key]['name']))
+            del schema_facts[schema_key]
+            return True
         try:
             cursor.execute("drop schema {0} restrict".format(schema_facts[schema_key]['name']))
         except pyodbc.Error:
@@ -231,13 +318,70 @@ def absent(schema_facts, cursor, schema, usage_roles, create_roles):
     else:
         return False
 
+def split_roles(roles):
+    if not roles:
+        return []
+    if isinstance(roles, basestring):
+        roles = roles.split(',')
+    return filter(None, [role.strip() for role in roles])
+
+def validate_schemas(module, schema_facts, schemas):
+    """
+    Rejects malformed or duplicate entries, and owner changes Vertica cannot
+    make, before any schema is touched.
+    """
+    seen = set()
+    for entry in schemas:
+        if not isinstance(entry, dict) or not entry.get('name'):
+            module.fail_json(msg="Each entry in schemas requires a name.")
+        state = entry.get('state', 'present')
+        if state not in ['absent', 'present']:
+            module.fail_json(msg="Invalid state {0} for schema {1}.".format(state, entry['name']))
+        schema_key = entry['name'].lower()
+        if schema_key in seen:
+            module.fail_json(msg="Schema {0} is listed more than once.".format(entry['name']))
+        seen.add(schema_key)
+        owner = entry.get('owner')
+        if state == 'present' and owner and schema_key in schema_facts \
+                and owner.lower() != schema_facts[schema_key]['owner'].lower():
+            module.fail_json(msg=(
+                "Changing schema owner is not supported. "
+                "Current owner of {0}: {1}."
+                ).format(entry['name'], schema_facts[schema_key]['owner']))
+
+def reconcile_schemas(module, cursor, schemas):
+    schema_facts = get_schema_facts(cursor)
+    validate_schemas(module, schema_facts, schemas)
+    batch = GrantBatch()
+    changed_schemas = []
+    for entry in schemas:
+        state = entry.get('state', 'present')
+        schema = entry['name']
+        usage_roles = split_roles(entry.get('usage_roles'))
+        create_roles = split_roles(entry.get('create_roles'))
+        owner = entry.get('owner')
+        if module.check_mode:
+            changed = not check(schema_facts, schema, usage_roles, create_roles, owner)
+        elif state == 'absent':
+            changed = absent(schema_facts, cursor, schema, usage_roles, create_roles, batch)
+        else:
+            changed = present(schema_facts, cursor, schema, usage_roles, create_roles, owner, batch)
+        if changed:
+            changed_schemas.append(schema)
+    if not module.check_mode:
+        batch.flush(cursor)
+        if changed_schemas:
+            schema_facts = get_schema_facts(cursor)
+    return changed_schemas, schema_facts
+
 # module logic
 
 def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            schema=dict(required=True, aliases=['name']),
+            schema=dict(default=None, aliases=['name']),
+            schemas=dict(default=None, type='list'),
             usage_roles=dict(default=None, aliases=['usage_role']),
             create_roles=dict(default=None, aliases=['create_role']),
             owner=dict(default=None),
@@ -247,20 +391,18 @@ def main():
             port=dict(default='5433'),
             login_user=dict(default='dbadmin'),
             login_password=dict(default=None),
-        ), supports_check_mode = True)
+        ),
+        required_one_of=[['schema', 'schemas']],
+        mutually_exclusive=[['schema', 'schemas']],
+        supports_check_mode = True)
 
     if not pyodbc_found:
         module.fail_json(msg="The python pyodbc module is required.")
 
+    schemas = module.params['schemas']
     schema = module.params['schema']
-    usage_roles = []
-    if module.params['usage_roles']:
-        usage_roles = module.params['usage_roles'].split(',')
-        usage_roles = filter(None, usage_roles)
-    create_roles = []
-    if module.params['create_roles']:
-        create_roles = module.params['create_roles'].split(',')
-        create_roles = filter(None, create_roles)
+    usage_roles = split_roles(module.params['usage_roles'])
+    create_roles = split_roles(module.params['create_roles'])
     owner = module.params['owner']
     state = module.params['state']
     db = ''
@@ -285,6 +427,24 @@ def main():
     except Exception, e:
         module.fail_json(msg="Unable to connect to database: {0}.".format(e))
 
+    if schemas:
+        schema_facts = {}
+        try:
+            changed_schemas, schema_facts = reconcile_schemas(module, cursor, schemas)
+        except NotSupportedError, e:
+            module.fail_json(msg=str(e), ansible_facts={'vertica_schemas': schema_facts})
+        except CannotDropError, e:
+            module.fail_json(msg=str(e), ansible_facts={'vertica_schemas': schema_facts})
+        except pyodbc.Error, e:
+            module.fail_json(msg=str(e))
+        except SystemExit:
+            # avoid catching this on python 2.4
+            raise
+        except Exception, e:
+            module.fail_json(msg=e)
+        module.exit_json(changed=bool(changed_schemas), schemas=changed_schemas,
+            ansible_facts={'vertica_schemas': schema_facts})
+
     try:
         schema_facts = get_schema_facts(cursor)
         if module.check_mode:
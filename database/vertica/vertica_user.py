@@ -30,7 +30,8 @@ options:
   name:
     description:
       - Name of the user to add or remove.
-    required: true
+      - Required unless I(users) is given.
+    required: false
   profile:
     description:
       - Sets the user's profile.
@@ -72,6 +73,19 @@ options:
     required: false
     choices: ['present', 'absent', 'locked']
     default: present
+  users:
+    description:
+      - List of users to reconcile in a single task, each given as a dict
+        taking the I(name), I(profile), I(resource_pool), I(password),
+        I(expired), I(ldap), I(roles) and I(state) options above.
+      - User facts are loaded once and role grants and revokes shared by
+        several users are issued as a single statement.
+      - The whole list is checked before any statement is run. Vertica
+        commits DDL immediately, so a database error part way through
+        leaves the changes made before it in place.
+      - Mutually exclusive with I(name).
+    required: false
+    default: null
   db:
     description:
       - Name of the Vertica database.
@@ -121,6 +135,19 @@ EXAMPLES = """
     db=db_name
     roles=schema_name_ro
     state=present
+
+- name: onboarding a team of users with the same roles
+  vertica_user:
+    db: db_name
+    users:
+      - name: user_one
+        ldap: true
+        roles: schema_name_ro,schema_name_rw
+      - name: user_two
+        ldap: true
+        roles: schema_name_ro,schema_name_rw
+      - name: former_user
+        state: absent
 """
 
 try:
@@ -136,6 +163,51 @@ class NotSupportedError(Exception):
 class CannotDropError(Exception):
     pass
 
+class GrantBatch(object):
+    """
+    Collects grants and revokes so that every grantee receiving the same
+    privileges is covered by a single statement. Statements that depend on
+    the grants being in place are deferred until after them.
+    """
+
+    def __init__(self):
+        self.revokes = {}
+        self.grants = {}
+        self.deferred = []
+
+    def _add(self, statements, privileges, grantee):
+        key = tuple(sorted(privileges))
+        if key:
+            statements.setdefault(key, []).append(grantee)
+
+    def grant(self, privileges, grantee):
+        self._add(self.grants, privileges, grantee)
+
+    def revoke(self, privileges, grantee):
+        self._add(self.revokes, privileges, grantee)
+
+    def defer(self, query, drop_error=None):
+        """
+        Queues a statement to run after the grants. When drop_error is set, a
+        database error from the statement is raised as CannotDropError with
+        that message, like the single-object drop does.
+        """
+        self.deferred.append((query, drop_error))
+
+    def flush(self, cursor):
+        for privileges, grantees in self.revokes.iteritems():
+            cursor.execute("revoke {0} from {1}".format(','.join(privileges), ','.join(grantees)))
+        for privileges, grantees in self.grants.iteritems():
+            cursor.execute("grant {0} to {1}".format(','.join(privileges), ','.join(grantees)))
+        for query, drop_error in self.deferred:
+            if not drop_error:
+                cursor.execute(query)
+                continue
+            try:
+                cursor.execute(query)
+            except pyodbc.Error:
+                raise CannotDropError(drop_error)
+
 # module specific functions
 
 def get_user_facts(cursor, user=''):
@@ -173,11 +245,17 @@ def get_user_facts(cursor, user=''):
     return facts
 
 def update_roles(user_facts, cursor, user,
-                 existing_all, existing_default, required):
+                 existing_all, existing_default, required, batch=None):
     del_roles = list(set(existing_all) - set(required))
+    new_roles = list(set(required) - set(existing_all))
+    if batch:
+        batch.revoke(del_roles, user)
+        batch.grant(new_roles, user)
+        if required:
+            batch.defer("alter user {0} default role {1}".format(user, ','.join(required)))
+        return
     if del_roles:
         cursor.execute("revoke {0} from {1}".format(','.join(del_roles), user))
-    new_roles = list(set(required) - set(existing_all))
     if new_roles:
         cursor.execute("grant {0} to {1}".format(','.join(new_roles), user))
     if required:
@@ -205,7 +283,7 @@ def check(user_facts, user, profile, resource_pool,
     return True
 
 def present(user_facts, cursor, user, profile, resource_pool,
-    locked, password, expired, ldap, roles):
+    locked, password, expired, ldap, roles, batch=None):
     user_key = user.lower()
     if user_key not in user_facts:
         query_fragments = ["create user {0}".format(user)]
@@ -226,8 +304,9 @@ def present(user_facts, cursor, user, profile, resource_pool,
         if resource_pool and resource_pool != 'general':
             cursor.execute("grant usage on resource pool {0} to {1}".format(
                 resource_pool, user))
-        update_roles(user_facts, cursor, user, [], [], roles)
-        user_facts.update(get_user_facts(cursor, user))
+        update_roles(user_facts, cursor, user, [], [], roles, batch)
+        if not batch:
+            user_facts.update(get_user_facts(cursor, user))
         return True
     else:
         changed = False
@@ -269,17 +348,22 @@ def present(user_facts, cursor, user, profile, resource_pool,
         if roles and (cmp(sorted(roles), sorted(user_facts[user_key]['roles'])) != 0 or \
             cmp(sorted(roles), sorted(user_facts[user_key]['default_roles'])) != 0):
             update_roles(user_facts, cursor, user,
-                user_facts[user_key]['roles'], user_facts[user_key]['default_roles'], roles)
+                user_facts[user_key]['roles'], user_facts[user_key]['default_roles'], roles, batch)
             changed = True
-        if changed:
+        if changed and not batch:
             user_facts.update(get_user_facts(cursor, user))
         return changed
 
-def absent(user_facts, cursor, user, roles):
+def absent(user_facts, cursor, user, roles, batch=None):
     user_key = user.lower()
     if user_key in user_facts:
         update_roles(user_facts, cursor, user,
-            user_facts[user_key]['roles'], user_facts[user_key]['default_roles'], [])
+            user_facts[user_key]['roles'], user_facts[user_key]['default_roles'], [], batch)
+        if batch:
+            batch.defer("drop user {0}".format(user_facts[user_key]['name']),
+                "Dropping user {0} failed due to dependencies.".format(user_facts[user_key]['name']))
+            del user_facts[user_key]
+            return True
         try:
             cursor.execute("drop user {0}".format(user_facts[user_key]['name']))
         except pyodbc.Error:
@@ -289,13 +373,80 @@ def absent(user_facts, cursor, user, roles):
     else:
         return False
 
+def split_roles(roles):
+    if not roles:
+        return []
+    if isinstance(roles, basestring):
+        roles = roles.split(',')
+    return filter(None, [role.strip() for role in roles])
+
+def user_params(entry):
+    profile = entry.get('profile')
+    if profile:
+        profile = profile.lower()
+    resource_pool = entry.get('resource_pool')
+    if resource_pool:
+        resource_pool = resource_pool.lower()
+    return dict(
+        user=entry['name'],
+        profile=profile,
+        resource_pool=resource_pool,
+        locked=entry.get('state', 'present') == 'locked',
+        password=entry.get('password'),
+        expired=entry.get('expired'),
+        ldap=entry.get('ldap'),
+        roles=split_roles(entry.get('roles')))
+
+def validate_users(module, user_facts, users):
+    """
+    Rejects malformed or duplicate entries, and changes Vertica cannot make,
+    before any user is touched.
+    """
+    seen = set()
+    for entry in users:
+        if not isinstance(entry, dict) or not entry.get('name'):
+            module.fail_json(msg="Each entry in users requires a name.")
+        state = entry.get('state', 'present')
+        if state not in ['absent', 'present', 'locked']:
+            module.fail_json(msg="Invalid state {0} for user {1}.".format(state, entry['name']))
+        user_key = entry['name'].lower()
+        if user_key in seen:
+            module.fail_json(msg="User {0} is listed more than once.".format(entry['name']))
+        seen.add(user_key)
+        if state != 'absent' and user_key in user_facts and not entry.get('ldap') \
+                and entry.get('expired') is False and user_facts[user_key]['expired'] == 'True':
+            module.fail_json(msg="Unexpiring user password is not supported (user {0}).".format(entry['name']))
+
+def reconcile_users(module, cursor, users):
+    user_facts = get_user_facts(cursor)
+    validate_users(module, user_facts, users)
+    batch = GrantBatch()
+    changed_users = []
+    for entry in users:
+        state = entry.get('state', 'present')
+        params = user_params(entry)
+        if module.check_mode:
+            changed = not check(user_facts, **params)
+        elif state == 'absent':
+            changed = absent(user_facts, cursor, params['user'], params['roles'], batch)
+        else:
+            changed = present(user_facts, cursor, batch=batch, **params)
+        if changed:
+            changed_users.append(entry['name'])
+    if not module.check_mode:
+        batch.flush(cursor)
+        if changed_users:
+            user_facts = get_user_facts(cursor)
+    return changed_users, user_facts
+
 # module logic
 
 def main():
 
     module = AnsibleModule(
         argument_spec=dict(
-            user=dict(required=True, aliases=['name']),
+            user=dict(default=None, aliases=['name']),
+            users=dict(default=None, type='list'),
             profile=dict(default=None),
             resource_pool=dict(default=None),
             password=dict(default=None),
@@ -308,11 +459,15 @@ def main():
             port=dict(default='5433'),
             login_user=dict(default='dbadmin'),
             login_password=dict(default=None),
-        ), supports_check_mode = True)
+        ),
+        required_one_of=[['user', 'users']],
+        mutually_exclusive=[['user', 'users']],
+        supports_check_mode = True)
 
     if not pyodbc_found:
         module.fail_json(msg="The python pyodbc module is required.")
 
+    users = module.params['users']
     user = module.params['user']
     profile = module.params['profile']
     if profile:
@@ -323,10 +478,7 @@ def main():
     password = module.params['password']
     expired = module.params['expired']
     ldap = module.params['ldap']
-    roles = []
-    if module.params['roles']:
-        roles = module.params['roles'].split(',')
-        roles = filter(None, roles)
+    roles = split_roles(module.params['roles'])
     state = module.params['state']
     if state == 'locked':
         locked = True
@@ -354,6 +506,24 @@ def main():
     except Exception, e:
         module.fail_json(msg="Unable to connect to database: {0}.".format(e))
 
+    if users:
+        user_facts = {}
+        try:
+            changed_users, user_facts = reconcile_users(module, cursor, users)
+        except NotSupportedError, e:
+            module.fail_json(msg=str(e), ansible_facts={'vertica_users': user_facts})
+        except CannotDropError, e:
+            module.fail_json(msg=str(e), ansible_facts={'vertica_users': user_facts})
+        except pyodbc.Error, e:
+            module.fail_json(msg=str(e))
+        except SystemExit:
+            # avoid catching this on python 2.4
+            raise
+        except Exception, e:
+            module.fail_json(msg=e)
+        module.exit_json(changed=bool(changed_users), users=changed_users,
+            ansible_facts={'vertica_users': user_facts})
+
     try:
         user_facts = get_user_facts(cursor)
         if module.check_mode:
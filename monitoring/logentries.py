@@ -27,7 +27,7 @@ version_added: "1.6"
 options:
     path:
         description:
-            - path to a log file
+            - path to a log file, or a list (or comma separated string) of paths
         required: true
     state:
         description:
@@ -43,15 +43,67 @@ options:
         description:
             - type of the log
         required: false
+    config:
+        description:
+            - Path to the agent configuration file. When the agent is set up with
+              C(pull-server-side-config = False) the followed logs are read from this
+              file in one pass instead of querying the agent once per path.
+        required: false
+        default: /etc/le/config
+        version_added: "2.0"
+    restart_agent:
+        description:
+            - Restart the C(logentries) service once after all changes are applied.
+        required: false
+        default: "no"
+        choices: [ "yes", "no" ]
+        version_added: "2.0"
 
 notes:
     - Requires the LogEntries agent which can be installed following the instructions at logentries.com
+    - The le command line takes a single log per C(follow), C(rm) and C(followed) call, so every log that
+      needs a change is passed to the agent in its own call. Unless the agent uses a local config
+      (C(pull-server-side-config = False)), checking which logs are followed also takes one C(le followed)
+      call per log.
 '''
 EXAMPLES = '''
 - logentries: path=/var/log/nginx/access.log state=present name=nginx-access-log
 - logentries: path=/var/log/nginx/error.log state=absent
+- logentries:
+    path:
+      - /var/log/app/web.log
+      - /var/log/app/worker.log
+    restart_agent: yes
 '''
 
+import ConfigParser
+import os
+
+
+def read_local_config(config_path):
+    """ Returns the set of paths followed in a local agent config, or None
+    when the agent pulls its configuration from the server. """
+
+    if not os.path.isfile(config_path):
+        return None
+
+    config = ConfigParser.RawConfigParser()
+    try:
+        config.read(config_path)
+    except ConfigParser.Error:
+        return None
+
+    if not config.has_section('Main') or not config.has_option('Main', 'pull-server-side-config'):
+        return None
+    if config.get('Main', 'pull-server-side-config').strip().lower() not in ('false', 'no', '0'):
+        return None
+
+    followed = set()
+    for section in config.sections():
+        if section != 'Main' and config.has_option(section, 'path'):
+            followed.add(config.get(section, 'path').strip())
+    return followed
+
 def query_log_status(module, le_path, path, state="present"):
     """ Returns whether a log is followed or not. """
 
@@ -62,67 +114,90 @@ def query_log_status(module, le_path, path, state="present"):
 
         return False
 
-def follow_log(module, le_path, logs, name=None, logtype=None):
-    """ Follows one or more logs if not already followed. """
+def followed_logs(module, le_path, config_path, logs):
+    """ Returns the subset of logs currently followed, reading the local
+    agent config once when possible. """
+
+    followed = read_local_config(config_path)
+    if followed is not None:
+        return set(log for log in logs if log in followed)
+    return set(log for log in logs if query_log_status(module, le_path, log))
 
-    followed_count = 0
+def restart_agent(module):
+    """ Restarts the agent so it picks up the new set of followed logs. """
 
-    for log in logs:
-        if query_log_status(module, le_path, log):
-            continue
+    service = module.get_bin_path('service', True)
+    rc, out, err = module.run_command([service, 'logentries', 'restart'])
+    if rc != 0:
+        module.fail_json(msg="failed to restart the logentries agent: %s" % err.strip())
 
-        if module.check_mode:
-            module.exit_json(changed=True)
+def follow_log(module, le_path, logs, name=None, logtype=None, config_path=None, restart=False):
+    """ Follows one or more logs if not already followed, one le call per log. """
 
+    followed = followed_logs(module, le_path, config_path, logs)
+    pending = [log for log in logs if log not in followed]
+
+    if not pending:
+        module.exit_json(changed=False, msg="logs(s) already followed")
+
+    if module.check_mode:
+        module.exit_json(changed=True, msg="would follow %d log(s)" % len(pending), logs=pending)
+
+    errors = {}
+    for log in pending:
         cmd = [le_path, 'follow', log]
         if name:
-            cmd.extend(['--name',name])
+            cmd.extend(['--name', name])
         if logtype:
-            cmd.extend(['--type',logtype])
-        rc, out, err = module.run_command(' '.join(cmd))
+            cmd.extend(['--type', logtype])
+        rc, out, err = module.run_command(cmd)
+        errors[log] = err.strip()
 
-        if not query_log_status(module, le_path, log):
-            module.fail_json(msg="failed to follow '%s': %s" % (log, err.strip()))
+    followed = followed_logs(module, le_path, config_path, pending)
+    failed = [log for log in pending if log not in followed]
+    if failed:
+        module.fail_json(msg="failed to follow %s" % ', '.join("'%s': %s" % (log, errors[log]) for log in failed))
 
-        followed_count += 1
+    if restart:
+        restart_agent(module)
 
-    if followed_count > 0:
-        module.exit_json(changed=True, msg="followed %d log(s)" % (followed_count,))
+    module.exit_json(changed=True, msg="followed %d log(s)" % len(pending), logs=pending)
 
-    module.exit_json(changed=False, msg="logs(s) already followed")
+def unfollow_log(module, le_path, logs, config_path=None, restart=False):
+    """ Unfollows one or more logs if followed, one le call per log. """
 
-def unfollow_log(module, le_path, logs):
-    """ Unfollows one or more logs if followed. """
+    followed = followed_logs(module, le_path, config_path, logs)
+    pending = [log for log in logs if log in followed]
 
-    removed_count = 0
+    if not pending:
+        module.exit_json(changed=False, msg="logs(s) already unfollowed")
 
-    # Using a for loop incase of error, we can report the package that failed
-    for log in logs:
-        # Query the log first, to see if we even need to remove.
-        if not query_log_status(module, le_path, log):
-            continue
+    if module.check_mode:
+        module.exit_json(changed=True, msg="would remove %d log(s)" % len(pending), logs=pending)
 
-        if module.check_mode:
-            module.exit_json(changed=True)
+    errors = {}
+    for log in pending:
         rc, out, err = module.run_command([le_path, 'rm', log])
+        errors[log] = err.strip()
 
-        if query_log_status(module, le_path, log):
-            module.fail_json(msg="failed to remove '%s': %s" % (log, err.strip()))
-
-        removed_count += 1
+    failed = list(followed_logs(module, le_path, config_path, pending))
+    if failed:
+        module.fail_json(msg="failed to remove %s" % ', '.join("'%s': %s" % (log, errors[log]) for log in failed))
 
-    if removed_count > 0:
-        module.exit_json(changed=True, msg="removed %d package(s)" % removed_count)
+    if restart:
+        restart_agent(module)
 
-    module.exit_json(changed=False, msg="logs(s) already unfollowed")
+    module.exit_json(changed=True, msg="removed %d log(s)" % len(pending), logs=pending)
 
 def main():
     module = AnsibleModule(
         argument_spec = dict(
-            path = dict(required=True),
+            path = dict(required=True, type='list'),
             state = dict(default="present", choices=["present", "followed", "absent", "unfollowed"]),
             name = dict(required=False, default=None, type='str'),
-            logtype = dict(required=False, default=None, type='str', aliases=['type'])
+            logtype = dict(required=False, default=None, type='str', aliases=['type']),
+            config = dict(required=False, default='/etc/le/config'),
+            restart_agent = dict(required=False, default=False, type='bool')
         ),
         supports_check_mode=True
     )
@@ -132,14 +207,17 @@ def main():
     p = module.params
 
     # Handle multiple log files
-    logs = p["path"].split(",")
-    logs = filter(None, logs)
+    logs = []
+    for log in p["path"]:
+        if log and log not in logs:
+            logs.append(log)
 
     if p["state"] in ["present", "followed"]:
-        follow_log(module, le_path, logs, name=p['name'], logtype=p['logtype'])
+        follow_log(module, le_path, logs, name=p['name'], logtype=p['logtype'],
+                   config_path=p['config'], restart=p['restart_agent'])
 
     elif p["state"] in ["absent", "unfollowed"]:
-        unfollow_log(module, le_path, logs)
+        unfollow_log(module, le_path, logs, config_path=p['config'], restart=p['restart_agent'])
 
 # import module snippets
 from ansible.module_utils.basic import *
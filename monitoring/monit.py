@@ -30,8 +30,24 @@ options:
   name:
     description:
       - The name of the I(monit) program/process to manage
-    required: true
+      - One of C(name) or C(names) is required.
+    required: false
+    default: null
+  names:
+    description:
+      - A list of I(monit) programs/processes to bring to C(state) together.
+      - All actions are issued from a single C(monit summary) snapshot, then
+        the module polls the summary with backoff until every process has
+        reached C(state) or C(timeout) expires.
+    required: false
     default: null
+    version_added: "2.0"
+  timeout:
+    description:
+      - Seconds to wait for the processes in C(names) to reach C(state).
+    required: false
+    default: 300
+    version_added: "2.0"
   state:
     description:
       - The state of service
@@ -45,21 +61,126 @@ author: '"Darryl Stoflet (@dstoflet)" <stoflet@gmail.com>'
 EXAMPLES = '''
 # Manage the state of program "httpd" to be in "started" state.
 - monit: name=httpd state=started
+
+# Restart several programs at once and wait until all of them are running again.
+- monit:
+    names: [ 'app-web', 'app-worker', 'app-scheduler' ]
+    state: restarted
 '''
 
+import time
+
+# action needed to move a process towards a state, given whether it is running
+ACTIONS = {
+    'started': lambda running: not running and 'start',
+    'stopped': lambda running: running and 'stop',
+    'monitored': lambda running: not running and 'monitor',
+    'unmonitored': lambda running: running and 'unmonitor',
+    'restarted': lambda running: 'restart',
+}
+
+
+def parse_summary(out):
+    """Return a dict of process name to status from the output of monit summary."""
+    processes = {}
+    for line in out.split('\n'):
+        # Sample output lines:
+        # Process 'name'    Running
+        # Process 'name'    Running - restart pending
+        parts = line.split()
+        if len(parts) > 2 and parts[0].lower() == 'process':
+            processes[parts[1].strip("'")] = ' '.join(parts[2:]).lower()
+    return processes
+
+
+def reached(state, status):
+    """Whether a process status is the settled outcome of state."""
+    if 'pending' in status:
+        return False
+    if state in ['started', 'restarted']:
+        return status == 'running'
+    if state in ['stopped', 'unmonitored']:
+        return status == 'not monitored'
+    if state == 'monitored':
+        return status not in ['not monitored', 'initializing']
+    return True
+
+
+def converge(module, monit, names, state, timeout):
+    """Bring every process in names to state, working from one summary snapshot."""
+    def summary():
+        rc, out, err = module.run_command('%s summary' % monit, check_rc=True)
+        return parse_summary(out)
+
+    snapshot = summary()
+    missing = [name for name in names if name not in snapshot]
+    if missing and state == 'present':
+        if module.check_mode:
+            module.exit_json(changed=True, names=names, state=state)
+        module.run_command('%s reload' % monit, check_rc=True)
+        snapshot = summary()
+        missing = [name for name in names if name not in snapshot]
+        if missing:
+            module.fail_json(msg='processes not configured with monit: %s' % ', '.join(missing), names=names, state=state)
+        module.exit_json(changed=True, names=names, state=state, status=snapshot)
+    if missing:
+        module.fail_json(msg='processes not presently configured with monit: %s' % ', '.join(missing), names=names, state=state)
+    if state == 'present':
+        module.exit_json(changed=False, names=names, state=state)
+
+    actions = []
+    for name in names:
+        action = ACTIONS[state]('running' in snapshot[name])
+        if action:
+            actions.append((name, action))
+
+    if not actions:
+        module.exit_json(changed=False, names=names, state=state)
+    if module.check_mode:
+        module.exit_json(changed=True, names=names, state=state, actions=dict(actions))
+
+    for name, action in actions:
+        module.run_command('%s %s %s' % (monit, action, name), check_rc=True)
+
+    waiting = [name for name, action in actions]
+    deadline = time.time() + timeout
+    delay = 0.5
+    while True:
+        snapshot = summary()
+        waiting = [name for name in waiting if not reached(state, snapshot.get(name, ''))]
+        if not waiting or time.time() + delay > deadline:
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 10)
+
+    status = dict((name, snapshot.get(name, '')) for name in names)
+    if waiting:
+        module.fail_json(msg='processes did not reach state %s: %s' % (state, ', '.join(waiting)),
+                         names=names, state=state, status=status)
+    module.exit_json(changed=True, names=names, state=state, actions=dict(actions), status=status)
+
+
 def main():
     arg_spec = dict(
-        name=dict(required=True),
-        state=dict(required=True, choices=['present', 'started', 'restarted', 'stopped', 'monitored', 'unmonitored', 'reloaded'])
+        name=dict(required=False),
+        names=dict(required=False, type='list'),
+        state=dict(required=True, choices=['present', 'started', 'restarted', 'stopped', 'monitored', 'unmonitored', 'reloaded']),
+        timeout=dict(default=300, type='int'),
     )
 
-    module = AnsibleModule(argument_spec=arg_spec, supports_check_mode=True)
+    module = AnsibleModule(argument_spec=arg_spec,
+                           required_one_of=[['name', 'names']],
+                           mutually_exclusive=[['name', 'names']],
+                           supports_check_mode=True)
 
     name = module.params['name']
     state = module.params['state']
 
     MONIT = module.get_bin_path('monit', True)
 
+    if module.params['names'] and state != 'reloaded':
+        converge(module, MONIT, module.params['names'], state, module.params['timeout'])
+
     if state == 'reloaded':
         if module.check_mode:
             module.exit_json(changed=True)
@@ -71,22 +192,15 @@ def main():
     def status():
         """Return the status of the process in monit, or the empty string if not present."""
         rc, out, err = module.run_command('%s summary' % MONIT, check_rc=True)
-        for line in out.split('\n'):
-            # Sample output lines:
-            # Process 'name'    Running
-            # Process 'name'    Running - restart pending
-            parts = line.split()
-            if len(parts) > 2 and parts[0].lower() == 'process' and parts[1] == "'%s'" % name:
-                return ' '.join(parts[2:])
-        else:
-            return ''
+        return parse_summary(out).get(name, '')
 
     def run_command(command):
         """Runs a monit command, and returns the new status."""
         module.run_command('%s %s %s' % (MONIT, command, name), check_rc=True)
         return status()
 
-    present = status() != ''
+    current = status()
+    present = current != ''
 
     if not present and not state == 'present':
         module.fail_json(msg='%s process not presently configured with monit' % name, name=name, state=state)
@@ -102,7 +216,7 @@ def main():
                 module.exit_json(changed=True, name=name, state=state)
         module.exit_json(changed=False, name=name, state=state)
 
-    running = 'running' in status()
+    running = 'running' in current
 
     if running and state in ['started', 'monitored']:
         module.exit_json(changed=False, name=name, state=state)
@@ -62,6 +62,20 @@ options:
             - Zabbix user password. If not set environment variable
               C(ZABBIX_LOGIN_PASSWORD) is used.
         required: true
+    session_cache:
+        description:
+            - Path of a local file used to cache Zabbix API sessions across tasks, keyed by server_url and login_user.
+            - A cached session is checked with user.checkAuthentication before it is reused, so user.login only
+              runs when no valid session is cached. The file is only readable by its owner.
+        required: false
+        default: null
+        version_added: "2.0"
+    session_ttl:
+        description:
+            - Number of seconds a cached session is reused before logging in again.
+        required: false
+        default: 600
+        version_added: "2.0"
 notes:
     - The module has been tested with Zabbix Server 2.2.
 author: '"René Moser (@resmo)" <mail@renemoser.net>'
@@ -87,6 +101,12 @@ EXAMPLES = '''
                login_password=secure
 '''
 
+import hashlib
+import json
+import os
+import tempfile
+import time
+
 try:
     from zabbix_api import ZabbixAPI
     HAS_ZABBIX_API = True
@@ -142,6 +162,47 @@ def check_group(zbx, host_group):
     return 0, result, None
 
 
+# reuse a cached Zabbix API session when one is still valid, so that
+# user.login only runs when the cache is empty, expired or rejected
+def login_with_session_cache(zbx, server_url, login_user, login_password, cache_path=None, ttl=600):
+    if not cache_path:
+        zbx.login(login_user, login_password)
+        return
+
+    cache_path = os.path.expanduser(cache_path)
+    key = hashlib.sha1('%s|%s' % (server_url, login_user)).hexdigest()
+    now = time.time()
+    try:
+        cache = json.load(open(cache_path))
+    except (IOError, ValueError):
+        cache = {}
+
+    entry = cache.get(key)
+    if entry and entry.get('expires', 0) > now:
+        try:
+            request = zbx.json_obj('user.checkAuthentication', {'sessionid': entry['auth']}, auth=False)
+            if zbx.do_request(request).get('result'):
+                zbx.auth = entry['auth']
+                return
+        except Exception:
+            pass
+
+    zbx.login(login_user, login_password)
+    cache = dict((k, v) for k, v in cache.items() if v.get('expires', 0) > now)
+    cache[key] = {'auth': zbx.auth, 'expires': now + ttl}
+    try:
+        cache_dir = os.path.dirname(cache_path) or '.'
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        os.write(fd, json.dumps(cache))
+        os.close(fd)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        # if the cache cannot be written the next task simply logs in again
+        pass
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
@@ -150,6 +211,8 @@ def main():
             server_url=dict(default=None, aliases=['url']),
             login_user=dict(default=None),
             login_password=dict(default=None),
+            session_cache=dict(default=None),
+            session_ttl=dict(type='int', default=600),
         ),
         supports_check_mode=True,
     )
@@ -169,7 +232,8 @@ def main():
 
     try:
         zbx = ZabbixAPI(server_url)
-        zbx.login(login_user, login_password)
+        login_with_session_cache(zbx, server_url, login_user, login_password,
+                                 module.params['session_cache'], module.params['session_ttl'])
     except BaseException as e:
         module.fail_json(msg='Failed to connect to Zabbix server: %s' % e)
 
@@ -47,11 +47,24 @@ options:
         description:
             - Zabbix user password.
         required: true
+    session_cache:
+        description:
+            - Path of a local file used to cache Zabbix API sessions across tasks, keyed by server_url and login_user.
+            - A cached session is checked with user.checkAuthentication before it is reused, so user.login only
+              runs when no valid session is cached. The file is only readable by its owner.
+        required: false
+        default: null
+    session_ttl:
+        description:
+            - Number of seconds a cached session is reused before logging in again.
+        required: false
+        default: 600
     host_name:
         description:
             - Name of the host in Zabbix.
             - host_name is the unique identifier used and cannot be updated using this module.
-        required: true
+            - Required unless hosts is given.
+        required: false
     host_groups:
         description:
             - List of host groups the host is part of.
@@ -87,6 +100,15 @@ options:
             - 'https://www.zabbix.com/documentation/2.0/manual/appendix/api/hostinterface/definitions#host_interface'
         required: false
         default: []
+    hosts:
+        description:
+            - List of hosts to synchronise in a single task, each given as a dict taking the host_name, host_groups,
+              link_templates, status, state and interfaces options above.
+            - All groups and templates are resolved with one request each and all target hosts are fetched with a
+              single host.get; only the hosts that differ are created, updated (through host.massupdate) or deleted.
+            - Mutually exclusive with host_name.
+        required: false
+        default: None
 '''
 
 EXAMPLES = '''
@@ -118,10 +140,37 @@ EXAMPLES = '''
         ip: 10.xx.xx.xx
         dns: ""
         port: 12345
+
+- name: Synchronise a list of hosts from the inventory
+  local_action:
+    module: zabbix_host
+    server_url: http://monitor.example.com
+    login_user: username
+    login_password: password
+    hosts:
+      - host_name: web01
+        host_groups:
+          - Web servers
+        link_templates:
+          - Template OS Linux
+        interfaces:
+          - type: 1
+            main: 1
+            useip: 1
+            ip: 10.xx.xx.11
+            dns: ""
+            port: 10050
+      - host_name: web02
+        state: absent
 '''
 
 import logging
 import copy
+import hashlib
+import json
+import os
+import tempfile
+import time
 
 try:
     from zabbix_api import ZabbixAPI, ZabbixAPISubClass
@@ -336,6 +385,206 @@ class Host(object):
         except Exception, e:
             self._module.fail_json(msg="Failed to link template to host: %s" % e)
 
+    # resolve all group names with one request
+    def get_group_ids_by_names(self, group_names):
+        if not group_names:
+            return {}
+        group_list = self._zapi.hostgroup.get({'output': ['groupid', 'name'], 'filter': {'name': list(group_names)}})
+        group_ids = dict((group['name'], group['groupid']) for group in group_list)
+        missing = set(group_names) - set(group_ids)
+        if missing:
+            self._module.fail_json(msg="Hostgroup not found: %s" % ', '.join(sorted(missing)))
+        return group_ids
+
+    # resolve all template names with one request
+    def get_template_ids_by_names(self, template_names):
+        if not template_names:
+            return {}
+        template_list = self._zapi.template.get({'output': ['templateid', 'host'],
+                                                 'filter': {'host': list(template_names)}})
+        template_ids = dict((template['host'], template['templateid']) for template in template_list)
+        missing = set(template_names) - set(template_ids)
+        if missing:
+            self._module.fail_json(msg="Template not found: %s" % ', '.join(sorted(missing)))
+        return template_ids
+
+    # fetch the hosts with their groups, templates and interfaces in one request
+    def get_hosts_by_host_names(self, host_names):
+        if not host_names:
+            return {}
+        host_list = self._zapi.host.get({'output': 'extend',
+                                         'filter': {'host': list(host_names)},
+                                         'selectGroups': ['groupid', 'name'],
+                                         'selectParentTemplates': ['templateid'],
+                                         'selectInterfaces': 'extend'})
+        return dict((host['host'], host) for host in host_list)
+
+    # plan the interface changes of an existing host, matching interfaces by type like update_host
+    def diff_interfaces(self, host_id, interfaces, exist_interface_list):
+        update, create = [], []
+        if not interfaces:
+            return update, create, []
+        remaining = list(exist_interface_list)
+        for interface in interfaces:
+            interface = dict(interface)
+            match = None
+            for exist_interface in remaining:
+                if int(interface['type']) == int(exist_interface['type']):
+                    match = exist_interface
+                    break
+            if match:
+                remaining.remove(match)
+                if any(str(match.get(key)) != str(value) for key, value in interface.items()):
+                    interface['interfaceid'] = match['interfaceid']
+                    update.append(interface)
+            else:
+                interface['hostid'] = host_id
+                create.append(interface)
+        delete = [interface['interfaceid'] for interface in remaining]
+        return update, create, delete
+
+    def sync_hosts(self, hosts):
+        seen = set()
+        for entry in hosts:
+            if not isinstance(entry, dict) or not entry.get('host_name'):
+                self._module.fail_json(msg="Each entry in hosts requires a host_name.")
+            if entry['host_name'] in seen:
+                self._module.fail_json(msg="Host '%s' is listed more than once in hosts." % entry['host_name'])
+            seen.add(entry['host_name'])
+
+        present = [entry for entry in hosts if entry.get('state', 'present') != 'absent']
+        group_ids = self.get_group_ids_by_names(
+            set(name for entry in present for name in entry.get('host_groups') or []))
+        template_ids = self.get_template_ids_by_names(
+            set(name for entry in present for name in entry.get('link_templates') or []))
+        exist_hosts = self.get_hosts_by_host_names([entry['host_name'] for entry in hosts])
+
+        to_create, to_delete, unchanged = [], [], []
+        mass_updates = {}
+        interfaces_update, interfaces_create, interfaces_delete = [], [], []
+        updated = []
+
+        for entry in hosts:
+            host_name = entry['host_name']
+            exist_host = exist_hosts.get(host_name)
+            if entry.get('state', 'present') == 'absent':
+                if exist_host:
+                    to_delete.append(exist_host)
+                continue
+
+            host_groups = entry.get('host_groups') or []
+            if not host_groups:
+                self._module.fail_json(msg="Specify at least one group for host '%s'." % host_name)
+            status = 1 if entry.get('status', 'enabled') == 'disabled' else 0
+            interfaces = entry.get('interfaces') or []
+            wanted_templates = set(template_ids[name] for name in entry.get('link_templates') or [])
+
+            if not exist_host:
+                if not interfaces:
+                    self._module.fail_json(msg="Specify at least one interface for creating host '%s'." % host_name)
+                to_create.append({'host': host_name,
+                                  'interfaces': interfaces,
+                                  'groups': [{'groupid': group_ids[name]} for name in host_groups],
+                                  'templates': [{'templateid': template_id} for template_id in wanted_templates],
+                                  'status': status})
+                continue
+
+            host_id = exist_host['hostid']
+            exist_groups = set(group['name'] for group in exist_host['groups'])
+            exist_templates = set(template['templateid'] for template in exist_host['parentTemplates'])
+            changed = False
+
+            if (exist_groups != set(host_groups) or int(exist_host['status']) != status or
+                    exist_templates != wanted_templates):
+                # hosts needing the same groups, status and templates share one host.massupdate call
+                key = (tuple(sorted(group_ids[name] for name in host_groups)), status,
+                       tuple(sorted(wanted_templates)), tuple(sorted(exist_templates - wanted_templates)))
+                mass_updates.setdefault(key, []).append({'hostid': host_id})
+                changed = True
+
+            update, create, delete = self.diff_interfaces(host_id, interfaces, exist_host['interfaces'])
+            if update or create or delete:
+                interfaces_update.extend(update)
+                interfaces_create.extend(create)
+                interfaces_delete.extend(delete)
+                changed = True
+
+            if changed:
+                updated.append(host_name)
+            else:
+                unchanged.append(host_name)
+
+        result = dict(created=[host['host'] for host in to_create],
+                      updated=updated,
+                      deleted=[host['host'] for host in to_delete],
+                      unchanged=unchanged)
+        changed = bool(to_create or to_delete or updated)
+        if self._module.check_mode or not changed:
+            return changed, result
+
+        try:
+            if to_delete:
+                self._zapi.host.delete([{'hostid': host['hostid']} for host in to_delete])
+            if to_create:
+                self._zapi.host.create(to_create)
+            for (groups, status, templates, templates_clear), host_ids in mass_updates.items():
+                self._zapi.host.massupdate({'hosts': host_ids,
+                                            'groups': [{'groupid': group_id} for group_id in groups],
+                                            'status': status,
+                                            'templates': [{'templateid': template_id} for template_id in templates],
+                                            'templates_clear': [{'templateid': template_id}
+                                                                for template_id in templates_clear]})
+            if interfaces_create:
+                self._zapi.hostinterface.create(interfaces_create)
+            if interfaces_update:
+                self._zapi.hostinterface.update(interfaces_update)
+            if interfaces_delete:
+                self._zapi.hostinterface.delete(interfaces_delete)
+        except Exception, e:
+            self._module.fail_json(msg="Failed to synchronise hosts: %s" % e)
+        return changed, result
+
+
+# reuse a cached Zabbix API session when one is still valid, so that
+# user.login only runs when the cache is empty, expired or rejected
+def login_with_session_cache(zbx, server_url, login_user, login_password, cache_path=None, ttl=600):
+    if not cache_path:
+        zbx.login(login_user, login_password)
+        return
+
+    cache_path = os.path.expanduser(cache_path)
+    key = hashlib.sha1('%s|%s' % (server_url, login_user)).hexdigest()
+    now = time.time()
+    try:
+        cache = json.load(open(cache_path))
+    except (IOError, ValueError):
+        cache = {}
+
+    entry = cache.get(key)
+    if entry and entry.get('expires', 0) > now:
+        try:
+            request = zbx.json_obj('user.checkAuthentication', {'sessionid': entry['auth']}, auth=False)
+            if zbx.do_request(request).get('result'):
+                zbx.auth = entry['auth']
+                return
+        except Exception:
+            pass
+
+    zbx.login(login_user, login_password)
+    cache = dict((k, v) for k, v in cache.items() if v.get('expires', 0) > now)
+    cache[key] = {'auth': zbx.auth, 'expires': now + ttl}
+    try:
+        cache_dir = os.path.dirname(cache_path) or '.'
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        os.write(fd, json.dumps(cache))
+        os.close(fd)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        # this task already holds the session, an unwritable cache only costs the next task a user.login
+        pass
+
 
 def main():
     module = AnsibleModule(
@@ -343,7 +592,10 @@ def main():
             server_url=dict(required=True, aliases=['url']),
             login_user=dict(required=True),
             login_password=dict(required=True, no_log=True),
-            host_name=dict(required=True),
+            session_cache=dict(default=None),
+            session_ttl=dict(type='int', default=600),
+            host_name=dict(required=False),
+            hosts=dict(required=False, type='list'),
             host_groups=dict(required=False),
             link_templates=dict(required=False),
             status=dict(default="enabled", choices=['enabled', 'disabled']),
@@ -351,6 +603,8 @@ def main():
             timeout=dict(type='int', default=10),
             interfaces=dict(required=False)
         ),
+        required_one_of=[['host_name', 'hosts']],
+        mutually_exclusive=[['host_name', 'hosts']],
         supports_check_mode=True
     )
 
@@ -375,12 +629,17 @@ def main():
     # login to zabbix
     try:
         zbx = ZabbixAPIExtends(server_url, timeout=timeout)
-        zbx.login(login_user, login_password)
+        login_with_session_cache(zbx, server_url, login_user, login_password,
+                                 module.params['session_cache'], module.params['session_ttl'])
     except Exception, e:
         module.fail_json(msg="Failed to connect to Zabbix server: %s" % e)
 
     host = Host(module, zbx)
 
+    if module.params['hosts']:
+        changed, result = host.sync_hosts(module.params['hosts'])
+        module.exit_json(changed=changed, **result)
+
     template_ids = []
     if link_templates:
         template_ids = host.get_template_ids(link_templates)
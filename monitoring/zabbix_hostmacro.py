@@ -46,18 +46,50 @@ options:
         description:
             - Zabbix user password.
         required: true
+    session_cache:
+        description:
+            - Path of a local file used to cache Zabbix API sessions across tasks, keyed by server_url and login_user.
+            - A cached session is checked with user.checkAuthentication before it is reused, so user.login only
+              runs when no valid session is cached. The file is only readable by its owner.
+        required: false
+        default: null
+    session_ttl:
+        description:
+            - Number of seconds a cached session is reused before logging in again.
+        required: false
+        default: 600
     host_name:
         description:
             - Name of the host.
-        required: true
+            - Required unless host_names is given.
+        required: false
+    host_names:
+        description:
+            - List of hosts to manage the macros of, used with macros.
+        required: false
+        default: None
     macro_name:
         description:
             - Name of the host macro.
-        required: true
+            - Required unless macros is given.
+        required: false
     macro_value:
         description:
             - Value of the host macro.
-        required: true
+            - Required unless macros is given.
+        required: false
+    macros:
+        description:
+            - Dict of macro names and values to manage on every host given by host_name or host_names.
+            - All macros of the target hosts are fetched with a single usermacro.get and the changes are applied with
+              at most one usermacro.create, usermacro.update and usermacro.delete call.
+        required: false
+        default: None
+    exclusive:
+        description:
+            - When used with macros and state C(present), remove the host macros that are not listed in macros.
+        required: false
+        default: false
     state:
         description:
             - State of the macro.
@@ -83,10 +115,30 @@ EXAMPLES = '''
     macro_name:Example macro
     macro_value:Example value
     state: present
+
+- name: Ensure a set of macros on several hosts and remove any other host macro
+  local_action:
+    module: zabbix_hostmacro
+    server_url: http://monitor.example.com
+    login_user: username
+    login_password: password
+    host_names:
+      - ExampleHost1
+      - ExampleHost2
+    macros:
+      SNMP_COMMUNITY: public
+      MYSQL_PORT: 3306
+    exclusive: yes
+    state: present
 '''
 
 import logging
 import copy
+import hashlib
+import json
+import os
+import tempfile
+import time
 
 try:
     from zabbix_api import ZabbixAPI, ZabbixAPISubClass
@@ -168,18 +220,133 @@ class HostMacro(object):
         except Exception, e:
             self._module.fail_json(msg="Failed to delete host macro %s: %s" % (macro_name, e))
 
+    # get host ids by host names with one request
+    def get_host_ids(self, host_names):
+        try:
+            host_list = self._zapi.host.get({'output': ['hostid', 'host'], 'filter': {'host': host_names}})
+        except Exception, e:
+            self._module.fail_json(msg="Failed to get the host ids: %s." % e)
+        host_ids = dict((host['host'], host['hostid']) for host in host_list)
+        missing = set(host_names) - set(host_ids)
+        if missing:
+            self._module.fail_json(msg="Host not found: %s" % ', '.join(sorted(missing)))
+        return host_ids
+
+    # get all macros of the given hosts, indexed by host id and macro
+    def get_host_macros(self, host_ids):
+        try:
+            host_macro_list = self._zapi.usermacro.get({'output': 'extend', 'hostids': host_ids})
+        except Exception, e:
+            self._module.fail_json(msg="Failed to get host macros: %s" % e)
+        host_macros = dict((host_id, {}) for host_id in host_ids)
+        for host_macro in host_macro_list:
+            host_macros.setdefault(host_macro['hostid'], {})[host_macro['macro']] = host_macro
+        return host_macros
+
+    # reconcile a dict of macros on a list of hosts
+    def sync_host_macros(self, host_names, macros, state, exclusive):
+        macros = dict(('{$' + name.upper() + '}', str(value)) for name, value in macros.items())
+        host_ids = self.get_host_ids(host_names)
+        host_macros = self.get_host_macros(host_ids.values())
+
+        to_create, to_update, to_delete = [], [], []
+        changes = {}
+        for host_name, host_id in host_ids.items():
+            exist_macros = host_macros.get(host_id, {})
+            host_changes = {}
+            if state == 'absent':
+                for macro in macros:
+                    if macro in exist_macros:
+                        to_delete.append(exist_macros[macro]['hostmacroid'])
+                        host_changes[macro] = 'deleted'
+            else:
+                for macro, value in macros.items():
+                    if macro not in exist_macros:
+                        to_create.append({'hostid': host_id, 'macro': macro, 'value': value})
+                        host_changes[macro] = 'created'
+                    elif exist_macros[macro]['value'] != value:
+                        to_update.append({'hostmacroid': exist_macros[macro]['hostmacroid'], 'value': value})
+                        host_changes[macro] = 'updated'
+                if exclusive:
+                    for macro, host_macro in exist_macros.items():
+                        if macro not in macros:
+                            to_delete.append(host_macro['hostmacroid'])
+                            host_changes[macro] = 'deleted'
+            if host_changes:
+                changes[host_name] = host_changes
+
+        if changes and not self._module.check_mode:
+            try:
+                if to_delete:
+                    self._zapi.usermacro.delete(to_delete)
+                if to_update:
+                    self._zapi.usermacro.update(to_update)
+                if to_create:
+                    self._zapi.usermacro.create(to_create)
+            except Exception, e:
+                self._module.fail_json(msg="Failed to update host macros: %s" % e)
+        return changes
+
+# reuse a cached Zabbix API session when one is still valid, so that
+# user.login only runs when the cache is empty, expired or rejected
+def login_with_session_cache(zbx, server_url, login_user, login_password, cache_path=None, ttl=600):
+    if not cache_path:
+        zbx.login(login_user, login_password)
+        return
+
+    cache_path = os.path.expanduser(cache_path)
+    key = hashlib.sha1('%s|%s' % (server_url, login_user)).hexdigest()
+    now = time.time()
+    try:
+        cache = json.load(open(cache_path))
+    except (IOError, ValueError):
+        cache = {}
+
+    entry = cache.get(key)
+    if entry and entry.get('expires', 0) > now:
+        try:
+            request = zbx.json_obj('user.checkAuthentication', {'sessionid': entry['auth']}, auth=False)
+            if zbx.do_request(request).get('result'):
+                zbx.auth = entry['auth']
+                return
+        except Exception:
+            pass
+
+    zbx.login(login_user, login_password)
+    cache = dict((k, v) for k, v in cache.items() if v.get('expires', 0) > now)
+    cache[key] = {'auth': zbx.auth, 'expires': now + ttl}
+    try:
+        cache_dir = os.path.dirname(cache_path) or '.'
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        os.write(fd, json.dumps(cache))
+        os.close(fd)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        # carry on without caching, the following task will do its own user.login
+        pass
+
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
             server_url=dict(required=True, aliases=['url']),
             login_user=dict(required=True),
             login_password=dict(required=True, no_log=True),
-            host_name=dict(required=True),
-            macro_name=dict(required=True),
-            macro_value=dict(required=True),
+            session_cache=dict(default=None),
+            session_ttl=dict(type='int', default=600),
+            host_name=dict(required=False),
+            host_names=dict(required=False, type='list'),
+            macro_name=dict(required=False),
+            macro_value=dict(required=False),
+            macros=dict(required=False, type='dict'),
+            exclusive=dict(type='bool', default=False),
             state=dict(default="present", choices=['present', 'absent']),
             timeout=dict(type='int', default=10)
         ),
+        required_one_of=[['host_name', 'host_names'], ['macro_name', 'macros']],
+        mutually_exclusive=[['macro_name', 'macros']],
         supports_check_mode=True
     )
 
@@ -190,7 +357,9 @@ def main():
     login_user = module.params['login_user']
     login_password = module.params['login_password']
     host_name = module.params['host_name']
-    macro_name  = (module.params['macro_name']).upper()
+    host_names = module.params['host_names'] or []
+    macros = module.params['macros']
+    macro_name = module.params['macro_name']
     macro_value = module.params['macro_value']
     state = module.params['state']
     timeout = module.params['timeout']
@@ -199,12 +368,27 @@ def main():
     # login to zabbix
     try:
         zbx = ZabbixAPIExtends(server_url, timeout=timeout)
-        zbx.login(login_user, login_password)
+        login_with_session_cache(zbx, server_url, login_user, login_password,
+                                 module.params['session_cache'], module.params['session_ttl'])
     except Exception, e:
         module.fail_json(msg="Failed to connect to Zabbix server: %s" % e)
 
     host_macro_class_obj = HostMacro(module, zbx)
 
+    if macros is not None:
+        if host_name and host_name not in host_names:
+            host_names.append(host_name)
+        changes = host_macro_class_obj.sync_host_macros(host_names, macros, state, module.params['exclusive'])
+        module.exit_json(changed=bool(changes), changes=changes)
+
+    if not host_name:
+        module.fail_json(msg="host_name is required when managing a single macro")
+    if not macro_name:
+        module.fail_json(msg="macro_name is required when managing a single macro")
+    if macro_value is None and state == 'present':
+        module.fail_json(msg="macro_value is required when managing a single macro")
+    macro_name = macro_name.upper()
+
     changed = False
 
     if host_name:
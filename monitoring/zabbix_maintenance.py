@@ -52,6 +52,20 @@ options:
         description:
             - Zabbix user password.
         required: true
+    session_cache:
+        description:
+            - Path of a local file used to cache Zabbix API sessions across tasks, keyed by server_url and login_user.
+            - A cached session is checked with user.checkAuthentication before it is reused, so user.login only
+              runs when no valid session is cached. The file is only readable by its owner.
+        required: false
+        default: null
+        version_added: "2.0"
+    session_ttl:
+        description:
+            - Number of seconds a cached session is reused before logging in again.
+        required: false
+        default: 600
+        version_added: "2.0"
     host_names:
         description:
             - Hosts to manage maintenance window for.
@@ -99,6 +113,10 @@ notes:
       you will get strange results.
     - Install required module with 'pip install zabbix-api' command.
     - Checks existance only by maintenance name.
+    - An existing maintenance window is compared field by field (hosts,
+      groups, type, description and time period) and updated in place
+      only when it differs. Its time period is renewed from now() when
+      the window has expired or its length changed.
 '''
 
 EXAMPLES = '''
@@ -142,6 +160,10 @@ EXAMPLES = '''
 
 import datetime
 import time
+import hashlib
+import json
+import os
+import tempfile
 
 try:
     from zabbix_api import ZabbixAPI
@@ -215,51 +237,164 @@ def check_maintenance(zbx, name):
 
 
 def get_group_ids(zbx, host_groups):
-    group_ids = []
-    for group in host_groups:
-        try:
-            result = zbx.hostgroup.get(
+    try:
+        result = zbx.hostgroup.get(
+            {
+                "output": ["groupid", "name"],
+                "filter":
                 {
-                    "output": "extend",
-                    "filter":
-                    {
-                        "name": group
-                    }
+                    "name": host_groups
                 }
-            )
-        except BaseException as e:
-            return 1, None, str(e)
+            }
+        )
+    except BaseException as e:
+        return 1, None, str(e)
 
-        if not result:
+    groups = dict((group["name"], group["groupid"]) for group in result)
+    for group in host_groups:
+        if group not in groups:
             return 1, None, "Group id for group %s not found" % group
 
-        group_ids.append(result[0]["groupid"])
-
-    return 0, group_ids, None
+    return 0, [groups[group] for group in host_groups], None
 
 
 def get_host_ids(zbx, host_names):
-    host_ids = []
-    for host in host_names:
-        try:
-            result = zbx.host.get(
+    try:
+        result = zbx.host.get(
+            {
+                "output": ["hostid", "name"],
+                "filter":
                 {
-                    "output": "extend",
-                    "filter":
-                    {
-                        "name": host
-                    }
+                    "name": host_names
                 }
-            )
-        except BaseException as e:
-            return 1, None, str(e)
+            }
+        )
+    except BaseException as e:
+        return 1, None, str(e)
 
-        if not result:
+    hosts = dict((host["name"], host["hostid"]) for host in result)
+    for host in host_names:
+        if host not in hosts:
             return 1, None, "Host id for host %s not found" % host
 
-        host_ids.append(result[0]["hostid"])
+    return 0, [hosts[host] for host in host_names], None
 
-    return 0, host_ids, None
+
+def get_maintenance(zbx, name):
+    try:
+        result = zbx.maintenance.get(
+            {
+                "output": "extend",
+                "selectGroups": ["groupid"],
+                "selectHosts": ["hostid"],
+                "selectTimeperiods": "extend",
+                "filter":
+                {
+                    "name": name,
+                }
+            }
+        )
+    except BaseException as e:
+        return 1, None, str(e)
+
+    if not result:
+        return 0, None, None
+    return 0, result[0], None
+
+
+# returns the fields of an existing maintenance that differ from the requested ones
+def diff_maintenance(maintenance, group_ids, host_ids, start_time, maintenance_type, period, desc):
+    differences = []
+    if set(group["groupid"] for group in maintenance.get("groups", [])) != set(group_ids):
+        differences.append("groups")
+    if set(host["hostid"] for host in maintenance.get("hosts", [])) != set(host_ids):
+        differences.append("hosts")
+    if int(maintenance["maintenance_type"]) != maintenance_type:
+        differences.append("maintenance_type")
+    if maintenance.get("description", "") != desc:
+        differences.append("description")
+    periods = maintenance.get("timeperiods", [])
+    # only a single one time period is what this module creates, anything
+    # recurring has to be replaced through the renew path
+    if (len(periods) != 1 or int(periods[0]["timeperiod_type"]) != 0 or
+            int(periods[0]["period"]) != period or int(maintenance["active_till"]) <= start_time):
+        differences.append("timeperiods")
+    return differences
+
+
+def update_maintenance(zbx, maintenance, group_ids, host_ids, start_time, maintenance_type, period, desc,
+                       renew_period):
+    if renew_period:
+        active_since = str(start_time)
+        active_till = str(start_time + period)
+        timeperiods = [{
+            "timeperiod_type": "0",
+            "start_date": str(start_time),
+            "period": str(period),
+        }]
+    else:
+        active_since = maintenance["active_since"]
+        active_till = maintenance["active_till"]
+        # maintenance.update replaces the periods, so send the existing ones back whole
+        timeperiods = [dict((key, value) for key, value in timeperiod.items() if key != "timeperiodid")
+                       for timeperiod in maintenance["timeperiods"]]
+    try:
+        zbx.maintenance.update(
+            {
+                "maintenanceid": maintenance["maintenanceid"],
+                "groupids": group_ids,
+                "hostids": host_ids,
+                "maintenance_type": maintenance_type,
+                "active_since": active_since,
+                "active_till": active_till,
+                "description": desc,
+                "timeperiods": timeperiods,
+            }
+        )
+    except BaseException as e:
+        return 1, None, str(e)
+    return 0, None, None
+
+
+# reuse a cached Zabbix API session when one is still valid, so that
+# user.login only runs when the cache is empty, expired or rejected
+def login_with_session_cache(zbx, server_url, login_user, login_password, cache_path=None, ttl=600):
+    if not cache_path:
+        zbx.login(login_user, login_password)
+        return
+
+    cache_path = os.path.expanduser(cache_path)
+    key = hashlib.sha1('%s|%s' % (server_url, login_user)).hexdigest()
+    now = time.time()
+    try:
+        cache = json.load(open(cache_path))
+    except (IOError, ValueError):
+        cache = {}
+
+    entry = cache.get(key)
+    if entry and entry.get('expires', 0) > now:
+        try:
+            request = zbx.json_obj('user.checkAuthentication', {'sessionid': entry['auth']}, auth=False)
+            if zbx.do_request(request).get('result'):
+                zbx.auth = entry['auth']
+                return
+        except Exception:
+            pass
+
+    zbx.login(login_user, login_password)
+    cache = dict((k, v) for k, v in cache.items() if v.get('expires', 0) > now)
+    cache[key] = {'auth': zbx.auth, 'expires': now + ttl}
+    try:
+        cache_dir = os.path.dirname(cache_path) or '.'
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        os.write(fd, json.dumps(cache))
+        os.close(fd)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        # an unsaved session costs one extra user.login later, not worth failing the maintenance window over
+        pass
 
 
 def main():
@@ -272,6 +407,8 @@ def main():
             host_groups=dict(type='list', required=False, default=None, aliases=['host_group']),
             login_user=dict(required=True),
             login_password=dict(required=True, no_log=True),
+            session_cache=dict(default=None),
+            session_ttl=dict(type='int', default=600),
             name=dict(required=True),
             desc=dict(required=False, default="Created by Ansible"),
             collect_data=dict(type='bool', required=False, default=True),
@@ -299,7 +436,8 @@ def main():
 
     try:
         zbx = ZabbixAPI(server_url)
-        zbx.login(login_user, login_password)
+        login_with_session_cache(zbx, server_url, login_user, login_password,
+                                 module.params['session_cache'], module.params['session_ttl'])
     except BaseException as e:
         module.fail_json(msg="Failed to connect to Zabbix server: %s" % e)
 
@@ -308,7 +446,7 @@ def main():
     if state == "present":
 
         now = datetime.datetime.now()
-        start_time = time.mktime(now.timetuple())
+        start_time = int(time.mktime(now.timetuple()))
         period = 60 * int(minutes)  # N * 60 seconds
 
         if host_groups:
@@ -325,11 +463,11 @@ def main():
         else:
             host_ids = []
 
-        (rc, exists, error) = check_maintenance(zbx, name)
+        (rc, maintenance, error) = get_maintenance(zbx, name)
         if rc != 0:
             module.fail_json(msg="Failed to check maintenance %s existance: %s" % (name, error))
 
-        if not exists:
+        if not maintenance:
             if not host_names and not host_groups:
                 module.fail_json(msg="At least one host_name or host_group must be defined for each created maintenance.")
 
@@ -341,6 +479,19 @@ def main():
                     changed = True
                 else:
                     module.fail_json(msg="Failed to create maintenance: %s" % error)
+        elif host_names or host_groups:
+            differences = diff_maintenance(maintenance, group_ids, host_ids, start_time, maintenance_type, period, desc)
+            if differences:
+                if module.check_mode:
+                    changed = True
+                else:
+                    (rc, _, error) = update_maintenance(zbx, maintenance, group_ids, host_ids, start_time,
+                                                        maintenance_type, period, desc,
+                                                        "timeperiods" in differences)
+                    if rc == 0:
+                        changed = True
+                    else:
+                        module.fail_json(msg="Failed to update maintenance: %s" % error)
 
     if state == "absent":
 
@@ -48,6 +48,18 @@ options:
         description:
             - Zabbix user password.
         required: true
+    session_cache:
+        description:
+            - Path of a local file used to cache Zabbix API sessions across tasks, keyed by server_url and login_user.
+            - A cached session is checked with user.checkAuthentication before it is reused, so user.login only
+              runs when no valid session is cached. The file is only readable by its owner.
+        required: false
+        default: null
+    session_ttl:
+        description:
+            - Number of seconds a cached session is reused before logging in again.
+        required: false
+        default: 600
     timeout:
         description:
             - The timeout of API request (seconds).
@@ -127,10 +139,15 @@ EXAMPLES = '''
   when: inventory_hostname==groups['group_name'][0]
 '''
 
+import hashlib
+import json
+import os
+import tempfile
+import time
+
 try:
     from zabbix_api import ZabbixAPI, ZabbixAPISubClass
     from zabbix_api import ZabbixAPIException
-    from zabbix_api import Already_Exists
     HAS_ZABBIX_API = True
 except ImportError:
     HAS_ZABBIX_API = False
@@ -188,22 +205,24 @@ class Screen(object):
         except Exception as e:
             self._module.fail_json(msg="Failed to get screen %s from Zabbix: %s" % (screen_name, e))
 
-    # create screen
-    def create_screen(self, screen_name, h_size, v_size):
+    # create screen together with its items
+    def create_screen(self, screen_name, h_size, v_size, screen_items):
         try:
             if self._module.check_mode:
                 self._module.exit_json(changed=True)
-            screen = self._zapi.screen.create({'name': screen_name, 'hsize': h_size, 'vsize': v_size})
+            screen = self._zapi.screen.create({'name': screen_name, 'hsize': h_size, 'vsize': v_size,
+                                               'screenitems': screen_items})
             return screen['screenids'][0]
         except Exception as e:
             self._module.fail_json(msg="Failed to create screen %s: %s" % (screen_name, e))
 
-    # update screen
-    def update_screen(self, screen_id, screen_name, h_size, v_size):
+    # update screen, replacing all of its items
+    def update_screen(self, screen_id, screen_name, h_size, v_size, screen_items):
         try:
             if self._module.check_mode:
                 self._module.exit_json(changed=True)
-            self._zapi.screen.update({'screenid': screen_id, 'hsize': h_size, 'vsize': v_size})
+            self._zapi.screen.update({'screenid': screen_id, 'hsize': h_size, 'vsize': v_size,
+                                      'screenitems': screen_items})
         except Exception as e:
             self._module.fail_json(msg="Failed to update screen %s: %s" % (screen_name, e))
 
@@ -218,29 +237,29 @@ class Screen(object):
 
     # get graph ids
     def get_graph_ids(self, hosts, graph_name_list):
-        graph_id_lists = []
+        host_graph_ids = self.get_graphs_by_host_ids(graph_name_list, hosts)
         vsize = 1
         for host in hosts:
-            graph_id_list = self.get_graphs_by_host_id(graph_name_list, host)
-            size = len(graph_id_list)
-            if size > 0:
-                graph_id_lists.extend(graph_id_list)
-                if vsize < size:
-                    vsize = size
-        return graph_id_lists, vsize
-
-    #  getGraphs
-    def get_graphs_by_host_id(self, graph_name_list, host_id):
-        graph_ids = []
-        for graph_name in graph_name_list:
-            graphs_list = self._zapi.graph.get({'output': 'extend', 'search': {'name': graph_name}, 'hostids': host_id})
-            graph_id_list = []
-            if len(graphs_list) > 0:
-                for graph in graphs_list:
-                    graph_id = graph['graphid']
-                    graph_id_list.append(graph_id)
-            if len(graph_id_list) > 0:
-                graph_ids.extend(graph_id_list)
+            size = len(host_graph_ids[host])
+            if vsize < size:
+                vsize = size
+        return host_graph_ids, vsize
+
+    # get the graphs of all the hosts with one request and match the names locally,
+    # keeping the order of graph_name_list for every host
+    def get_graphs_by_host_ids(self, graph_name_list, host_ids):
+        graphs_list = self._zapi.graph.get({'output': ['graphid', 'name'], 'hostids': host_ids,
+                                            'selectHosts': ['hostid']})
+        host_graphs = dict((host_id, []) for host_id in host_ids)
+        for graph in graphs_list:
+            for host in graph.get('hosts', []):
+                if host['hostid'] in host_graphs:
+                    host_graphs[host['hostid']].append(graph)
+
+        graph_ids = {}
+        for host_id, graphs in host_graphs.items():
+            graph_ids[host_id] = [graph['graphid'] for graph_name in graph_name_list for graph in graphs
+                                  if graph_name.lower() in graph['name'].lower()]
         return graph_ids
 
     # get screen items
@@ -276,8 +295,8 @@ class Screen(object):
             v_size = (v_size - 1) / h_size + 1
         return h_size, v_size
 
-    # create screen_items
-    def create_screen_items(self, screen_id, hosts, graph_name_list, width, height, h_size):
+    # build the screen items for all the hosts' graphs
+    def get_screen_items_for_hosts(self, hosts, host_graph_ids, width, height, h_size):
         if len(hosts) < 4:
             if width is None or width < 0:
                 width = 500
@@ -287,30 +306,73 @@ class Screen(object):
         if height is None or height < 0:
             height = 100
 
+        screen_items = []
+        for i, host in enumerate(hosts):
+            for j, graph_id in enumerate(host_graph_ids[host]):
+                if graph_id is None:
+                    continue
+                # when there're only one host, only one row is not good.
+                if len(hosts) == 1:
+                    x, y = j % h_size, j / h_size
+                else:
+                    x, y = i, j
+                screen_items.append({'resourcetype': 0, 'resourceid': graph_id,
+                                     'width': width, 'height': height,
+                                     'x': x, 'y': y, 'colspan': 1, 'rowspan': 1,
+                                     'elements': 0, 'valign': 0, 'halign': 0,
+                                     'style': 0, 'dynamic': 0, 'sort_triggers': 0})
+        return screen_items
+
+    # compare the existing screen items with the wanted ones, ignoring their order
+    def is_screen_items_changed(self, exist_screen_items, screen_items):
+        keys = ('resourcetype', 'resourceid', 'x', 'y', 'width', 'height', 'colspan', 'rowspan')
+
+        def index(items):
+            return sorted(tuple(str(item[key]) for key in keys) for item in items)
+
+        return index(exist_screen_items) != index(screen_items)
+
+
+# reuse a cached Zabbix API session when one is still valid, so that
+# user.login only runs when the cache is empty, expired or rejected
+def login_with_session_cache(zbx, server_url, login_user, login_password, cache_path=None, ttl=600):
+    if not cache_path:
+        zbx.login(login_user, login_password)
+        return
+
+    cache_path = os.path.expanduser(cache_path)
+    key = hashlib.sha1('%s|%s' % (server_url, login_user)).hexdigest()
+    now = time.time()
+    try:
+        cache = json.load(open(cache_path))
+    except (IOError, ValueError):
+        cache = {}
+
+    entry = cache.get(key)
+    if entry and entry.get('expires', 0) > now:
         try:
-            # when there're only one host, only one row is not good.
-            if len(hosts) == 1:
-                graph_id_list = self.get_graphs_by_host_id(graph_name_list, hosts[0])
-                for i, graph_id in enumerate(graph_id_list):
-                    if graph_id is not None:
-                        self._zapi.screenitem.create({'screenid': screen_id, 'resourcetype': 0, 'resourceid': graph_id,
-                                                      'width': width, 'height': height,
-                                                      'x': i % h_size, 'y': i / h_size, 'colspan': 1, 'rowspan': 1,
-                                                      'elements': 0, 'valign': 0, 'halign': 0,
-                                                      'style': 0, 'dynamic': 0, 'sort_triggers': 0})
-            else:
-                for i, host in enumerate(hosts):
-                    graph_id_list = self.get_graphs_by_host_id(graph_name_list, host)
-                    for j, graph_id in enumerate(graph_id_list):
-                        if graph_id is not None:
-                            self._zapi.screenitem.create({'screenid': screen_id, 'resourcetype': 0, 'resourceid': graph_id,
-                                                          'width': width, 'height': height,
-                                                          'x': i, 'y': j, 'colspan': 1, 'rowspan': 1,
-                                                          'elements': 0, 'valign': 0, 'halign': 0,
-                                                          'style': 0, 'dynamic': 0, 'sort_triggers': 0})
-        except Already_Exists:
+            request = zbx.json_obj('user.checkAuthentication', {'sessionid': entry['auth']}, auth=False)
+            if zbx.do_request(request).get('result'):
+                zbx.auth = entry['auth']
+                return
+        except Exception:
             pass
 
+    zbx.login(login_user, login_password)
+    cache = dict((k, v) for k, v in cache.items() if v.get('expires', 0) > now)
+    cache[key] = {'auth': zbx.auth, 'expires': now + ttl}
+    try:
+        cache_dir = os.path.dirname(cache_path) or '.'
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        os.write(fd, json.dumps(cache))
+        os.close(fd)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError):
+        # the screen is still built, later tasks just will not find this session to reuse
+        pass
+
 
 def main():
     module = AnsibleModule(
@@ -318,6 +380,8 @@ def main():
             server_url=dict(required=True, aliases=['url']),
             login_user=dict(required=True),
             login_password=dict(required=True, no_log=True),
+            session_cache=dict(default=None),
+            session_ttl=dict(type='int', default=600),
             timeout=dict(type='int', default=10),
             screens=dict(type='dict', required=True)
         ),
@@ -337,7 +401,8 @@ def main():
     # login to zabbix
     try:
         zbx = ZabbixAPIExtends(server_url, timeout=timeout)
-        zbx.login(login_user, login_password)
+        login_with_session_cache(zbx, server_url, login_user, login_password,
+                                 module.params['session_cache'], module.params['session_ttl'])
     except Exception, e:
         module.fail_json(msg="Failed to connect to Zabbix server: %s" % e)
 
@@ -374,33 +439,21 @@ def main():
             host_group_id = screen.get_host_group_id(host_group)
             hosts = screen.get_host_ids_by_group_id(host_group_id)
 
-            screen_item_id_list = []
-            resource_id_list = []
-
-            graph_ids, v_size = screen.get_graph_ids(hosts, graph_names)
+            host_graph_ids, v_size = screen.get_graph_ids(hosts, graph_names)
             h_size, v_size = screen.get_hsize_vsize(hosts, v_size)
+            screen_items = screen.get_screen_items_for_hosts(hosts, host_graph_ids, graph_width, graph_height, h_size)
 
             if not screen_id:
                 # create screen
-                screen_id = screen.create_screen(screen_name, h_size, v_size)
-                screen.create_screen_items(screen_id, hosts, graph_names, graph_width, graph_height, h_size)
+                screen.create_screen(screen_name, h_size, v_size, screen_items)
                 created_screens.append(screen_name)
             else:
                 screen_item_list = screen.get_screen_items(screen_id)
 
-                for screen_item in screen_item_list:
-                    screen_item_id = screen_item['screenitemid']
-                    resource_id = screen_item['resourceid']
-                    screen_item_id_list.append(screen_item_id)
-                    resource_id_list.append(resource_id)
-
                 # when the screen items changed, then update
-                if graph_ids != resource_id_list:
-                    deleted = screen.delete_screen_items(screen_id, screen_item_id_list)
-                    if deleted:
-                        screen.update_screen(screen_id, screen_name, h_size, v_size)
-                        screen.create_screen_items(screen_id, hosts, graph_names, graph_width, graph_height, h_size)
-                        changed_screens.append(screen_name)
+                if screen.is_screen_items_changed(screen_item_list, screen_items):
+                    screen.update_screen(screen_id, screen_name, h_size, v_size, screen_items)
+                    changed_screens.append(screen_name)
 
     if created_screens and changed_screens:
         module.exit_json(changed=True, result="Successfully created screen(s): %s, and updated screen(s): %s" % (",".join(created_screens), ",".join(changed_screens)))
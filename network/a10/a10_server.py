@@ -56,7 +56,8 @@ options:
   server_name:
     description:
       - slb server name
-    required: true
+      - One of C(server_name) or C(servers) is required.
+    required: false
     default: null
     aliases: ['server']
     choices: []
@@ -91,6 +92,31 @@ options:
     default: present
     aliases: []
     choices: ['present', 'absent']
+  servers:
+    description:
+      - A list of servers to manage in one task. Each item is a dictionary with C(name:),
+        C(ip:) and C(ports:) (as in C(server_ports)), and optionally C(status:) and
+        C(state:), which default to C(server_status) and C(state). All servers on the
+        device are read with one call and only the servers that differ are changed.
+    required: false
+    default: null
+    version_added: "2.0"
+  session_cache:
+    description:
+      - Path of a local file used to share aXAPI sessions across tasks, keyed by device and username.
+        A cached session is checked before it is reused and left open at the end of the task, so
+        consecutive tasks do not each open an admin session on the device. Expired sessions are
+        closed on the device before a new one is opened. The file is locked through a companion
+        C(.lock) file while a session is looked up or opened, so parallel hosts share one session.
+    required: false
+    default: null
+    version_added: "2.0"
+  session_ttl:
+    description:
+      - Number of seconds a cached session is reused. Keep it below the idle timeout of the device.
+    required: false
+    default: 300
+    version_added: "2.0"
 '''
 
 EXAMPLES = '''
@@ -107,9 +133,136 @@ EXAMPLES = '''
       - port_num: 8443
         protocol: TCP
 
+# Create or update several servers, reusing the aXAPI session of earlier tasks
+- a10_server:
+    host: a10.mydomain.com
+    username: myadmin
+    password: mypassword
+    session_cache: ~/.ansible/a10_sessions
+    servers:
+      - name: web01
+        ip: 1.1.1.101
+        ports:
+          - port_num: 8080
+            protocol: tcp
+      - name: web02
+        ip: 1.1.1.102
+        status: disabled
+        ports:
+          - port_num: 8080
+            protocol: tcp
+      - name: web03
+        state: absent
+
 '''
 
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+
+
+def axapi_close_session(module, base_url, session_id):
+    '''
+    Closes a session on the device, ignoring devices that cannot be reached.
+    '''
+    fetch_url(module, base_url + '&session_id=' + session_id + '&method=session.close')
+
+
+def axapi_open_session(module, base_url, username, password, cache_path=None, ttl=300):
+    '''
+    Returns (session url, cached), reusing a session cached by an earlier task
+    when cache_path is set. A cached session must be left open at the end.
+    The cache is locked from the lookup until the new session is recorded,
+    so tasks managing servers on several hosts at once share one session per
+    device and user. Expired sessions of every device in the cache are
+    closed before they are dropped from it.
+    '''
+    if not cache_path:
+        return axapi_authenticate(module, base_url, username, password), False
+
+    cache_path = os.path.expanduser(cache_path)
+    cache_dir = os.path.dirname(cache_path) or '.'
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        lock = open(cache_path + '.lock', 'a')
+    except (IOError, OSError), e:
+        module.fail_json(msg="unable to lock session cache %s: %s" % (cache_path, e))
+
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+        try:
+            cache = json.load(open(cache_path))
+        except (IOError, ValueError):
+            cache = {}
+
+        key = hashlib.sha1('%s|%s' % (base_url, username)).hexdigest()
+        now = time.time()
+        entry = cache.get(key)
+        if entry and entry.get('expires', 0) > now:
+            session_url = base_url + '&session_id=' + entry['session_id']
+            result = axapi_call(module, session_url + '&method=system.information.get')
+            if not axapi_failure(result):
+                return session_url, True
+            del cache[key]
+
+        for entry_key, entry in cache.items():
+            if entry.get('expires', 0) <= now:
+                entry_base_url = entry.get('base_url')
+                if entry_key == key:
+                    entry_base_url = base_url
+                if entry_base_url:
+                    axapi_close_session(module, entry_base_url, entry['session_id'])
+                del cache[entry_key]
+
+        session_url = axapi_authenticate(module, base_url, username, password)
+        cache[key] = {'base_url': base_url,
+                      'session_id': session_url.split('&session_id=', 1)[1],
+                      'expires': now + ttl}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            os.write(fd, json.dumps(cache))
+            os.close(fd)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            # the servers are still synced over this session, it is just closed at the end like an uncached one
+            return session_url, False
+        return session_url, True
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+
+def axapi_get_all(module, session_url, method, list_key):
+    '''
+    Fetches every object of a type with one getAll call, indexed by name.
+    '''
+    result = axapi_call(module, session_url + '&method=' + method)
+    if axapi_failure(result):
+        module.fail_json(msg="failed to list objects: %s" % result['response']['err']['msg'])
+    return dict((item['name'], item) for item in result.get(list_key, []))
+
+
+def ports_differ(src_ports, dst_ports, key, fields):
+    '''
+    Indexes both port lists by key and reports whether their key sets or any
+    of the given fields differ.
+    '''
+    src = dict((port[key], port) for port in src_ports)
+    dst = dict((port[key], port) for port in dst_ports)
+    if set(src) != set(dst):
+        return True
+    for port_key, port in src.items():
+        for field in fields:
+            if port.get(field) != dst[port_key].get(field):
+                return True
+    return False
+
+
 VALID_PORT_FIELDS = ['port_num', 'protocol', 'status']
+VALID_SERVER_FIELDS = ['name', 'ip', 'status', 'ports', 'state']
 
 def validate_ports(module, ports):
     for item in ports:
@@ -144,21 +297,80 @@ def validate_ports(module, ports):
             item['status'] = 1
 
 
+def sync_servers(module, session_url, servers, default_status, default_state):
+    '''
+    Creates, updates or deletes the listed servers, comparing them against a
+    single getAll of the servers on the device.
+    '''
+    existing = axapi_get_all(module, session_url, 'slb.server.getAll', 'server_list')
+    changes = dict(created=[], updated=[], deleted=[])
+
+    for item in servers:
+        for key in item:
+            if key not in VALID_SERVER_FIELDS:
+                module.fail_json(msg="invalid server field (%s), must be one of: %s" % (key, ','.join(VALID_SERVER_FIELDS)))
+        if not item.get('name'):
+            module.fail_json(msg="server definitions must define the name field")
+
+        name = item['name']
+        current = existing.get(name)
+        if item.get('state', default_state) == 'absent':
+            if current:
+                result = axapi_call(module, session_url + '&method=slb.server.delete', json.dumps({'name': name}))
+                if axapi_failure(result):
+                    module.fail_json(msg="failed to delete the server %s: %s" % (name, result['response']['err']['msg']))
+                changes['deleted'].append(name)
+            continue
+
+        ports = item.get('ports') or []
+        validate_ports(module, ports)
+        server = {
+            'name': name,
+            'host': item.get('ip'),
+            'status': axapi_enabled_disabled(item.get('status', default_status)),
+            'port_list': ports,
+        }
+
+        if not current:
+            if not server['host']:
+                module.fail_json(msg='you must specify an IP address when creating the server %s' % name)
+            method, change = 'slb.server.create', 'created'
+        else:
+            if not server['host']:
+                server['host'] = current.get('host')
+            if (server['host'] == current.get('host') and server['status'] == current.get('status') and
+                    not ports_differ(ports, current.get('port_list', []), 'port_num', VALID_PORT_FIELDS)):
+                continue
+            method, change = 'slb.server.update', 'updated'
+
+        result = axapi_call(module, session_url + '&method=' + method, json.dumps({'server': server}))
+        if axapi_failure(result):
+            module.fail_json(msg="failed to update the server %s: %s" % (name, result['response']['err']['msg']))
+        changes[change].append(name)
+
+    return changes
+
+
 def main():
     argument_spec = a10_argument_spec()
     argument_spec.update(url_argument_spec())
     argument_spec.update(
         dict(
             state=dict(type='str', default='present', choices=['present', 'absent']),
-            server_name=dict(type='str', aliases=['server'], required=True),
+            server_name=dict(type='str', aliases=['server']),
             server_ip=dict(type='str', aliases=['ip', 'address']),
             server_status=dict(type='str', default='enabled', aliases=['status'], choices=['enabled', 'disabled']),
             server_ports=dict(type='list', aliases=['port'], default=[]),
+            servers=dict(type='list'),
+            session_cache=dict(type='str'),
+            session_ttl=dict(type='int', default=300),
         )
     )
 
     module = AnsibleModule(
         argument_spec=argument_spec,
+        required_one_of=[['server_name', 'servers']],
+        mutually_exclusive=[['server_name', 'servers']],
         supports_check_mode=False
     )
 
@@ -171,12 +383,22 @@ def main():
     slb_server_ip = module.params['server_ip']
     slb_server_status = module.params['server_status']
     slb_server_ports = module.params['server_ports']
-
-    if slb_server is None:
-        module.fail_json(msg='server_name is required')
+    session_cache = module.params['session_cache']
 
     axapi_base_url = 'https://%s/services/rest/V2.1/?format=json' % host
-    session_url = axapi_authenticate(module, axapi_base_url, username, password)
+    session_url, session_cached = axapi_open_session(module, axapi_base_url, username, password,
+                                                     session_cache, module.params['session_ttl'])
+
+    if module.params['servers']:
+        result = sync_servers(module, session_url, module.params['servers'], slb_server_status, state)
+        changed = bool(result['created'] or result['updated'] or result['deleted'])
+        if changed and write_config:
+            write_result = axapi_call(module, session_url + '&method=system.action.write_memory')
+            if axapi_failure(write_result):
+                module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
+        if not session_cached:
+            axapi_call(module, session_url + '&method=session.close')
+        module.exit_json(changed=changed, content=result)
 
     # validate the ports data structure
     validate_ports(module, slb_server_ports)
@@ -204,35 +426,11 @@ def main():
                 module.fail_json(msg="failed to create the server: %s" % result['response']['err']['msg'])
             changed = True
         else:
-            def needs_update(src_ports, dst_ports):
-                '''
-                Checks to determine if the port definitions of the src_ports
-                array are in or different from those in dst_ports. If there is
-                a difference, this function returns true, otherwise false.
-                '''
-                for src_port in src_ports:
-                    found = False
-                    different = False
-                    for dst_port in dst_ports:
-                        if src_port['port_num'] == dst_port['port_num']:
-                            found = True
-                            for valid_field in VALID_PORT_FIELDS:
-                                if src_port[valid_field] != dst_port[valid_field]:
-                                    different = True
-                                    break
-                            if found or different:
-                                break
-                    if not found or different:
-                        return True
-                # every port from the src exists in the dst, and none of them were different
-                return False
-
             defined_ports = slb_server_data.get('server', {}).get('port_list', [])
 
-            # we check for a needed update both ways, in case ports
-            # are missing from either the ones specified by the user
-            # or from those on the device
-            if needs_update(defined_ports, slb_server_ports) or needs_update(slb_server_ports, defined_ports):
+            # ports are compared by port number, so ports missing from either
+            # the ones specified by the user or those on the device count too
+            if ports_differ(slb_server_ports, defined_ports, 'port_num', VALID_PORT_FIELDS):
                 result = axapi_call(module, session_url + '&method=slb.server.update', json.dumps(json_post))
                 if axapi_failure(result):
                     module.fail_json(msg="failed to update the server: %s" % result['response']['err']['msg'])
@@ -257,8 +455,9 @@ def main():
         if axapi_failure(write_result):
             module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
 
-    # log out of the session nicely and exit
-    axapi_call(module, session_url + '&method=session.close')
+    # log out of the session nicely and exit, unless it is cached for later tasks
+    if not session_cached:
+        axapi_call(module, session_url + '&method=session.close')
     module.exit_json(changed=changed, content=result)
 
 # standard ansible module imports
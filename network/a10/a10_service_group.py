@@ -57,7 +57,8 @@ options:
   service_group:
     description:
       - slb service-group name
-    required: true
+      - One of C(service_group) or C(service_groups) is required.
+    required: false
     default: null
     aliases: ['service', 'pool', 'group']
     choices: []
@@ -100,6 +101,32 @@ options:
     required: false
     default: 'yes'
     choices: ['yes', 'no']
+  service_groups:
+    description:
+      - A list of service groups to manage in one task. Each item is a dictionary with
+        C(name:) and C(servers:) (as in C(servers)), and optionally C(protocol:), C(method:)
+        and C(state:), which default to C(service_group_protocol), C(service_group_method)
+        and C(state). All service groups and servers on the device are read with one call
+        each, and only the groups and members that differ are changed.
+    required: false
+    default: null
+    version_added: "2.0"
+  session_cache:
+    description:
+      - Path of a local file used to share aXAPI sessions across tasks, keyed by device and username.
+        A cached session is checked before it is reused and left open at the end of the task, so
+        consecutive tasks do not each open an admin session on the device. Expired sessions are
+        closed on the device before a new one is opened. The file is locked through a companion
+        C(.lock) file while a session is looked up or opened, so parallel hosts share one session.
+    required: false
+    default: null
+    version_added: "2.0"
+  session_ttl:
+    description:
+      - Number of seconds a cached session is reused. Keep it below the idle timeout of the device.
+    required: false
+    default: 300
+    version_added: "2.0"
 
 '''
 
@@ -121,10 +148,127 @@ EXAMPLES = '''
         port: 8080
         status: disabled
 
+# Manage several service groups, reusing the aXAPI session of earlier tasks
+- a10_service_group:
+    host: a10.mydomain.com
+    username: myadmin
+    password: mypassword
+    session_cache: ~/.ansible/a10_sessions
+    service_groups:
+      - name: sg-80-tcp
+        servers:
+          - server: foo1.mydomain.com
+            port: 8080
+          - server: foo2.mydomain.com
+            port: 8080
+      - name: sg-old
+        state: absent
+
 '''
 
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+
+
+def axapi_close_session(module, base_url, session_id):
+    '''
+    Closes a session on the device, ignoring devices that cannot be reached.
+    '''
+    fetch_url(module, base_url + '&session_id=' + session_id + '&method=session.close')
+
+
+def axapi_open_session(module, base_url, username, password, cache_path=None, ttl=300):
+    '''
+    Returns (session url, cached), reusing a session cached by an earlier task
+    when cache_path is set. A cached session must be left open at the end.
+    The cache is locked from the lookup until the new session is recorded,
+    so tasks managing service groups on several hosts at once share one session per
+    device and user. Expired sessions of every device in the cache are
+    closed before they are dropped from it.
+    '''
+    if not cache_path:
+        return axapi_authenticate(module, base_url, username, password), False
+
+    cache_path = os.path.expanduser(cache_path)
+    cache_dir = os.path.dirname(cache_path) or '.'
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        lock = open(cache_path + '.lock', 'a')
+    except (IOError, OSError), e:
+        module.fail_json(msg="unable to lock session cache %s: %s" % (cache_path, e))
+
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+        try:
+            cache = json.load(open(cache_path))
+        except (IOError, ValueError):
+            cache = {}
+
+        key = hashlib.sha1('%s|%s' % (base_url, username)).hexdigest()
+        now = time.time()
+        entry = cache.get(key)
+        if entry and entry.get('expires', 0) > now:
+            session_url = base_url + '&session_id=' + entry['session_id']
+            result = axapi_call(module, session_url + '&method=system.information.get')
+            if not axapi_failure(result):
+                return session_url, True
+            del cache[key]
+
+        for entry_key, entry in cache.items():
+            if entry.get('expires', 0) <= now:
+                entry_base_url = entry.get('base_url')
+                if entry_key == key:
+                    entry_base_url = base_url
+                if entry_base_url:
+                    axapi_close_session(module, entry_base_url, entry['session_id'])
+                del cache[entry_key]
+
+        session_url = axapi_authenticate(module, base_url, username, password)
+        cache[key] = {'base_url': base_url,
+                      'session_id': session_url.split('&session_id=', 1)[1],
+                      'expires': now + ttl}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            os.write(fd, json.dumps(cache))
+            os.close(fd)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            # an unwritable cache leaves this session usable here, main() closes it as it is not shared
+            return session_url, False
+        return session_url, True
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+
+def axapi_get_all(module, session_url, method, list_key):
+    '''
+    Fetches every object of a type with one getAll call, indexed by name.
+    '''
+    result = axapi_call(module, session_url + '&method=' + method)
+    if axapi_failure(result):
+        module.fail_json(msg="failed to list objects: %s" % result['response']['err']['msg'])
+    return dict((item['name'], item) for item in result.get(list_key, []))
+
+
 VALID_SERVICE_GROUP_FIELDS = ['name', 'protocol', 'lb_method']
 VALID_SERVER_FIELDS = ['server', 'port', 'status']
+VALID_GROUP_ITEM_FIELDS = ['name', 'protocol', 'method', 'servers', 'state']
+LOAD_BALANCING_METHODS = {'round-robin': 0,
+                          'weighted-rr': 1,
+                          'least-connection': 2,
+                          'weighted-least-connection': 3,
+                          'service-least-connection': 4,
+                          'service-weighted-least-connection': 5,
+                          'fastest-response': 6,
+                          'least-request': 7,
+                          'round-robin-strict': 8,
+                          'src-ip-only-hash': 14,
+                          'src-ip-hash': 15}
 
 def validate_servers(module, servers):
     for item in servers:
@@ -152,13 +296,116 @@ def validate_servers(module, servers):
             item['status'] = 1
 
 
+def sync_members(module, session_url, service_group, servers, defined_servers):
+    '''
+    Adds, updates and removes members of a service group so that they match
+    servers. Members are indexed by (server, port) on both sides.
+    '''
+    wanted = dict(((server['server'], server['port']), server) for server in servers)
+    defined = dict(((server['server'], server['port']), server) for server in defined_servers)
+
+    changed = False
+    for key, server in wanted.items():
+        if key not in defined:
+            method = 'slb.service_group.member.create'
+        elif server['status'] != defined[key].get('status'):
+            method = 'slb.service_group.member.update'
+        else:
+            continue
+        result = axapi_call(module, session_url + '&method=' + method,
+                            json.dumps({"name": service_group, "member": server}))
+        changed = True
+
+    # remove any servers that are on the target device but were not specified in the list given
+    for key, server in defined.items():
+        if key not in wanted:
+            result = axapi_call(module, session_url + '&method=slb.service_group.member.delete',
+                                json.dumps({"name": service_group, "member": server}))
+            changed = True
+
+    return changed
+
+
+def group_protocol(proto):
+    if not proto or proto.lower() == 'tcp':
+        return 2
+    return 3
+
+
+def sync_service_groups(module, session_url, groups, defaults):
+    '''
+    Creates, updates or deletes the listed service groups, comparing them
+    against a single getAll of the service groups and servers on the device.
+    '''
+    existing = axapi_get_all(module, session_url, 'slb.service_group.getAll', 'service_group_list')
+    known_servers = None
+    changes = dict(created=[], updated=[], deleted=[])
+
+    for item in groups:
+        for key in item:
+            if key not in VALID_GROUP_ITEM_FIELDS:
+                module.fail_json(msg="invalid service group field (%s), must be one of: %s" % (key, ','.join(VALID_GROUP_ITEM_FIELDS)))
+        if not item.get('name'):
+            module.fail_json(msg="service group definitions must define the name field")
+
+        name = item['name']
+        current = existing.get(name)
+        if item.get('state', defaults['state']) == 'absent':
+            if current:
+                result = axapi_call(module, session_url + '&method=slb.service_group.delete', json.dumps({'name': name}))
+                if axapi_failure(result):
+                    module.fail_json(msg="failed to delete the service group %s: %s" % (name, result['response']['err']['msg']))
+                changes['deleted'].append(name)
+            continue
+
+        method = item.get('method', defaults['method'])
+        if method not in LOAD_BALANCING_METHODS:
+            module.fail_json(msg="invalid method (%s) for service group %s, must be one of: %s" % (method, name, ','.join(LOAD_BALANCING_METHODS)))
+        servers = item.get('servers') or []
+        validate_servers(module, servers)
+
+        if known_servers is None and servers:
+            known_servers = axapi_get_all(module, session_url, 'slb.server.getAll', 'server_list')
+        for server in servers:
+            if server['server'] not in known_servers:
+                module.fail_json(msg="the server %s specified in the servers list of %s does not exist" % (server['server'], name))
+
+        group = {
+            'name': name,
+            'protocol': group_protocol(item.get('protocol', defaults['protocol'])),
+            'lb_method': LOAD_BALANCING_METHODS[method],
+        }
+
+        changed = False
+        if not current:
+            result = axapi_call(module, session_url + '&method=slb.service_group.create', json.dumps({'service_group': group}))
+            if axapi_failure(result):
+                module.fail_json(msg="failed to create the service group %s: %s" % (name, result['response']['err']['msg']))
+            current = {}
+        elif [group[field] for field in VALID_SERVICE_GROUP_FIELDS] != [current.get(field) for field in VALID_SERVICE_GROUP_FIELDS]:
+            result = axapi_call(module, session_url + '&method=slb.service_group.update', json.dumps({'service_group': group}))
+            if axapi_failure(result):
+                module.fail_json(msg="failed to update the service group %s: %s" % (name, result['response']['err']['msg']))
+            changed = True
+
+        if sync_members(module, session_url, name, servers, current.get('member_list', [])):
+            changed = True
+
+        if name not in existing:
+            changes['created'].append(name)
+        elif changed:
+            changes['updated'].append(name)
+
+    return changes
+
+
 def main():
     argument_spec = a10_argument_spec()
     argument_spec.update(url_argument_spec())
     argument_spec.update(
         dict(
             state=dict(type='str', default='present', choices=['present', 'absent']),
-            service_group=dict(type='str', aliases=['service', 'pool', 'group'], required=True),
+            service_group=dict(type='str', aliases=['service', 'pool', 'group']),
             service_group_protocol=dict(type='str', default='tcp', aliases=['proto', 'protocol'], choices=['tcp', 'udp']),
             service_group_method=dict(type='str', default='round-robin',
                                       aliases=['method'],
@@ -174,11 +421,16 @@ def main():
                                                'src-ip-only-hash',
                                                'src-ip-hash']),
             servers=dict(type='list', aliases=['server', 'member'], default=[]),
+            service_groups=dict(type='list'),
+            session_cache=dict(type='str'),
+            session_ttl=dict(type='int', default=300),
         )
     )
 
     module = AnsibleModule(
         argument_spec=argument_spec,
+        required_one_of=[['service_group', 'service_groups']],
+        mutually_exclusive=[['service_group', 'service_groups']],
         supports_check_mode=False
     )
 
@@ -191,42 +443,39 @@ def main():
     slb_service_group_proto = module.params['service_group_protocol']
     slb_service_group_method = module.params['service_group_method']
     slb_servers = module.params['servers']
-
-    if slb_service_group is None:
-        module.fail_json(msg='service_group is required')
+    session_cache = module.params['session_cache']
 
     axapi_base_url = 'https://' + host + '/services/rest/V2.1/?format=json'
-    load_balancing_methods = {'round-robin': 0,
-                              'weighted-rr': 1,
-                              'least-connection': 2,
-                              'weighted-least-connection': 3,
-                              'service-least-connection': 4,
-                              'service-weighted-least-connection': 5,
-                              'fastest-response': 6,
-                              'least-request': 7,
-                              'round-robin-strict': 8,
-                              'src-ip-only-hash': 14,
-                              'src-ip-hash': 15}
-
-    if not slb_service_group_proto or slb_service_group_proto.lower() == 'tcp':
-        protocol = 2
-    else:
-        protocol = 3
 
     # validate the server data list structure
     validate_servers(module, slb_servers)
 
+    # first we authenticate to get a session id
+    session_url, session_cached = axapi_open_session(module, axapi_base_url, username, password,
+                                                     session_cache, module.params['session_ttl'])
+
+    if module.params['service_groups']:
+        defaults = dict(state=state, protocol=slb_service_group_proto, method=slb_service_group_method)
+        result = sync_service_groups(module, session_url, module.params['service_groups'], defaults)
+        changed = bool(result['created'] or result['updated'] or result['deleted'])
+        if changed and write_config:
+            write_result = axapi_call(module, session_url + '&method=system.action.write_memory')
+            if axapi_failure(write_result):
+                module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
+        if not session_cached:
+            axapi_call(module, session_url + '&method=session.close')
+        module.exit_json(changed=changed, content=result)
+
+    protocol = group_protocol(slb_service_group_proto)
+
     json_post = {
         'service_group': {
             'name': slb_service_group,
             'protocol': protocol,
-            'lb_method': load_balancing_methods[slb_service_group_method],
+            'lb_method': LOAD_BALANCING_METHODS[slb_service_group_method],
         }
     }
 
-    # first we authenticate to get a session id
-    session_url = axapi_authenticate(module, axapi_base_url, username, password)
-
     # then we check to see if the specified group exists
     slb_result = axapi_call(module, session_url + '&method=slb.service_group.search', json.dumps({'name': slb_service_group}))
     slb_service_group_exist = not axapi_failure(slb_result)
@@ -264,51 +513,10 @@ def main():
                 changed = True
 
         # next we pull the defined list of servers out of the returned
-        # results to make it a bit easier to iterate over
+        # results, then add, update and remove members to match the list
         defined_servers = slb_result.get('service_group', {}).get('member_list', [])
-
-        # next we add/update new member servers from the user-specified
-        # list if they're different or not on the target device
-        for server in slb_servers:
-            found = False
-            different = False
-            for def_server in defined_servers:
-                if server['server'] == def_server['server']:
-                    found = True
-                    for valid_field in VALID_SERVER_FIELDS:
-                        if server[valid_field] != def_server[valid_field]:
-                            different = True
-                            break
-                    if found or different:
-                        break
-            # add or update as required
-            server_data = {
-                "name": slb_service_group,
-                "member": server,
-            }
-            if not found:
-                result = axapi_call(module, session_url + '&method=slb.service_group.member.create', json.dumps(server_data))
-                changed = True
-            elif different:
-                result = axapi_call(module, session_url + '&method=slb.service_group.member.update', json.dumps(server_data))
-                changed = True
-
-        # finally, remove any servers that are on the target
-        # device but were not specified in the list given
-        for server in defined_servers:
-            found = False
-            for slb_server in slb_servers:
-                if server['server'] == slb_server['server']:
-                    found = True
-                    break
-            # remove if not found
-            server_data = {
-                "name": slb_service_group,
-                "member": server,
-            }
-            if not found:
-                result = axapi_call(module, session_url + '&method=slb.service_group.member.delete', json.dumps(server_data))
-                changed = True
+        if sync_members(module, session_url, slb_service_group, slb_servers, defined_servers):
+            changed = True
 
         # if we changed things, get the full info regarding
         # the service group for the return data below
@@ -329,8 +537,9 @@ def main():
         if axapi_failure(write_result):
             module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
 
-    # log out of the session nicely and exit
-    axapi_call(module, session_url + '&method=session.close')
+    # log out of the session nicely and exit, unless it is cached for later tasks
+    if not session_cached:
+        axapi_call(module, session_url + '&method=session.close')
     module.exit_json(changed=changed, content=result)
 
 # standard ansible module imports
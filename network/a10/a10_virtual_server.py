@@ -59,13 +59,15 @@ options:
   virtual_server:
     description:
       - slb virtual server name
-    required: true
+      - One of C(virtual_server) or C(virtual_servers) is required.
+    required: false
     default: null
     aliases: ['vip', 'virtual']
     choices: []
   virtual_server_ip:
     description:
       - slb virtual server ip address
+      - Required with C(virtual_server).
     required: false
     default: null
     aliases: ['ip', 'address']
@@ -83,6 +85,7 @@ options:
         dictionary which specifies the C(port:) and C(type:), but can also optionally
         specify the C(service_group:) as well as the C(status:). See the examples
         below for details. This parameter is required when C(state) is C(present).
+      - Required with C(virtual_server).
     required: false
   write_config:
     description:
@@ -100,6 +103,32 @@ options:
     required: false
     default: 'yes'
     choices: ['yes', 'no']
+  virtual_servers:
+    description:
+      - A list of virtual servers to manage in one task. Each item is a dictionary with
+        C(name:), C(ip:) and C(ports:) (as in C(virtual_server_ports)), and optionally
+        C(status:) and C(state:), which default to C(virtual_server_status) and C(state).
+        All virtual servers and service groups on the device are read with one call each,
+        and only the virtual servers that differ are changed.
+    required: false
+    default: null
+    version_added: "2.0"
+  session_cache:
+    description:
+      - Path of a local file used to share aXAPI sessions across tasks, keyed by device and username.
+        A cached session is checked before it is reused and left open at the end of the task, so
+        consecutive tasks do not each open an admin session on the device. Expired sessions are
+        closed on the device before a new one is opened. The file is locked through a companion
+        C(.lock) file while a session is looked up or opened, so parallel hosts share one session.
+    required: false
+    default: null
+    version_added: "2.0"
+  session_ttl:
+    description:
+      - Number of seconds a cached session is reused. Keep it below the idle timeout of the device.
+    required: false
+    default: 300
+    version_added: "2.0"
 
 '''
 
@@ -122,9 +151,131 @@ EXAMPLES = '''
         protocol: http
         status: disabled
 
+# Manage several virtual servers, reusing the aXAPI session of earlier tasks
+- a10_virtual_server:
+    host: a10.mydomain.com
+    username: myadmin
+    password: mypassword
+    session_cache: ~/.ansible/a10_sessions
+    virtual_servers:
+      - name: vserver1
+        ip: 1.1.1.1
+        ports:
+          - port: 80
+            protocol: TCP
+            service_group: sg-80-tcp
+      - name: vserver-old
+        state: absent
+
 '''
 
+import fcntl
+import hashlib
+import os
+import tempfile
+import time
+
+
+def axapi_close_session(module, base_url, session_id):
+    '''
+    Closes a session on the device, ignoring devices that cannot be reached.
+    '''
+    fetch_url(module, base_url + '&session_id=' + session_id + '&method=session.close')
+
+
+def axapi_open_session(module, base_url, username, password, cache_path=None, ttl=300):
+    '''
+    Returns (session url, cached), reusing a session cached by an earlier task
+    when cache_path is set. A cached session must be left open at the end.
+    The cache is locked from the lookup until the new session is recorded,
+    so tasks managing virtual servers on several hosts at once share one session per
+    device and user. Expired sessions of every device in the cache are
+    closed before they are dropped from it.
+    '''
+    if not cache_path:
+        return axapi_authenticate(module, base_url, username, password), False
+
+    cache_path = os.path.expanduser(cache_path)
+    cache_dir = os.path.dirname(cache_path) or '.'
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        lock = open(cache_path + '.lock', 'a')
+    except (IOError, OSError), e:
+        module.fail_json(msg="unable to lock session cache %s: %s" % (cache_path, e))
+
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    try:
+        try:
+            cache = json.load(open(cache_path))
+        except (IOError, ValueError):
+            cache = {}
+
+        key = hashlib.sha1('%s|%s' % (base_url, username)).hexdigest()
+        now = time.time()
+        entry = cache.get(key)
+        if entry and entry.get('expires', 0) > now:
+            session_url = base_url + '&session_id=' + entry['session_id']
+            result = axapi_call(module, session_url + '&method=system.information.get')
+            if not axapi_failure(result):
+                return session_url, True
+            del cache[key]
+
+        for entry_key, entry in cache.items():
+            if entry.get('expires', 0) <= now:
+                entry_base_url = entry.get('base_url')
+                if entry_key == key:
+                    entry_base_url = base_url
+                if entry_base_url:
+                    axapi_close_session(module, entry_base_url, entry['session_id'])
+                del cache[entry_key]
+
+        session_url = axapi_authenticate(module, base_url, username, password)
+        cache[key] = {'base_url': base_url,
+                      'session_id': session_url.split('&session_id=', 1)[1],
+                      'expires': now + ttl}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+            os.write(fd, json.dumps(cache))
+            os.close(fd)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            # not fatal, the caller closes a session that did not make it into the cache
+            return session_url, False
+        return session_url, True
+    finally:
+        fcntl.flock(lock, fcntl.LOCK_UN)
+        lock.close()
+
+
+def axapi_get_all(module, session_url, method, list_key):
+    '''
+    Fetches every object of a type with one getAll call, indexed by name.
+    '''
+    result = axapi_call(module, session_url + '&method=' + method)
+    if axapi_failure(result):
+        module.fail_json(msg="failed to list objects: %s" % result['response']['err']['msg'])
+    return dict((item['name'], item) for item in result.get(list_key, []))
+
+
+def ports_differ(src_ports, dst_ports, key, fields):
+    '''
+    Indexes both port lists by key and reports whether their key sets or any
+    of the given fields differ.
+    '''
+    src = dict((port[key], port) for port in src_ports)
+    dst = dict((port[key], port) for port in dst_ports)
+    if set(src) != set(dst):
+        return True
+    for port_key, port in src.items():
+        for field in fields:
+            if port.get(field) != dst[port_key].get(field):
+                return True
+    return False
+
+
 VALID_PORT_FIELDS = ['port', 'protocol', 'service_group', 'status']
+VALID_VIRTUAL_SERVER_FIELDS = ['name', 'ip', 'status', 'ports', 'state']
 
 def validate_ports(module, ports):
     for item in ports:
@@ -162,21 +313,91 @@ def validate_ports(module, ports):
         if 'service_group' not in item:
             item['service_group'] = ''
 
+def sync_virtual_servers(module, session_url, virtual_servers, default_status, default_state):
+    '''
+    Creates, updates or deletes the listed virtual servers, comparing them
+    against a single getAll of the virtual servers on the device.
+    '''
+    existing = axapi_get_all(module, session_url, 'slb.virtual_server.getAll', 'virtual_server_list')
+    service_groups = None
+    changes = dict(created=[], updated=[], deleted=[])
+
+    for item in virtual_servers:
+        for key in item:
+            if key not in VALID_VIRTUAL_SERVER_FIELDS:
+                module.fail_json(msg="invalid virtual server field (%s), must be one of: %s" % (key, ','.join(VALID_VIRTUAL_SERVER_FIELDS)))
+        if not item.get('name'):
+            module.fail_json(msg="virtual server definitions must define the name field")
+
+        name = item['name']
+        current = existing.get(name)
+        if item.get('state', default_state) == 'absent':
+            if current:
+                result = axapi_call(module, session_url + '&method=slb.virtual_server.delete', json.dumps({'name': name}))
+                if axapi_failure(result):
+                    module.fail_json(msg="failed to delete the virtual server %s: %s" % (name, result['response']['err']['msg']))
+                changes['deleted'].append(name)
+            continue
+
+        ports = item.get('ports') or []
+        validate_ports(module, ports)
+
+        # the API creates port definitions for missing service groups while
+        # indicating a failure, so check them all against one listing first
+        wanted_groups = set(port['service_group'] for port in ports if port['service_group'])
+        if wanted_groups and service_groups is None:
+            service_groups = axapi_get_all(module, session_url, 'slb.service_group.getAll', 'service_group_list')
+        for service_group in wanted_groups:
+            if service_group not in service_groups:
+                module.fail_json(msg="the service group %s specified in the ports list of %s does not exist" % (service_group, name))
+
+        virtual_server = {
+            'name': name,
+            'address': item.get('ip'),
+            'status': axapi_enabled_disabled(item.get('status', default_status)),
+            'vport_list': ports,
+        }
+
+        if not current:
+            if not virtual_server['address']:
+                module.fail_json(msg='you must specify an IP address when creating the virtual server %s' % name)
+            method, change = 'slb.virtual_server.create', 'created'
+        else:
+            if not virtual_server['address']:
+                virtual_server['address'] = current.get('address')
+            if (virtual_server['address'] == current.get('address') and virtual_server['status'] == current.get('status') and
+                    not ports_differ(ports, current.get('vport_list', []), 'port', VALID_PORT_FIELDS)):
+                continue
+            method, change = 'slb.virtual_server.update', 'updated'
+
+        result = axapi_call(module, session_url + '&method=' + method, json.dumps({'virtual_server': virtual_server}))
+        if axapi_failure(result):
+            module.fail_json(msg="failed to update the virtual server %s: %s" % (name, result['response']['err']['msg']))
+        changes[change].append(name)
+
+    return changes
+
+
 def main():
     argument_spec = a10_argument_spec()
     argument_spec.update(url_argument_spec())
     argument_spec.update(
         dict(
             state=dict(type='str', default='present', choices=['present', 'absent']),
-            virtual_server=dict(type='str', aliases=['vip', 'virtual'], required=True),
-            virtual_server_ip=dict(type='str', aliases=['ip', 'address'], required=True),
+            virtual_server=dict(type='str', aliases=['vip', 'virtual']),
+            virtual_server_ip=dict(type='str', aliases=['ip', 'address']),
             virtual_server_status=dict(type='str', default='enabled', aliases=['status'], choices=['enabled', 'disabled']),
-            virtual_server_ports=dict(type='list', required=True),
+            virtual_server_ports=dict(type='list'),
+            virtual_servers=dict(type='list'),
+            session_cache=dict(type='str'),
+            session_ttl=dict(type='int', default=300),
         )
     )
 
     module = AnsibleModule(
         argument_spec=argument_spec,
+        required_one_of=[['virtual_server', 'virtual_servers']],
+        mutually_exclusive=[['virtual_server', 'virtual_servers']],
         supports_check_mode=False
     )
 
@@ -189,14 +410,27 @@ def main():
     slb_virtual_ip = module.params['virtual_server_ip']
     slb_virtual_status = module.params['virtual_server_status']
     slb_virtual_ports = module.params['virtual_server_ports']
+    session_cache = module.params['session_cache']
 
-    if slb_virtual is None:
-        module.fail_json(msg='virtual_server is required')
-
-    validate_ports(module, slb_virtual_ports)
+    if slb_virtual is not None:
+        if slb_virtual_ip is None or slb_virtual_ports is None:
+            module.fail_json(msg='virtual_server_ip and virtual_server_ports are required with virtual_server')
+        validate_ports(module, slb_virtual_ports)
 
     axapi_base_url = 'https://%s/services/rest/V2.1/?format=json' % host
-    session_url = axapi_authenticate(module, axapi_base_url, username, password)
+    session_url, session_cached = axapi_open_session(module, axapi_base_url, username, password,
+                                                     session_cache, module.params['session_ttl'])
+
+    if module.params['virtual_servers']:
+        result = sync_virtual_servers(module, session_url, module.params['virtual_servers'], slb_virtual_status, state)
+        changed = bool(result['created'] or result['updated'] or result['deleted'])
+        if changed and write_config:
+            write_result = axapi_call(module, session_url + '&method=system.action.write_memory')
+            if axapi_failure(write_result):
+                module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
+        if not session_cached:
+            axapi_call(module, session_url + '&method=session.close')
+        module.exit_json(changed=changed, content=result)
 
     slb_virtual_data = axapi_call(module, session_url + '&method=slb.virtual_server.search', json.dumps({'name': slb_virtual}))
     slb_virtual_exists = not axapi_failure(slb_virtual_data)
@@ -233,35 +467,11 @@ def main():
                 module.fail_json(msg="failed to create the virtual server: %s" % result['response']['err']['msg'])
             changed = True
         else:
-            def needs_update(src_ports, dst_ports):
-                '''
-                Checks to determine if the port definitions of the src_ports
-                array are in or different from those in dst_ports. If there is
-                a difference, this function returns true, otherwise false.
-                '''
-                for src_port in src_ports:
-                    found = False
-                    different = False
-                    for dst_port in dst_ports:
-                        if src_port['port'] == dst_port['port']:
-                            found = True
-                            for valid_field in VALID_PORT_FIELDS:
-                                if src_port[valid_field] != dst_port[valid_field]:
-                                    different = True
-                                    break
-                            if found or different:
-                                break
-                    if not found or different:
-                        return True
-                # every port from the src exists in the dst, and none of them were different
-                return False
-
             defined_ports = slb_virtual_data.get('virtual_server', {}).get('vport_list', [])
 
-            # we check for a needed update both ways, in case ports
-            # are missing from either the ones specified by the user
-            # or from those on the device
-            if needs_update(defined_ports, slb_virtual_ports) or needs_update(slb_virtual_ports, defined_ports):
+            # ports are compared by port number, so ports missing from either
+            # the ones specified by the user or those on the device count too
+            if ports_differ(slb_virtual_ports, defined_ports, 'port', VALID_PORT_FIELDS):
                 result = axapi_call(module, session_url + '&method=slb.virtual_server.update', json.dumps(json_post))
                 if axapi_failure(result):
                     module.fail_json(msg="failed to create the virtual server: %s" % result['response']['err']['msg'])
@@ -286,8 +496,9 @@ def main():
         if axapi_failure(write_result):
             module.fail_json(msg="failed to save the configuration: %s" % write_result['response']['err']['msg'])
 
-    # log out of the session nicely and exit
-    axapi_call(module, session_url + '&method=session.close')
+    # log out of the session nicely and exit, unless it is cached for later tasks
+    if not session_cached:
+        axapi_call(module, session_url + '&method=session.close')
     module.exit_json(changed=changed, content=result)
 
 # standard ansible module imports
@@ -62,7 +62,9 @@ options:
     aliases: []
   name:
     description:
-      - name of the entity
+      - name of the entity, or a list (or comma separated string) of names.
+        All entities are changed with one bulk request, and the error code of
+        every entity is returned in C(results).
     required: true
     default: hostname
     aliases: []
@@ -94,12 +96,29 @@ ansible host -m netscaler -a "nsc_host=nsc.example.com user=apiuser password=api
 
 # Disable the service local:8080
 ansible host -m netscaler -a "nsc_host=nsc.example.com user=apiuser password=apipass name=local:8080 type=service action=disable"
+
+# Disable several services with one request
+- local_action:
+    module: netscaler
+    nsc_host: nsc.example.com
+    user: apiuser
+    password: apipass
+    type: service
+    action: disable
+    name: [ 'web01:8080', 'web02:8080', 'web03:8080' ]
 '''
 
 
-import base64
 import socket
 
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+# errorcode NITRO returns when some objects of a bulk request failed
+NITRO_BULK_FAILED = 1243
+
 
 class netscaler(object):
 
@@ -107,36 +126,57 @@ class netscaler(object):
 
     def __init__(self, module):
         self.module = module
+        self._token = None
 
-    def http_request(self, api_endpoint, data_json={}):
+    def http_request(self, api_endpoint, data_json=None, headers=None):
+        """ POST a JSON payload to NITRO, sending the session cookie once logged in. """
         request_url = self._nsc_protocol + '://' + self._nsc_host + self._nitro_base_url + api_endpoint
-
-        data_json = urllib.urlencode(data_json)
-        if not len(data_json):
-            data_json = None
-
-        auth = base64.encodestring('%s:%s' % (self._nsc_user, self._nsc_pass)).replace('\n', '').strip()
-        headers = {
-            'Authorization': 'Basic %s' % auth,
-            'Content-Type' : 'application/x-www-form-urlencoded',
-        }
-
-        response, info = fetch_url(self.module, request_url, data=data_json, headers=headers)
-
-        return json.load(response)
+        request_headers = {'Content-Type': 'application/json'}
+        if self._token:
+            request_headers['Cookie'] = 'NITRO_AUTH_TOKEN=%s' % self._token
+        request_headers.update(headers or {})
+
+        response, info = fetch_url(self.module, request_url, data=json.dumps(data_json or {}),
+                                   headers=request_headers, timeout=30)
+        if response is not None:
+            data = response.read()
+        else:
+            # NITRO describes failures in a JSON body sent with an error status
+            data = info.get('body')
+            if not data:
+                raise Exception('request to %s failed: %s' % (request_url, info.get('msg')))
+        if not data:
+            return {'errorcode': 0, 'message': 'Done'}
+        return json.loads(data)
+
+    def login(self):
+        resp = self.http_request('config/login', {'login': {'username': self._nsc_user, 'password': self._nsc_pass}})
+        if resp.get('errorcode') or not resp.get('sessionid'):
+            raise Exception('login to %s failed: %s' % (self._nsc_host, resp.get('message')))
+        self._token = resp['sessionid']
+
+    def logout(self):
+        if self._token:
+            try:
+                self.http_request('config/logout', {'logout': {}})
+            except Exception:
+                pass
+            self._token = None
 
     def prepare_request(self, action):
+        """ Apply action to every name in one bulk request, continuing past per-object errors. """
         resp = self.http_request(
-            'config',
-            {
-                "object":
-                {
-                    "params": {"action": action},
-                    self._type: {"name": self._name}
-                }
-            }
+            'config/%s?action=%s' % (self._type, action),
+            {self._type: [{"name": name} for name in self._names]},
+            {'X-NITRO-ONERROR': 'continue'}
         )
 
+        if resp.get('errorcode') == NITRO_BULK_FAILED and isinstance(resp.get('response'), list):
+            results = resp['response']
+        else:
+            results = [resp] * len(self._names)
+        resp['results'] = [dict(name=name, errorcode=r.get('errorcode'), message=r.get('message'))
+                           for name, r in zip(self._names, results)]
         return resp
 
 
@@ -146,11 +186,15 @@ def core(module):
     n._nsc_user = module.params.get('user')
     n._nsc_pass = module.params.get('password')
     n._nsc_protocol = module.params.get('nsc_protocol')
-    n._name = module.params.get('name')
+    n._names = module.params.get('name')
     n._type = module.params.get('type')
     action = module.params.get('action')
 
-    r = n.prepare_request(action)
+    n.login()
+    try:
+        r = n.prepare_request(action)
+    finally:
+        n.logout()
 
     return r['errorcode'], r
 
@@ -162,9 +206,9 @@ def main():
             nsc_host = dict(required=True),
             nsc_protocol = dict(default='https'),
             user = dict(required=True),
-            password = dict(required=True),
+            password = dict(required=True, no_log=True),
             action = dict(default='enable', choices=['enable','disable']),
-            name = dict(default=socket.gethostname()),
+            name = dict(default=socket.gethostname(), type='list'),
             type = dict(default='server', choices=['service', 'server']),
             validate_certs=dict(default='yes', type='bool'),
         )
@@ -177,7 +221,9 @@ def main():
         module.fail_json(msg=str(e))
 
     if rc != 0:
-        module.fail_json(rc=rc, msg=result)
+        failed = [r['name'] for r in result['results'] if r['errorcode']]
+        module.fail_json(rc=rc, msg="%s %s failed for: %s" % (module.params.get('action'), module.params.get('type'),
+                                                             ', '.join(failed)), results=result['results'])
     else:
         result['changed'] = True
         module.exit_json(**result)
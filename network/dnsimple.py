@@ -89,9 +89,30 @@ options:
   solo:
     description:
       - Whether the record should be the only one for that record type and record name. Only use with state=present on a record
+      - With C(records), any value of a listed name and type that is not in C(records) is deleted.
     required: false
     default: null
 
+  records:
+    description:
+      - List of records to reconcile against the zone of C(domain) in one run. Each item is a dict with
+        C(name), C(type) and C(value) and optionally C(ttl), C(priority) and C(state), which default to the
+        module options of the same name.
+      - The zone is listed once and indexed by name and type. The resulting deletes are sent first and must
+        all succeed before the updates and creates are sent. Each batch is sent concurrently over one
+        keep-alive HTTP session, backing off when the API rate limit is hit.
+      - Requires I(account_email) and I(account_api_token), either as options or from the environment.
+    required: false
+    default: null
+    version_added: "2.0"
+
+  parallel:
+    description:
+      - Maximum number of API requests in flight at the same time with C(records).
+    required: false
+    default: 5
+    version_added: "2.0"
+
 requirements: [ dnsimple ]
 author: "Alex Coomans (@drcapulet)"
 '''
@@ -127,15 +148,206 @@ EXAMPLES = '''
 # and delete the record
 - local_action: dnsimpledomain=my.com record= type=CNAME value=example.com state=absent
 
+# point a set of records at the failover CDN in one run
+- local_action:
+    module: dnsimple
+    domain: my.com
+    state: present
+    solo: yes
+    records:
+      - { name: www, type: CNAME, value: failover.cdn.example.net, ttl: 60 }
+      - { name: static, type: CNAME, value: failover.cdn.example.net, ttl: 60 }
+      - { name: old, type: A, value: 127.0.0.1, state: absent }
+
 '''
 
 import os
+import Queue
+import threading
+import time
+try:
+    import json
+except ImportError:
+    import simplejson as json
 try:
     from dnsimple import DNSimple
     from dnsimple.dnsimple import DNSimpleException
     HAS_DNSIMPLE = True
 except ImportError:
     HAS_DNSIMPLE = False
+try:
+    import requests
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+API_ENDPOINT = 'https://api.dnsimple.com/v1'
+RETRIES = 5
+
+
+def connect_failed(e):
+    """ Whether a ConnectionError was raised before the request could be sent. """
+    if isinstance(e, getattr(requests.exceptions, 'ConnectTimeout', ())):
+        return True
+    reason = getattr(e.args and e.args[0] or None, 'reason', None)
+    return type(reason).__name__ in ('NewConnectionError', 'ConnectTimeoutError')
+
+
+class RecordSession(object):
+    """ Keep-alive session on the records API of one domain, shared by worker threads. """
+
+    def __init__(self, email, api_token, domain, parallel):
+        self.url = '%s/domains/%s/records' % (API_ENDPOINT, domain)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, parallel))
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'X-DNSimple-Token': '%s:%s' % (email, api_token),
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'User-Agent': 'Ansible',
+        })
+
+    def request(self, method, path='', data=None):
+        """
+        Sends a request, backing off on rate limiting. GET, PUT and DELETE are
+        also retried after server and connection errors. A POST is only retried
+        when it was rate limited or the connection could not be opened, as it
+        may have created the record already.
+        """
+        idempotent = method != 'POST'
+        delay = 1
+        for attempt in range(RETRIES + 1):
+            try:
+                response = self.session.request(method, self.url + path,
+                                                data=data is not None and json.dumps(data) or None)
+            except requests.exceptions.ConnectionError, e:
+                if attempt == RETRIES or not (idempotent or connect_failed(e)):
+                    raise DNSimpleException('Failed to reach a server: %s' % e)
+            else:
+                if response.status_code < 400:
+                    return response.content and response.json() or {}
+                retry = response.status_code == 429 or idempotent and response.status_code >= 500
+                if not retry or attempt == RETRIES:
+                    raise DNSimpleException('%s %s returned %s: %s' % (method, self.url + path,
+                                                                      response.status_code, response.content))
+                reset = response.headers.get('X-RateLimit-Reset')
+                if response.status_code == 429 and reset and reset.isdigit():
+                    delay = max(delay, int(reset) - time.time())
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+    def records(self):
+        return [r['record'] for r in self.request('GET')]
+
+    def create(self, data):
+        return self.request('POST', data={'record': data})['record']
+
+    def update(self, record_id, data):
+        return self.request('PUT', '/%s' % record_id, data={'record': data})['record']
+
+    def delete(self, record_id):
+        self.request('DELETE', '/%s' % record_id)
+
+
+def diff_records(current, wanted, defaults, solo):
+    """
+    Compares the zone, indexed by (name, type), with the wanted records.
+    Returns the records to create, the (id, data) pairs to update and the records to delete.
+    """
+    index = {}
+    for r in current:
+        index.setdefault((r['name'], r['record_type']), []).append(r)
+
+    present = {}
+    absent = {}
+    for item in wanted:
+        key = (item.get('name') or '', item.get('type'))
+        if not key[1] or item.get('value') is None:
+            raise ValueError("every item of records needs a name, a type and a value: %s" % item)
+        data = {'name': key[0], 'record_type': key[1], 'content': str(item['value'])}
+        ttl = item.get('ttl', defaults['ttl'])
+        priority = item.get('priority', defaults['priority'])
+        if ttl:      data['ttl']  = int(ttl)
+        if priority: data['prio'] = int(priority)
+        if item.get('state', defaults['state']) == 'absent':
+            absent.setdefault(key, set()).add(data['content'])
+        else:
+            present.setdefault(key, {})[data['content']] = data
+
+    to_create, to_update, to_delete = [], [], []
+    for key, values in present.items():
+        by_content = dict((r['content'], r) for r in index.get(key, []))
+        for content, data in values.items():
+            rr = by_content.get(content)
+            if not rr:
+                to_create.append(data)
+            elif rr['ttl'] != data.get('ttl', rr['ttl']) or rr['prio'] != data.get('prio', rr['prio']):
+                to_update.append((rr['id'], dict((k, data[k]) for k in ('ttl', 'prio') if k in data)))
+        if solo:
+            to_delete.extend(r for r in index.get(key, []) if r['content'] not in values)
+
+    for key, contents in absent.items():
+        to_delete.extend(r for r in index.get(key, []) if r['content'] in contents and r not in to_delete)
+
+    return to_create, to_update, to_delete
+
+
+def run_parallel(jobs, parallel):
+    """ Runs callables from a pool of at most parallel threads, returns (results, errors). """
+    pending = Queue.Queue()
+    for job in jobs:
+        pending.put(job)
+    results = []
+    errors = []
+
+    def worker():
+        while True:
+            try:
+                job = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results.append(job())
+            except Exception, e:
+                errors.append(str(e))
+
+    threads = [threading.Thread(target=worker) for i in range(max(1, min(parallel, len(jobs))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def reconcile_records(module, email, api_token, domain, wanted, defaults, solo, parallel):
+    session = RecordSession(email, api_token, domain, parallel)
+    try:
+        to_create, to_update, to_delete = diff_records(session.records(), wanted, defaults, solo)
+    except ValueError, e:
+        module.fail_json(msg=str(e))
+
+    changed = bool(to_create or to_update or to_delete)
+    if module.check_mode or not changed:
+        module.exit_json(changed=changed, created=to_create, updated=[u[0] for u in to_update],
+                         deleted=[r['id'] for r in to_delete])
+
+    # deletes finish before anything is written, so a solo record that changes
+    # type cannot be created while the record it replaces still exists
+    jobs = [lambda r=r: session.delete(r['id']) for r in to_delete]
+    results, errors = run_parallel(jobs, parallel)
+    if errors:
+        module.fail_json(msg="%d of %d record deletions failed, no records were created or updated: %s" %
+                         (len(errors), len(jobs), '; '.join(errors)))
+
+    jobs = [lambda u=u: session.update(*u) for u in to_update]
+    jobs.extend(lambda d=d: session.create(d) for d in to_create)
+    results, errors = run_parallel(jobs, parallel)
+    if errors:
+        module.fail_json(msg="%d of %d record changes failed: %s" % (len(errors), len(jobs), '; '.join(errors)))
+
+    module.exit_json(changed=True, created=to_create, updated=[u[0] for u in to_update],
+                     deleted=[r['id'] for r in to_delete])
 
 def main():
     module = AnsibleModule(
@@ -151,10 +363,15 @@ def main():
             priority          = dict(required=False, type='int'),
             state             = dict(required=False, choices=['present', 'absent']),
             solo              = dict(required=False, type='bool'),
+            records           = dict(required=False, type='list'),
+            parallel          = dict(required=False, default=5, type='int'),
         ),
         required_together = (
             ['record', 'value']
         ),
+        mutually_exclusive = (
+            ['records', 'record'], ['records', 'record_ids']
+        ),
         supports_check_mode = True,
     )
 
@@ -181,6 +398,18 @@ def main():
         client = DNSimple()
 
     try:
+        # Reconcile a list of records against one listing of the zone
+        if domain and module.params.get('records'):
+            email = account_email or os.environ.get('DNSIMPLE_EMAIL')
+            api_token = account_api_token or os.environ.get('DNSIMPLE_API_TOKEN')
+            if not HAS_REQUESTS:
+                module.fail_json(msg="requests required for records")
+            if not (email and api_token):
+                module.fail_json(msg="records requires account_email and account_api_token")
+            reconcile_records(module, email, api_token, str(domain), module.params['records'],
+                              dict(ttl=ttl, priority=priority, state=state or 'present'),
+                              is_solo, module.params['parallel'])
+
         # Let's figure out what operation we want to do
 
         # No domain, return a list
@@ -82,6 +82,44 @@ options:
     choices: ['yes', 'no']
     version_added: 1.5.1
 
+  records:
+    description:
+      - List of records to manage in one run, each a dict with C(name), C(type),
+        C(value) and optionally C(ttl) (defaults to C(record_ttl)) and C(state)
+        (defaults to C(state)). Records sharing a name and type form one set,
+        values missing from the zone are created and values whose ttl differs are
+        updated, using the multi-record endpoints of the API so each kind of change
+        is one request. Mutually exclusive with C(record_name).
+    required: false
+    default: null
+    version_added: "2.0"
+
+  exclusive:
+    description:
+      - With C(records), also delete records of the zone that are not listed,
+        limited to the record types that appear in C(records).
+    required: false
+    default: false
+    version_added: "2.0"
+
+  cache:
+    description:
+      - Path of a local file used to cache the domain list and zone records across
+        tasks. Entries are reused for C(cache_ttl) seconds, then revalidated with
+        the ETag of the previous response when the API provides one. Changes made
+        by this module are written through to the cache.
+      - Changes made outside of Ansible are only seen once the entry expires.
+    required: false
+    default: null
+    version_added: "2.0"
+
+  cache_ttl:
+    description:
+      - Number of seconds a cached domain list or zone is used without asking the API.
+    required: false
+    default: 300
+    version_added: "2.0"
+
 notes:
   - The DNS Made Easy service requires that machines interacting with the API have the proper time and timezone set. Be sure you are within a few seconds of actual time by using NTP. 
   - This module returns record(s) in the "result" element when 'state' is set to 'present'. This value can be be registered and used in your playbooks.
@@ -107,6 +145,19 @@ EXAMPLES = '''
   
 # delete a record / ensure it is absent
 - dnsmadeeasy: account_key=key account_secret=secret domain=my.com state=absent record_name="test"
+
+# reconcile a set of records in one run, sharing the zone listing between tasks
+- dnsmadeeasy:
+    account_key: key
+    account_secret: secret
+    domain: my.com
+    state: present
+    cache: ~/.ansible/dnsmadeeasy.cache
+    records:
+      - { name: www, type: A, value: 192.168.0.1 }
+      - { name: www, type: A, value: 192.168.0.2 }
+      - { name: mail, type: A, value: 192.168.0.3, ttl: 300 }
+      - { name: old, type: CNAME, value: www, state: absent }
 '''
 
 # ============================================
@@ -117,15 +168,20 @@ IMPORT_ERROR = None
 try:
     import json
     from time import strftime, gmtime
+    import fcntl
     import hashlib
     import hmac
+    import os
+    import tempfile
+    import time
 except ImportError, e:
     IMPORT_ERROR = str(e)
 
 class DME2:
 
-    def __init__(self, apikey, secret, domain, module):
+    def __init__(self, apikey, secret, domain, module, cache_path=None, cache_ttl=300):
         self.module = module
+        self.cache = ZoneCache(cache_path, cache_ttl, apikey)
 
         self.api = apikey
         self.secret = secret
@@ -141,13 +197,15 @@ class DME2:
 
         self.record_url = 'dns/managed/' + str(self.domain) + '/records'
 
-    def _headers(self):
+    def _headers(self, etag=None):
         currTime = self._get_date()
         hashstring = self._create_hash(currTime)
         headers = {'x-dnsme-apiKey': self.api,
                    'x-dnsme-hmac': hashstring,
                    'x-dnsme-requestDate': currTime,
                    'content-type': 'application/json'}
+        if etag:
+            headers['If-None-Match'] = etag
         return headers
 
     def _get_date(self):
@@ -182,8 +240,27 @@ class DME2:
 
         return self.getDomain(self.domain_map.get(domain_name, 0))
 
+    def cachedQuery(self, resource):
+        """ GET a listing through the zone cache, revalidating stale entries by ETag. """
+        entry = self.cache.get(resource)
+        if entry and entry['expires'] > time.time():
+            return entry['data']
+
+        url = self.baseurl + resource
+        response, info = fetch_url(self.module, url, method='GET',
+                                   headers=self._headers(entry and entry.get('etag')))
+        if info['status'] == 304 and entry:
+            self.cache.put(resource, entry['data'], entry.get('etag'))
+            return entry['data']
+        if info['status'] != 200:
+            self.module.fail_json(msg="%s returned %s, with body: %s" % (url, info['status'], info['msg']))
+
+        data = json.load(response)['data']
+        self.cache.put(resource, data, info.get('etag'))
+        return data
+
     def getDomains(self):
-        return self.query('dns/managed', 'GET')['data']
+        return self.cachedQuery('dns/managed')
 
     def getRecord(self, record_id):
         if not self.record_map:
@@ -198,10 +275,9 @@ class DME2:
         return self.getRecord(self.record_map.get(record_name, 0))
 
     def getRecords(self):
-        return self.query(self.record_url, 'GET')['data']
+        return self.cachedQuery(self.record_url)
 
     def _instMap(self, type):
-        #@TODO cache this call so it's executed only once per ansible execution
         map = {}
         results = {}
 
@@ -218,17 +294,176 @@ class DME2:
     def prepareRecord(self, data):
         return json.dumps(data, separators=(',', ':'))
 
+    def _updateCache(self, created=(), updated=(), deleted=()):
+        """ Writes record changes through to the cached zone listing. """
+        records = self.cache.get(self.record_url)
+        if not records:
+            return
+        deleted_ids = set(str(record_id) for record_id in deleted)
+        updated_by_id = dict((str(record['id']), record) for record in updated)
+        data = []
+        for record in records['data']:
+            record_id = str(record['id'])
+            if record_id in deleted_ids:
+                continue
+            if record_id in updated_by_id:
+                record = dict(record, **updated_by_id[record_id])
+            data.append(record)
+        data.extend(record for record in created if record.get('id'))
+        # the zone changed server side, so the old ETag no longer describes it
+        self.cache.put(self.record_url, data, None, records['expires'])
+        self.record_map = None
+
     def createRecord(self, data):
-        #@TODO update the cache w/ resultant record + id when impleneted
-        return self.query(self.record_url, 'POST', data)
+        record = self.query(self.record_url, 'POST', data)
+        self._updateCache(created=[record])
+        return record
 
     def updateRecord(self, record_id, data):
-        #@TODO update the cache w/ resultant record + id when impleneted
-        return self.query(self.record_url + '/' + str(record_id), 'PUT', data)
+        result = self.query(self.record_url + '/' + str(record_id), 'PUT', data)
+        self._updateCache(updated=[dict(json.loads(data), id=record_id)])
+        return result
 
     def deleteRecord(self, record_id):
-        #@TODO remove record from the cache when impleneted
-        return self.query(self.record_url + '/' + str(record_id), 'DELETE')
+        result = self.query(self.record_url + '/' + str(record_id), 'DELETE')
+        self._updateCache(deleted=[record_id])
+        return result
+
+    def createRecords(self, records):
+        created = self.query(self.record_url + '/createMulti', 'POST', self.prepareRecord(records))
+        if not isinstance(created, list):
+            created = []
+        self._updateCache(created=created)
+        return created
+
+    def updateRecords(self, records):
+        result = self.query(self.record_url + '/updateMulti', 'PUT', self.prepareRecord(records))
+        self._updateCache(updated=records)
+        return result
+
+    def deleteRecords(self, record_ids):
+        ids = ','.join(str(record_id) for record_id in record_ids)
+        result = self.query(self.record_url + '?' + urllib.urlencode({'ids': ids}), 'DELETE')
+        self._updateCache(deleted=record_ids)
+        return result
+
+
+class ZoneCache(object):
+    """ Local JSON file caching API listings across tasks, keyed per account and resource. """
+
+    def __init__(self, path, ttl, account_key):
+        self.path = path and os.path.expanduser(path)
+        self.ttl = ttl
+        self.account_key = account_key
+        self.entries = None
+
+    def _key(self, resource):
+        return hashlib.sha1('%s|%s' % (self.account_key, resource)).hexdigest()
+
+    def _load(self):
+        if self.entries is None:
+            try:
+                self.entries = json.load(open(self.path))
+            except (IOError, ValueError):
+                self.entries = {}
+        return self.entries
+
+    def get(self, resource):
+        if not self.path:
+            return None
+        return self._load().get(self._key(resource))
+
+    def put(self, resource, data, etag=None, expires=None):
+        """
+        Records one listing. Other hosts may be writing the same file, so the
+        file is re-read while holding a lock on its .lock companion and this
+        entry is merged into what is there now.
+        """
+        if not self.path:
+            return
+        cache_dir = os.path.dirname(self.path) or '.'
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir, 0700)
+            lock = open(self.path + '.lock', 'a')
+        except (IOError, OSError):
+            # without a lock this listing is simply not shared with later tasks
+            return
+
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            self.entries = None
+            now = time.time()
+            entries = dict((k, v) for k, v in self._load().items() if v.get('expires', 0) > now or v.get('etag'))
+            entries[self._key(resource)] = {'data': data, 'etag': etag, 'expires': expires or now + self.ttl}
+            self.entries = entries
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+                os.write(fd, json.dumps(entries))
+                os.close(fd)
+                os.rename(tmp_path, self.path)
+            except (IOError, OSError):
+                # a full or read-only cache directory only costs a fresh listing next time
+                pass
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+
+
+def reconcile_records(module, DME, records, default_state, default_ttl, exclusive):
+    """ Brings a list of records in line with the zone using one request per kind of change. """
+    desired = {}
+    absent = {}
+    for item in records:
+        if not isinstance(item, dict) or item.get('name') is None or not item.get('type'):
+            module.fail_json(msg="every item of records needs a name and a type: %s" % item)
+        key = (item['name'], item['type'])
+        if item.get('state', default_state) == 'absent':
+            absent.setdefault(key, set()).add(item.get('value'))
+        else:
+            if item.get('value') is None:
+                module.fail_json(msg="record %s %s needs a value" % key)
+            desired.setdefault(key, {})[str(item['value'])] = int(item.get('ttl', default_ttl))
+
+    existing = {}
+    for record in DME.getRecords():
+        existing.setdefault((record['name'], record['type']), []).append(record)
+
+    to_create = []
+    to_update = []
+    to_delete = []
+    for key, values in desired.items():
+        current = dict((str(record['value']), record) for record in existing.get(key, []))
+        for value, ttl in values.items():
+            record = current.get(value)
+            if not record:
+                to_create.append({'name': key[0], 'type': key[1], 'value': value, 'ttl': ttl})
+            elif int(record['ttl']) != ttl:
+                to_update.append(dict(record, ttl=ttl))
+
+    for key, values in absent.items():
+        for record in existing.get(key, []):
+            if None in values or str(record['value']) in [str(value) for value in values]:
+                to_delete.append(record)
+
+    if exclusive:
+        managed_types = set(key[1] for key in desired)
+        for key, current in existing.items():
+            if key[1] not in managed_types:
+                continue
+            for record in current:
+                if str(record['value']) not in desired.get(key, {}) and record not in to_delete:
+                    to_delete.append(record)
+
+    if to_delete:
+        DME.deleteRecords([record['id'] for record in to_delete])
+    if to_update:
+        DME.updateRecords(to_update)
+    if to_create:
+        DME.createRecords(to_create)
+
+    module.exit_json(changed=bool(to_create or to_update or to_delete),
+                     created=to_create, updated=to_update, deleted=to_delete)
 
 
 # ===========================================
@@ -249,20 +484,30 @@ def main():
             record_value=dict(required=False),
             record_ttl=dict(required=False, default=1800, type='int'),
             validate_certs = dict(default='yes', type='bool'),
+            records=dict(required=False, type='list'),
+            exclusive=dict(required=False, default=False, type='bool'),
+            cache=dict(required=False),
+            cache_ttl=dict(required=False, default=300, type='int'),
         ),
         required_together=(
             ['record_value', 'record_ttl', 'record_type']
-        )
+        ),
+        mutually_exclusive=[['records', 'record_name']],
     )
 
     if IMPORT_ERROR:
         module.fail_json(msg="Import Error: " + IMPORT_ERROR)
 
     DME = DME2(module.params["account_key"], module.params[
-               "account_secret"], module.params["domain"], module)
+               "account_secret"], module.params["domain"], module,
+               module.params["cache"], module.params["cache_ttl"])
     state = module.params["state"]
     record_name = module.params["record_name"]
 
+    if module.params["records"]:
+        reconcile_records(module, DME, module.params["records"], state,
+                          module.params["record_ttl"], module.params["exclusive"])
+
     # Follow Keyword Controlled Behavior
     if not record_name:
         domain_records = DME.getRecords()
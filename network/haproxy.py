@@ -45,13 +45,31 @@ options:
   host:
     description:
       - Host (backend) to operate in Haproxy.
-    required: true
+      - One of C(host) or C(hosts) is required.
+    required: false
+    default: null
+  hosts:
+    description:
+      - List of hosts to operate on in one socket session. An item may be
+        given as C(backend/host) to target a single backend, otherwise
+        C(backend) or auto-detection applies to it.
+    required: false
     default: null
+    version_added: "2.0"
   socket:
     description:
       - Haproxy socket file name with path.
     required: false
     default: /var/run/haproxy.sock
+  sockets:
+    description:
+      - List of Haproxy socket files, for C(nbproc) > 1 or several haproxy
+        instances on one host. Items may be shell globs. The same commands are
+        applied to every socket concurrently, and the resulting server state
+        is checked to be the same on all of them. Overrides C(socket).
+    required: false
+    default: null
+    version_added: "2.0"
   backend:
     description:
       - Name of the haproxy backend pool.
@@ -68,6 +86,19 @@ options:
       - When disabling server, immediately terminate all the sessions attached to the specified server. This can be used to terminate long-running sessions after a server is put into maintenance mode, for instance.
     required: false
     default: false
+  wait_for_drain:
+    description:
+      - When disabling servers, poll C(show stat) until every disabled server
+        has no current sessions left (scur is 0), or fail after C(drain_timeout).
+    required: false
+    default: false
+    version_added: "2.0"
+  drain_timeout:
+    description:
+      - Number of seconds to wait for servers to drain.
+    required: false
+    default: 60
+    version_added: "2.0"
 '''
 
 EXAMPLES = '''
@@ -85,6 +116,17 @@ examples:
 # disable backend server in 'www' backend pool and drop open sessions to it
 - haproxy: state=disabled host={{ inventory_hostname }} backend=www socket=/var/run/haproxy.sock shutdown_sessions=true
 
+# disable several servers across backends in one socket session and wait until
+# their active sessions have drained
+- haproxy:
+    state: disabled
+    hosts: [ 'web01', 'web02', 'api/api01' ]
+    wait_for_drain: yes
+    drain_timeout: 300
+
+# disable server on every process of a haproxy running with nbproc > 1
+- haproxy: state=disabled host={{ inventory_hostname }} backend=www sockets=/var/run/haproxy/*.sock
+
 # enable server in 'www' backend pool
 - haproxy: state=enabled host={{ inventory_hostname }} backend=www
 
@@ -94,17 +136,104 @@ examples:
 author: "Ravi Bhure (@ravibhure)" <ravibhure@gmail.com>
 '''
 
+import glob
 import socket
+import threading
+import time
 
 
 DEFAULT_SOCKET_LOCATION="/var/run/haproxy.sock"
-RECV_SIZE = 1024
+RECV_SIZE = 65536
+PROMPT = '\n> '
 ACTION_CHOICES = ['enabled', 'disabled']
 
 ######################################################################
 class TimeoutException(Exception):
   pass
 
+class HAProxyError(Exception):
+  pass
+
+def expand_sockets(paths):
+    """
+    Expands shell globs in a list of socket paths. Paths matching nothing are
+    kept as they are so that connecting to them reports the error.
+    """
+    sockets = []
+    for path in paths:
+        for match in sorted(glob.glob(path)) or [path]:
+            if match not in sockets:
+                sockets.append(match)
+    return sockets
+
+def parse_stat(output):
+    """
+    Parses the CSV output of 'show stat' into a dict keyed by (pxname, svname),
+    each value a dict of the row keyed by column name.
+    """
+    lines = output.strip().split('\n')
+    if not lines or not lines[0].startswith('#'):
+        return {}
+    fields = lines[0].lstrip('# ').split(',')
+    stats = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        row = dict(zip(fields, line.split(',')))
+        stats[(row.get('pxname'), row.get('svname'))] = row
+    return stats
+
+class HAProxySession(object):
+    """
+    A single interactive ('prompt' mode) session on a HAProxy stats socket.
+    Commands sent through it share the connection, and several commands may
+    be written at once and their responses read back in order.
+    """
+
+    def __init__(self, path, timeout=10):
+        self.path = path
+        self.buffer = ''
+        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.client.settimeout(timeout)
+        try:
+            self.client.connect(path)
+            self.client.sendall('prompt\n')
+            self.read_response()
+        except socket.timeout:
+            self.client.close()
+            raise TimeoutException("timed out talking to haproxy socket %s" % path)
+
+    def read_response(self):
+        while PROMPT not in self.buffer:
+            data = self.client.recv(RECV_SIZE)
+            if not data:
+                raise socket.error("haproxy closed the socket %s" % self.path)
+            self.buffer += data
+        response, self.buffer = self.buffer.split(PROMPT, 1)
+        return response.strip()
+
+    def execute_many(self, cmds):
+        """
+        Writes all commands in one go and returns their responses, in order.
+        """
+        if not cmds:
+            return []
+        try:
+            self.client.sendall(''.join('%s\n' % cmd for cmd in cmds))
+            return [self.read_response() for cmd in cmds]
+        except socket.timeout:
+            raise TimeoutException("timed out talking to haproxy socket %s" % self.path)
+
+    def execute(self, cmd):
+        return self.execute_many([cmd])[0]
+
+    def close(self):
+        try:
+            self.client.sendall('quit\n')
+        except socket.error:
+            pass
+        self.client.close()
+
 class HAProxy(object):
     """
     Used for communicating with HAProxy through its local UNIX socket interface.
@@ -121,107 +250,148 @@ class HAProxy(object):
         self.module = module
 
         self.state = self.module.params['state']
-        self.host = self.module.params['host']
+        self.hosts = self.module.params['hosts'] or [self.module.params['host']]
         self.backend = self.module.params['backend']
         self.weight = self.module.params['weight']
-        self.socket = self.module.params['socket']
-        self.shutdown_sessions = self.module.params['shutdown_sessions']
+        self.sockets = expand_sockets(self.module.params['sockets'] or [self.module.params['socket']])
+        self.shutdown_sessions = self.module.boolean(self.module.params['shutdown_sessions'])
+        self.wait_for_drain = self.module.params['wait_for_drain']
+        self.drain_timeout = self.module.params['drain_timeout']
 
         self.command_results = []
 
-    def execute(self, cmd, timeout=200):
+    def targets(self, stats):
         """
-        Executes a HAProxy command by sending a message to a HAProxy's local
-        UNIX socket and waiting up to 'timeout' milliseconds for the response.
+        Resolves the requested hosts to a list of (pxname, svname) pairs.
+        Hosts without an explicit backend are looked up in every backend
+        that has a server of that name.
         """
+        targets = []
+        for host in self.hosts:
+            if '/' in host:
+                pxname, svname = host.split('/', 1)
+                targets.append((pxname, svname))
+            elif self.backend is not None:
+                targets.append((self.backend, host))
+            else:
+                found = sorted(key for key in stats if key[1] == host)
+                if not found:
+                    raise HAProxyError("server %s not found in any backend" % host)
+                targets.extend(found)
+        return targets
+
+    def commands(self, pxname, svname):
+        cmds = ["get weight %s/%s" % (pxname, svname)]
+        if self.state == 'enabled':
+            cmds.append("enable server %s/%s" % (pxname, svname))
+            if self.weight:
+                cmds.append("set weight %s/%s %s" % (pxname, svname, self.weight))
+        else:
+            cmds.append("disable server %s/%s" % (pxname, svname))
+            if self.shutdown_sessions:
+                cmds.append("shutdown sessions server %s/%s" % (pxname, svname))
+        return cmds
 
-        self.client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self.client.connect(self.socket)
-        self.client.sendall('%s\n' % cmd)
-        result = ''
-        buf = ''
-        buf = self.client.recv(RECV_SIZE)
-        while buf:
-            result += buf
-            buf = self.client.recv(RECV_SIZE)
-        self.command_results = result.strip()
-        self.client.close()
-        return result
-
-    def enabled(self, host, backend, weight):
+    def drain(self, session, targets):
         """
-        Enabled action, marks server to UP and checks are re-enabled,
-        also supports to get current weight for server (default) and
-        set the weight for haproxy backend server when provides.
+        Polls 'show stat' until none of the targets has current sessions.
         """
-        svname = host
-        if self.backend is None:
-            output = self.execute('show stat')
-            #sanitize and make a list of lines
-            output = output.lstrip('# ').strip()
-            output = output.split('\n')
-            result = output
-
-            for line in result:
-                if 'BACKEND' in line:
-                    result =  line.split(',')[0]
-                    pxname = result
-                    cmd = "get weight %s/%s ; enable server %s/%s" % (pxname, svname, pxname, svname)
-                    if weight:
-                        cmd += "; set weight %s/%s %s" % (pxname, svname, weight)
-                    self.execute(cmd)
-
-        else:
-            pxname = backend
-            cmd = "get weight %s/%s ; enable server %s/%s" % (pxname, svname, pxname, svname)
-            if weight:
-                cmd += "; set weight %s/%s %s" % (pxname, svname, weight)
-            self.execute(cmd)
-
-    def disabled(self, host, backend, shutdown_sessions):
+        deadline = time.time() + self.drain_timeout
+        delay = 0.5
+        while True:
+            stats = parse_stat(session.execute('show stat'))
+            busy = [t for t in targets if int(stats.get(t, {}).get('scur') or 0) > 0]
+            if not busy or time.time() + delay > deadline:
+                return busy
+            time.sleep(delay)
+            delay = min(delay * 2, 5)
+
+    def apply(self, path):
         """
-        Disabled action, marks server to DOWN for maintenance. In this mode, no more checks will be
-        performed on the server until it leaves maintenance,
-        also it shutdown sessions while disabling backend host server.
+        Runs the requested commands on a single socket and returns the
+        command output together with the 'show stat' index taken afterwards.
         """
-        svname = host
-        if self.backend is None:
-            output = self.execute('show stat')
-            #sanitize and make a list of lines
-            output = output.lstrip('# ').strip()
-            output = output.split('\n')
-            result = output
-
-            for line in result:
-                if 'BACKEND' in line:
-                    result =  line.split(',')[0]
-                    pxname = result
-                    cmd = "get weight %s/%s ; disable server %s/%s" % (pxname, svname, pxname, svname)
-                    if shutdown_sessions:
-                        cmd += "; shutdown sessions server %s/%s" % (pxname, svname)
-                    self.execute(cmd)
-
-        else:
-            pxname = backend
-            cmd = "get weight %s/%s ; disable server %s/%s" % (pxname, svname, pxname, svname)
-            if shutdown_sessions:
-                cmd += "; shutdown sessions server %s/%s" % (pxname, svname)
-            self.execute(cmd)
+        session = HAProxySession(path)
+        try:
+            stats = parse_stat(session.execute('show stat'))
+            targets = self.targets(stats)
+
+            cmds = []
+            for pxname, svname in targets:
+                cmds.extend(self.commands(pxname, svname))
+            results = [r for r in session.execute_many(cmds) if r]
+
+            busy = []
+            if self.state == 'disabled' and self.wait_for_drain:
+                busy = self.drain(session, targets)
+            stats = parse_stat(session.execute('show stat'))
+        finally:
+            session.close()
+        return dict(targets=targets, stdout=results, stats=stats, busy=busy)
+
+    def apply_all(self):
+        """
+        Applies the commands to every socket concurrently, one thread per socket.
+        """
+        outcomes = {}
+
+        def worker(path):
+            try:
+                outcomes[path] = self.apply(path)
+            except Exception, e:
+                outcomes[path] = dict(error=str(e))
+
+        threads = [threading.Thread(target=worker, args=(path,)) for path in self.sockets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def inconsistent(self, outcomes):
+        """
+        Returns the servers whose maintenance state or weight differs between sockets.
+        """
+        seen = {}
+        for outcome in outcomes.values():
+            for target in outcome['targets']:
+                row = outcome['stats'].get(target, {})
+                seen.setdefault(target, set()).add(('MAINT' in row.get('status', ''), row.get('weight')))
+        return sorted(target for target, states in seen.items() if len(states) > 1)
 
     def act(self):
         """
         Figure out what you want to do from ansible, and then do it.
         """
 
-        # toggle enable/disbale server
-        if self.state == 'enabled':
-            self.enabled(self.host, self.backend, self.weight)
-
-        elif self.state == 'disabled':
-            self.disabled(self.host, self.backend, self.shutdown_sessions)
+        if self.state not in ACTION_CHOICES:
+            self.module.fail_json(msg="unknown state specified: '%s'" % self.state)
 
+        outcomes = self.apply_all()
+        if len(self.sockets) == 1:
+            self.command_results = outcomes[self.sockets[0]].get('stdout', [])
         else:
-            self.module.fail_json(msg="unknown state specified: '%s'" % self.state)
+            self.command_results = dict((path, outcome.get('stdout', [])) for path, outcome in outcomes.items())
+
+        errors = dict((path, outcome['error']) for path, outcome in outcomes.items() if 'error' in outcome)
+        if errors:
+            self.module.fail_json(msg="error talking to haproxy socket(s): %s" %
+                                  ', '.join('%s: %s' % item for item in sorted(errors.items())),
+                                  stdout=self.command_results)
+
+        busy = set()
+        for outcome in outcomes.values():
+            busy.update(outcome['busy'])
+        if busy:
+            self.module.fail_json(msg="servers still have sessions after %s seconds: %s" %
+                                  (self.drain_timeout, ', '.join('%s/%s' % t for t in sorted(busy))),
+                                  stdout=self.command_results)
+
+        mismatched = self.inconsistent(outcomes)
+        if mismatched:
+            self.module.fail_json(msg="server state differs between sockets: %s" %
+                                  ', '.join('%s/%s' % t for t in mismatched),
+                                  stdout=self.command_results)
 
         self.module.exit_json(stdout=self.command_results, changed=True)
 
@@ -231,13 +401,18 @@ def main():
     module = AnsibleModule(
         argument_spec = dict(
             state = dict(required=True, default=None, choices=ACTION_CHOICES),
-            host=dict(required=True, default=None),
+            host=dict(required=False, default=None),
+            hosts=dict(required=False, default=None, type='list'),
             backend=dict(required=False, default=None),
             weight=dict(required=False, default=None),
             socket = dict(required=False, default=DEFAULT_SOCKET_LOCATION),
+            sockets = dict(required=False, default=None, type='list'),
             shutdown_sessions=dict(required=False, default=False),
+            wait_for_drain=dict(required=False, default=False, type='bool'),
+            drain_timeout=dict(required=False, default=60, type='int'),
         ),
-
+        required_one_of=[['host', 'hosts']],
+        mutually_exclusive=[['host', 'hosts']],
     )
 
     if not socket:
@@ -14,7 +14,17 @@
 # You should have received a copy of the GNU General Public License
 # along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
 
+import hashlib
+import os
+import re
 import subprocess
+import tempfile
+import time
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
 
 DOCUMENTATION = '''
 ---
@@ -23,7 +33,31 @@ version_added: 1.6
 short_description: get details reported by lldp
 description:
   - Reads data out of lldpctl
-options: {}
+options:
+  interfaces:
+    description:
+      - Only gather neighbors seen on these local interfaces.
+    required: false
+    default: null
+    version_added: "2.0"
+  cache:
+    description:
+      - Path of a local file caching the gathered neighbors. The cache is keyed by the
+        neighbor insert, delete and age-out counters reported by C(lldpcli show statistics),
+        so it is reused as long as no neighbor appeared or went away.
+      - Changes to an existing neighbor do not move those counters and are picked up once the
+        entry is older than C(cache_ttl).
+      - When C(lldpcli) is missing or does not report the counters, the neighbors are gathered
+        without the cache and the result says so in C(msg).
+    required: false
+    default: null
+    version_added: "2.0"
+  cache_ttl:
+    description:
+      - Maximum age in seconds of a cached result.
+    required: false
+    default: 300
+    version_added: "2.0"
 author: "Andy Hill (@andyhky)"
 notes:
   - Requires lldpd running and lldp enabled on switches 
@@ -43,41 +77,145 @@ EXAMPLES = '''
 # ok: [10.13.0.22] => (item=eth1) => {"item": "eth1", "msg": "switch2.example.com / Gi0/3"}
 # ok: [10.13.0.22] => (item=eth0) => {"item": "eth0", "msg": "switch3.example.com / Gi0/3"}
 
+# Only look at the uplinks, reusing the previous result while the neighbor table is unchanged
+ - lldp: interfaces=eth0,eth1 cache=/var/cache/ansible/lldp.json
+
 '''
 
-def gather_lldp():
-    cmd = ['lldpctl', '-f', 'keyvalue']
-    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
-    (output, err) = proc.communicate()
-    if output:
-        output_dict = {}
-        lldp_entries = output.split("\n")
-
-        for entry in lldp_entries:
-            if entry.startswith('lldp'):
-                path, value = entry.strip().split("=", 1)
-                path = path.split(".")
-                path_components, final = path[:-1], path[-1]
-            else:
-                value = current_dict[final] + '\n' + entry
+# a keyvalue line starts with a dotted path without spaces, anything else
+# continues the value of the previous line
+KEYVALUE_LINE = re.compile(r'^(lldp(?:\.[^\s.=]+)+)=(.*)$')
+
 
+def parse_keyvalue(lines):
+    """ Builds the nested dict described by lldpctl keyvalue lines, one line at a time. """
+    output_dict = {}
+    current_dict = None
+    final = None
+    for line in lines:
+        line = line.rstrip('\n')
+        match = KEYVALUE_LINE.match(line)
+        if match:
+            path = match.group(1).split('.')
             current_dict = output_dict
-            for path_component in path_components:
-                current_dict[path_component] = current_dict.get(path_component, {})
-                current_dict = current_dict[path_component]
-            current_dict[final] = value
+            for path_component in path[:-1]:
+                current_dict = current_dict.setdefault(path_component, {})
+            final = path[-1]
+            current_dict[final] = match.group(2)
+        elif current_dict is not None and line:
+            current_dict[final] += '\n' + line
+    return output_dict
+
+
+def gather_lldp(interfaces=None):
+    cmd = ['lldpctl', '-f', 'keyvalue'] + (interfaces or [])
+    try:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    except OSError:
+        return None
+    output_dict = parse_keyvalue(iter(proc.stdout.readline, ''))
+    proc.wait()
+    if proc.returncode == 0:
         return output_dict
-            
 
-def main():
-    module = AnsibleModule({})
 
-    lldp_output = gather_lldp()
+# lldpd nests every statistics counter under a tag of the same name, e.g.
+# lldpcli -f keyvalue show statistics summary prints
+#   lldp.summary.tx.tx=118
+#   lldp.summary.rx.rx=121
+#   lldp.summary.rx_discarded_cnt.rx_discarded_cnt=0
+#   lldp.summary.rx_unrecognized_cnt.rx_unrecognized_cnt=0
+#   lldp.summary.ageout_cnt.ageout_cnt=1
+#   lldp.summary.insert_cnt.insert_cnt=4
+#   lldp.summary.delete_cnt.delete_cnt=1
+CHANGE_COUNTERS = ('insert_cnt', 'delete_cnt', 'ageout_cnt')
+
+
+def parse_change_counters(lines):
+    """ Returns the insert/delete/ageout counters from statistics summary keyvalue lines, or None. """
+    summary = parse_keyvalue(lines).get('lldp', {}).get('summary', {})
+    counters = []
+    for name in CHANGE_COUNTERS:
+        value = summary.get(name)
+        if isinstance(value, dict):
+            value = value.get(name)
+        if value is None:
+            return None
+        counters.append(value)
+    return counters
+
+
+def change_counters(module):
+    """ Returns the neighbor insert/delete/ageout counters of lldpd, or None. """
+    lldpcli = module.get_bin_path('lldpcli')
+    if not lldpcli:
+        return None
+    rc, out, err = module.run_command([lldpcli, '-f', 'keyvalue', 'show', 'statistics', 'summary'])
+    if rc != 0:
+        return None
+    return parse_change_counters(out.splitlines())
+
+
+def read_cache(path, key, counters, ttl):
+    try:
+        entry = json.load(open(path)).get(key)
+    except (IOError, ValueError):
+        return None
+    if entry and entry.get('counters') == counters and entry.get('time', 0) + ttl > time.time():
+        return entry['data']
+    return None
+
+
+def write_cache(path, key, counters, data):
+    try:
+        cache = json.load(open(path))
+    except (IOError, ValueError):
+        cache = {}
+    cache[key] = {'counters': counters, 'time': time.time(), 'data': data}
     try:
-        data = {'lldp': lldp_output['lldp']}
-        module.exit_json(ansible_facts=data)
-    except TypeError:
-        module.fail_json(msg="lldpctl command failed. is lldpd running?")    
+        cache_dir = os.path.dirname(path) or '.'
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0700)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir)
+        os.write(fd, json.dumps(cache))
+        os.close(fd)
+        os.rename(tmp_path, path)
+    except (IOError, OSError):
+        # facts were gathered already, the next run just calls lldpctl again
+        pass
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            interfaces=dict(required=False, type='list'),
+            cache=dict(required=False),
+            cache_ttl=dict(required=False, default=300, type='int'),
+        ),
+        supports_check_mode=True,
+    )
+
+    interfaces = module.params['interfaces']
+    cache_path = module.params['cache'] and os.path.expanduser(module.params['cache'])
+    cache_key = hashlib.sha1(','.join(sorted(interfaces or []))).hexdigest()
+    counters = cache_path and change_counters(module)
+
+    if counters:
+        cached = read_cache(cache_path, cache_key, counters, module.params['cache_ttl'])
+        if cached is not None:
+            module.exit_json(ansible_facts={'lldp': cached}, cached=True)
+
+    lldp_output = gather_lldp(interfaces)
+    if lldp_output is None:
+        module.fail_json(msg="lldpctl command failed. is lldpd running?")
+
+    data = lldp_output.get('lldp', {})
+    if counters:
+        write_cache(cache_path, cache_key, counters, data)
+    elif cache_path:
+        module.exit_json(ansible_facts={'lldp': data}, cached=False,
+                         msg="lldpcli did not report neighbor change counters, the cache was not used")
+    module.exit_json(ansible_facts={'lldp': data}, cached=False)
    
 # import module snippets
 from ansible.module_utils.basic import *
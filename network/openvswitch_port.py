@@ -33,9 +33,21 @@ options:
         description:
             - Name of bridge to manage
     port:
-        required: true
+        required: false
         description:
             - Name of port to manage on the bridge
+            - One of C(port) or C(ports) is required.
+    ports:
+        required: false
+        version_added: "2.0"
+        description:
+            - List of ports to manage on the bridge. Each item is a port name or a
+              dict with C(name) and optionally C(state) (defaults to C(state)),
+              C(type), C(tag), C(options) and C(external_ids). C(tag) is set on the
+              port, the others on its interface; C(options) and C(external_ids) are
+              dicts and only the given keys are managed.
+            - The bridge's ports are read once, then every add, delete and setting
+              change is applied in a single ovs-vsctl transaction.
     state:
         required: false
         default: "present"
@@ -52,9 +64,54 @@ options:
 EXAMPLES = '''
 # Creates port eth2 on bridge br-ex
 - openvswitch_port: bridge=br-ex port=eth2 state=present
+
+# Wires several ports on br-int in one transaction
+- openvswitch_port:
+    bridge: br-int
+    ports:
+      - name: tap0
+        tag: 10
+        external_ids: { iface-id: 8a8d1ff7-3d7f-4ff1-a1a2-9f2bd1b36d8e }
+      - name: vxlan0
+        type: vxlan
+        options: { remote_ip: 192.168.0.2, key: flow }
+      - name: tap-old
+        state: absent
 '''
 
 
+import json
+
+
+def ovsdb_value(value):
+    '''Converts a value from ovs-vsctl --format=json output'''
+    if isinstance(value, list) and value[0] == 'map':
+        return dict((k, ovsdb_value(v)) for k, v in value[1])
+    if isinstance(value, list) and value[0] == 'set':
+        return [ovsdb_value(v) for v in value[1]]
+    if isinstance(value, list) and value[0] == 'uuid':
+        return value[1]
+    return value
+
+
+def parse_tables(out):
+    '''Parses the concatenated JSON tables printed by chained list commands'''
+    decoder = json.JSONDecoder()
+    tables = []
+    out = out.strip()
+    while out:
+        table, end = decoder.raw_decode(out)
+        tables.append([dict(zip(table['headings'], [ovsdb_value(v) for v in row]))
+                       for row in table['data']])
+        out = out[end:].strip()
+    return tables
+
+
+def quote(value):
+    '''Quotes a string so that ovs-vsctl reads it as a single atom'''
+    return json.dumps(str(value))
+
+
 class OVSPort(object):
     def __init__(self, module):
         self.module = module
@@ -86,6 +143,96 @@ class OVSPort(object):
         if rc != 0:
             raise Exception(err)
 
+    def wanted_ports(self):
+        '''Normalizes the ports option to a list of dicts'''
+        ports = []
+        for item in self.module.params['ports']:
+            if not isinstance(item, dict):
+                item = {'name': item}
+            if not item.get('name'):
+                self.module.fail_json(msg="every item of ports needs a name: %s" % item)
+            item.setdefault('state', self.state)
+            ports.append(item)
+        return ports
+
+    def current_settings(self, names):
+        '''Read tag, type, options and external_ids of existing ports in one call'''
+        if not names:
+            return {}, {}
+        rc, out, err = self._vsctl(['--format=json',
+                                    '--', '--columns=name,tag', 'list', 'Port'] + names +
+                                   ['--', '--columns=name,type,options,external_ids', 'list', 'Interface'] + names)
+        if rc != 0:
+            raise Exception(err)
+        ports, interfaces = parse_tables(out)
+        return (dict((row['name'], row) for row in ports),
+                dict((row['name'], row) for row in interfaces))
+
+    def interface_settings(self, item, current=None):
+        '''Interface column settings of item that differ from current'''
+        current = current or {}
+        settings = []
+        if item.get('type') and item['type'] != current.get('type'):
+            settings.append('type=%s' % quote(item['type']))
+        for column in ['options', 'external_ids']:
+            for key, value in sorted((item.get(column) or {}).items()):
+                if current.get(column, {}).get(key) != str(value):
+                    settings.append('%s:%s=%s' % (column, key, quote(value)))
+        return settings
+
+    def plan(self):
+        '''Compute the ovs-vsctl commands needed for the ports option'''
+        rc, out, err = self._vsctl(['list-ports', self.bridge])
+        if rc != 0:
+            raise Exception(err)
+        existing = set(port.strip() for port in out.split('\n') if port.strip())
+
+        wanted = self.wanted_ports()
+        configured = [item['name'] for item in wanted
+                      if item['state'] == 'present' and item['name'] in existing and
+                      (item.get('tag') is not None or item.get('type') or
+                       item.get('options') or item.get('external_ids'))]
+        ports, interfaces = self.current_settings(configured)
+
+        commands = []
+        for item in wanted:
+            name = item['name']
+            if item['state'] == 'absent':
+                if name in existing:
+                    commands.append(['del-port', self.bridge, name])
+                continue
+
+            if name not in existing:
+                add = ['add-port', self.bridge, name]
+                if item.get('tag') is not None:
+                    add.append('tag=%d' % int(item['tag']))
+                commands.append(add)
+                settings = self.interface_settings(item)
+            else:
+                if item.get('tag') is not None:
+                    tag = ports.get(name, {}).get('tag')
+                    if tag != int(item['tag']):
+                        commands.append(['set', 'Port', name, 'tag=%d' % int(item['tag'])])
+                settings = self.interface_settings(item, interfaces.get(name))
+            if settings:
+                commands.append(['set', 'Interface', name] + settings)
+        return commands
+
+    def reconcile(self):
+        '''Apply the ports option in a single transaction'''
+        try:
+            commands = self.plan()
+            if commands and not self.module.check_mode:
+                chained = []
+                for command in commands:
+                    chained.extend(['--'] + command)
+                rc, _, err = self._vsctl(chained)
+                if rc != 0:
+                    raise Exception(err)
+        except Exception, e:
+            self.module.fail_json(msg=str(e))
+        self.module.exit_json(changed=bool(commands), commands=[' '.join(c) for c in commands])
+
     def check(self):
         '''Run check mode'''
         try:
@@ -120,15 +267,20 @@ def main():
     module = AnsibleModule(
         argument_spec={
             'bridge': {'required': True},
-            'port': {'required': True},
+            'port': {'required': False},
+            'ports': {'required': False, 'type': 'list'},
             'state': {'default': 'present', 'choices': ['present', 'absent']},
             'timeout': {'default': 5, 'type': 'int'}
         },
+        required_one_of=[['port', 'ports']],
+        mutually_exclusive=[['port', 'ports']],
         supports_check_mode=True,
     )
 
     port = OVSPort(module)
-    if module.check_mode:
+    if module.params['ports']:
+        port.reconcile()
+    elif module.check_mode:
         port.check()
     else:
         port.run()
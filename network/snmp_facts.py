@@ -31,7 +31,42 @@ options:
     host:
         description:
             - Set to target snmp server (normally {{inventory_hostname}})
-        required: true
+            - One of C(host) or C(hosts) is required.
+        required: false
+    hosts:
+        description:
+            - List of snmp servers to poll concurrently. Their facts are returned
+              in the C(ansible_snmp_hosts) fact, keyed by host. Hosts that could
+              not be polled are listed in C(failed_hosts); the module only fails
+              if no host could be polled.
+        required: false
+        version_added: "2.0"
+    parallel:
+        description:
+            - Number of hosts from C(hosts) polled at the same time.
+        required: false
+        default: 10
+        version_added: "2.0"
+    max_repetitions:
+        description:
+            - Number of rows requested per GETBULK round trip when walking tables.
+        required: false
+        default: 25
+        version_added: "2.0"
+    tables:
+        description:
+            - MIB tables to walk, all of their columns are collected.
+            - When neither C(tables) nor C(columns) is set, the default columns of
+              every table are walked, which leaves out the ifXTable octet counters.
+        choices: [ 'ifTable', 'ifXTable', 'ipAddrTable' ]
+        required: false
+        version_added: "2.0"
+    columns:
+        description:
+            - MIB columns to walk in addition to the ones from C(tables), by object
+              name, e.g. C(ifDescr), C(ifOperStatus) or C(ifHighSpeed).
+        required: false
+        version_added: "2.0"
     version:
         description:
             - SNMP Version to use, v2/v2c or v3
@@ -86,13 +121,33 @@ EXAMPLES = '''
     authkey=abc12345
     privkey=def6789
   delegate_to: localhost
+
+# Poll a list of switches from a single task
+- snmp_facts:
+    hosts: "{{ groups['switches'] }}"
+    version: v2c
+    community: public
+    parallel: 20
+  run_once: true
+  delegate_to: localhost
+
+# Only collect interface names, states and high speed values
+- snmp_facts:
+    host: "{{ inventory_hostname }}"
+    version: v2c
+    community: public
+    columns: [ 'ifDescr', 'ifOperStatus', 'ifHighSpeed' ]
+  delegate_to: localhost
 '''
 
 from ansible.module_utils.basic import *
 from collections import defaultdict
+import Queue
+import threading
 
 try:
     from pysnmp.entity.rfc3413.oneliner import cmdgen
+    from pysnmp.proto import rfc1902
     has_pysnmp = True
 except:
     has_pysnmp = False
@@ -121,6 +176,12 @@ class DefineOid(object):
         self.ifPhysAddress = dp + "1.3.6.1.2.1.2.2.1.6"
         self.ifAdminStatus = dp + "1.3.6.1.2.1.2.2.1.7"
         self.ifOperStatus  = dp + "1.3.6.1.2.1.2.2.1.8"
+
+        # From IF-MIB ifXTable
+        self.ifName        = dp + "1.3.6.1.2.1.31.1.1.1.1"
+        self.ifHCInOctets  = dp + "1.3.6.1.2.1.31.1.1.1.6"
+        self.ifHCOutOctets = dp + "1.3.6.1.2.1.31.1.1.1.10"
+        self.ifHighSpeed   = dp + "1.3.6.1.2.1.31.1.1.1.15"
         self.ifAlias       = dp + "1.3.6.1.2.1.31.1.1.1.18"
 
         # From IP-MIB
@@ -173,10 +234,220 @@ def lookup_operstatus(int_operstatus):
     else:
         return ""
 
+Tree = lambda: defaultdict(Tree)
+
+def set_interface(key, convert=None):
+    def handler(state, index, value):
+        if convert:
+            value = convert(value)
+        state['interfaces'][int(index)][key] = value
+    return handler
+
+def set_ipv4(key):
+    def handler(state, index, value):
+        state['ipv4'][index][key] = value
+    return handler
+
+class OidDispatcher(object):
+    """
+    Routes walked varbinds to a handler by column OID. Each column is
+    registered with the number of sub-identifiers that make up its row index,
+    so the column is found with one dict lookup per distinct index length
+    instead of matching every OID against every column.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.index_lengths = sorted(set(length for length, handler in columns.values()))
+
+    def dispatch(self, state, oid, value):
+        parts = oid.split('.')
+        for length in self.index_lengths:
+            column = self.columns.get('.'.join(parts[:-length]))
+            if column and column[0] == length:
+                column[1](state, '.'.join(parts[-length:]), value)
+                return True
+        return False
+
+v = DefineOid(dotprefix=False)
+
+# Walkable columns as (name, table, oid, index length, handler, walked by default),
+# in table order.
+COLUMNS = [
+    ('ifIndex',        'ifTable',     v.ifIndex,        1, set_interface('ifindex'), True),
+    ('ifDescr',        'ifTable',     v.ifDescr,        1, set_interface('name'), True),
+    ('ifMtu',          'ifTable',     v.ifMtu,          1, set_interface('mtu'), True),
+    ('ifSpeed',        'ifTable',     v.ifSpeed,        1, set_interface('speed'), True),
+    ('ifPhysAddress',  'ifTable',     v.ifPhysAddress,  1, set_interface('mac', decode_mac), True),
+    ('ifAdminStatus',  'ifTable',     v.ifAdminStatus,  1, set_interface('adminstatus', lambda val: lookup_adminstatus(int(val))), True),
+    ('ifOperStatus',   'ifTable',     v.ifOperStatus,   1, set_interface('operstatus', lambda val: lookup_operstatus(int(val))), True),
+    ('ifName',         'ifXTable',    v.ifName,         1, set_interface('ifname'), True),
+    ('ifHCInOctets',   'ifXTable',    v.ifHCInOctets,   1, set_interface('in_octets'), False),
+    ('ifHCOutOctets',  'ifXTable',    v.ifHCOutOctets,  1, set_interface('out_octets'), False),
+    ('ifHighSpeed',    'ifXTable',    v.ifHighSpeed,    1, set_interface('highspeed'), True),
+    ('ifAlias',        'ifXTable',    v.ifAlias,        1, set_interface('description'), True),
+    ('ipAdEntAddr',    'ipAddrTable', v.ipAdEntAddr,    4, set_ipv4('address'), True),
+    ('ipAdEntIfIndex', 'ipAddrTable', v.ipAdEntIfIndex, 4, set_ipv4('interface'), True),
+    ('ipAdEntNetMask', 'ipAddrTable', v.ipAdEntNetMask, 4, set_ipv4('netmask'), True),
+]
+
+TABLES = ['ifTable', 'ifXTable', 'ipAddrTable']
+
+DISPATCHER = OidDispatcher(dict((oid, (length, handler)) for name, table, oid, length, handler, default in COLUMNS))
+
+# ifSpeed is a Gauge32 and saturates for links faster than ~4.3Gbps
+IFSPEED_MAX = 4294967295
+
+def select_walks(tables=None, columns=None):
+    """
+    Returns the column OIDs to walk, grouped in one list per table.
+    """
+    walks = []
+    for current_table in TABLES:
+        walk = []
+        for name, table, oid, length, handler, default in COLUMNS:
+            if table != current_table:
+                continue
+            if tables or columns:
+                if table in (tables or []) or name in (columns or []):
+                    walk.append(oid)
+            elif default:
+                walk.append(oid)
+        if walk:
+            walks.append(walk)
+    return walks
+
+def poll_host(cmdGen, snmp_auth, host, max_repetitions, walks):
+    """
+    Collects the facts of one host. Returns (facts, error).
+    """
+
+    # Use p to prefix OIDs with a dot for polling
+    p = DefineOid(dotprefix=True)
+
+    results = Tree()
+    transport = cmdgen.UdpTransportTarget((host, 161))
+
+    errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
+        snmp_auth,
+        transport,
+        cmdgen.MibVariable(p.sysDescr,),
+        cmdgen.MibVariable(p.sysObjectId,), 
+        cmdgen.MibVariable(p.sysUpTime,),
+        cmdgen.MibVariable(p.sysContact,), 
+        cmdgen.MibVariable(p.sysName,),
+        cmdgen.MibVariable(p.sysLocation,),
+    )
+
+    if errorIndication:
+        return None, str(errorIndication)
+
+    for oid, val in varBinds:
+        current_oid = oid.prettyPrint()
+        current_val = val.prettyPrint()
+        if current_oid == v.sysDescr:
+            results['ansible_sysdescr'] = decode_hex(current_val)
+        elif current_oid == v.sysObjectId:
+            results['ansible_sysobjectid'] = current_val
+        elif current_oid == v.sysUpTime:
+            results['ansible_sysuptime'] = current_val
+        elif current_oid == v.sysContact:
+            results['ansible_syscontact'] = current_val
+        elif current_oid == v.sysName:
+            results['ansible_sysname'] = current_val
+        elif current_oid == v.sysLocation:
+            results['ansible_syslocation'] = current_val
+
+    state = dict(interfaces=results['ansible_interfaces'], ipv4=Tree())
+
+    for columns in walks:
+        errorIndication, errorStatus, errorIndex, varTable = cmdGen.bulkCmd(
+            snmp_auth,
+            transport,
+            0, max_repetitions,
+            *[cmdgen.MibVariable('.' + column,) for column in columns]
+        )
+
+        if errorIndication:
+            return None, str(errorIndication)
+
+        # GETBULK returns rows past the end of a column, and the dispatcher would
+        # route those to whatever column follows, so only keep the varbinds that
+        # are still under the column requested at their position
+        prefixes = [rfc1902.ObjectName(column) for column in columns]
+        for varBinds in varTable:
+            for prefix, (oid, val) in zip(prefixes, varBinds):
+                if prefix.isPrefixOf(oid):
+                    DISPATCHER.dispatch(state, oid.prettyPrint(), val.prettyPrint())
+
+    ipv4_networks = state['ipv4']
+    all_ipv4_addresses = []
+    interface_to_ipv4 = {}
+    for ipv4_network in sorted(ipv4_networks, key=lambda ip: [int(part) for part in ip.split('.')]):
+        network = ipv4_networks[ipv4_network]
+        if 'address' in network:
+            all_ipv4_addresses.append(network['address'])
+        if 'interface' not in network:
+            continue
+        current_network = {
+                            'address':  network.get('address'),
+                            'netmask':  network.get('netmask')
+                          }
+        interface_to_ipv4.setdefault(network['interface'], []).append(current_network)
+
+    for interface in interface_to_ipv4:
+        results['ansible_interfaces'][int(interface)]['ipv4'] = interface_to_ipv4[interface]
+
+    for interface in results['ansible_interfaces'].values():
+        if 'highspeed' in interface and interface.get('speed', str(IFSPEED_MAX)) == str(IFSPEED_MAX):
+            interface['speed'] = str(int(interface['highspeed']) * 1000000)
+
+    results['ansible_all_ipv4_addresses'] = all_ipv4_addresses
+
+    return results, None
+
+def poll_hosts(snmp_auth, hosts, max_repetitions, walks, parallel):
+    """
+    Polls several hosts from a pool of threads, each with its own command generator.
+    """
+    pending = Queue.Queue()
+    for host in hosts:
+        pending.put(host)
+    facts = {}
+    errors = {}
+
+    def worker():
+        cmdGen = cmdgen.CommandGenerator()
+        while True:
+            try:
+                host = pending.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                results, error = poll_host(cmdGen, snmp_auth, host, max_repetitions, walks)
+            except Exception, e:
+                results, error = None, str(e)
+            if error:
+                errors[host] = error
+            else:
+                facts[host] = results
+
+    threads = [threading.Thread(target=worker) for i in range(max(1, min(parallel, len(hosts))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return facts, errors
+
 def main():
     module = AnsibleModule(
         argument_spec=dict(
-            host=dict(required=True),
+            host=dict(required=False),
+            hosts=dict(required=False, type='list'),
+            parallel=dict(required=False, default=10, type='int'),
+            max_repetitions=dict(required=False, default=25, type='int'),
+            tables=dict(required=False, type='list'),
+            columns=dict(required=False, type='list'),
             version=dict(required=True, choices=['v2', 'v2c', 'v3']),
             community=dict(required=False, default=False),
             username=dict(required=False),
@@ -187,6 +458,8 @@ def main():
             privkey=dict(required=False),
             removeplaceholder=dict(required=False)),
             required_together = ( ['username','level','integrity','authkey'],['privacy','privkey'],),
+            required_one_of = ( ['host','hosts'],),
+            mutually_exclusive = ( ['host','hosts'],),
         supports_check_mode=False)
 
     m_args = module.params
@@ -196,6 +469,15 @@ def main():
 
     cmdGen = cmdgen.CommandGenerator()
 
+    known_columns = [column[0] for column in COLUMNS]
+    for table in m_args['tables'] or []:
+        if table not in TABLES:
+            module.fail_json(msg='Unknown table %s, expected one of: %s' % (table, ', '.join(TABLES)))
+    for column in m_args['columns'] or []:
+        if column not in known_columns:
+            module.fail_json(msg='Unknown column %s, expected one of: %s' % (column, ', '.join(known_columns)))
+    walks = select_walks(m_args['tables'], m_args['columns'])
+
     # Verify that we receive a community when using snmp v2
     if m_args['version'] == "v2" or m_args['version'] == "v2c":
         if m_args['community'] == False:
@@ -231,136 +513,17 @@ def main():
     else:
         snmp_auth = cmdgen.UsmUserData(m_args['username'], authKey=m_args['authkey'], privKey=m_args['privkey'], authProtocol=integrity_proto, privProtocol=privacy_proto)
 
-    # Use p to prefix OIDs with a dot for polling
-    p = DefineOid(dotprefix=True)
-    # Use v without a prefix to use with return values
-    v = DefineOid(dotprefix=False)
-
-    Tree = lambda: defaultdict(Tree)
-                               
-    results = Tree()
-            
-    errorIndication, errorStatus, errorIndex, varBinds = cmdGen.getCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)),
-        cmdgen.MibVariable(p.sysDescr,),
-        cmdgen.MibVariable(p.sysObjectId,), 
-        cmdgen.MibVariable(p.sysUpTime,),
-        cmdgen.MibVariable(p.sysContact,), 
-        cmdgen.MibVariable(p.sysName,),
-        cmdgen.MibVariable(p.sysLocation,),
-    )
-
-
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication))
-
-    for oid, val in varBinds:
-        current_oid = oid.prettyPrint()
-        current_val = val.prettyPrint()
-        if current_oid == v.sysDescr:
-            results['ansible_sysdescr'] = decode_hex(current_val)
-        elif current_oid == v.sysObjectId:
-            results['ansible_sysobjectid'] = current_val
-        elif current_oid == v.sysUpTime:
-            results['ansible_sysuptime'] = current_val
-        elif current_oid == v.sysContact:
-            results['ansible_syscontact'] = current_val
-        elif current_oid == v.sysName:
-            results['ansible_sysname'] = current_val
-        elif current_oid == v.sysLocation:
-            results['ansible_syslocation'] = current_val
-
-    errorIndication, errorStatus, errorIndex, varTable = cmdGen.nextCmd(
-        snmp_auth,
-        cmdgen.UdpTransportTarget((m_args['host'], 161)), 
-        cmdgen.MibVariable(p.ifIndex,),
-        cmdgen.MibVariable(p.ifDescr,),
-        cmdgen.MibVariable(p.ifMtu,),
-        cmdgen.MibVariable(p.ifSpeed,),
-        cmdgen.MibVariable(p.ifPhysAddress,),
-        cmdgen.MibVariable(p.ifAdminStatus,),
-        cmdgen.MibVariable(p.ifOperStatus,),
-        cmdgen.MibVariable(p.ipAdEntAddr,), 
-        cmdgen.MibVariable(p.ipAdEntIfIndex,), 
-        cmdgen.MibVariable(p.ipAdEntNetMask,), 
-
-        cmdgen.MibVariable(p.ifAlias,),
-    )
- 
+    if m_args['hosts']:
+        facts, errors = poll_hosts(snmp_auth, m_args['hosts'], m_args['max_repetitions'], walks, m_args['parallel'])
+        if not facts:
+            module.fail_json(msg='unable to poll any host', failed_hosts=errors)
+        module.exit_json(ansible_facts=dict(ansible_snmp_hosts=facts), failed_hosts=errors)
 
-    if errorIndication:
-        module.fail_json(msg=str(errorIndication))
-
-    interface_indexes = []
-    
-    all_ipv4_addresses = []     
-    ipv4_networks = Tree()
-
-    for varBinds in varTable:
-        for oid, val in varBinds:
-            current_oid = oid.prettyPrint()
-            current_val = val.prettyPrint()
-            if v.ifIndex in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['ifindex'] = current_val
-                interface_indexes.append(ifIndex)
-            if v.ifDescr in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['name'] = current_val
-            if v.ifMtu in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['mtu'] = current_val
-            if v.ifMtu in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['speed'] = current_val
-            if v.ifPhysAddress in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['mac'] = decode_mac(current_val)
-            if v.ifAdminStatus in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['adminstatus'] = lookup_adminstatus(int(current_val))
-            if v.ifOperStatus in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['operstatus'] = lookup_operstatus(int(current_val))
-            if v.ipAdEntAddr in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['address'] = current_val
-                all_ipv4_addresses.append(current_val)
-            if v.ipAdEntIfIndex in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['interface'] = current_val
-            if v.ipAdEntNetMask in current_oid:
-                curIPList = current_oid.rsplit('.', 4)[-4:]
-                curIP = ".".join(curIPList)
-                ipv4_networks[curIP]['netmask'] = current_val
-
-            if v.ifAlias in current_oid:
-                ifIndex = int(current_oid.rsplit('.', 1)[-1])
-                results['ansible_interfaces'][ifIndex]['description'] = current_val
-
-    interface_to_ipv4 = {}
-    for ipv4_network in ipv4_networks:
-        current_interface = ipv4_networks[ipv4_network]['interface']
-        current_network = {
-                            'address':  ipv4_networks[ipv4_network]['address'],
-                            'netmask':  ipv4_networks[ipv4_network]['netmask']
-                          }
-        if not current_interface in interface_to_ipv4:
-            interface_to_ipv4[current_interface] = []
-            interface_to_ipv4[current_interface].append(current_network)
-        else:
-            interface_to_ipv4[current_interface].append(current_network)
-
-    for interface in interface_to_ipv4:
-        results['ansible_interfaces'][int(interface)]['ipv4'] = interface_to_ipv4[interface]
+    results, error = poll_host(cmdGen, snmp_auth, m_args['host'], m_args['max_repetitions'], walks)
+    if error:
+        module.fail_json(msg=error)
 
-    results['ansible_all_ipv4_addresses'] = all_ipv4_addresses
- 
     module.exit_json(ansible_facts=results)
     
 
 main()
-
@@ -44,9 +44,15 @@ options:
     default: ansible
   msg:
     description:
-      - The message body.
-    required: true
+      - The message body. Required unless msgs is given.
+    required: false
+    default: null
+  msgs:
+    description:
+      - A list of messages sent in order over a single connection, in place of msg.
+    required: false
     default: null
+    version_added: 2.0
   color:
     description:
       - Text color for the message. ("none" is a valid option in 1.6 or later, in 1.6 and prior, the default color is black, not "none"). 
@@ -55,7 +61,8 @@ options:
     choices: [ "none", "yellow", "red", "green", "blue", "black" ]
   channel:
     description:
-      - Channel name
+      - Channel name. Several channels may be given as a list or separated by
+        commas; every message is sent to each of them.
     required: true
   key:
     description:
@@ -77,6 +84,18 @@ options:
       - Designates whether TLS/SSL should be used when connecting to the IRC server
     default: False
     version_added: 1.8
+  flood_burst:
+    description:
+      - Number of PRIVMSG lines sent back to back before throttling to one
+        line per flood_interval, to stay below the server's flood limits
+    default: 5
+    version_added: 2.0
+  flood_interval:
+    description:
+      - Seconds between PRIVMSG lines once flood_burst lines have been sent.
+        C(0) disables throttling.
+    default: 1
+    version_added: 2.0
 
 # informational: requirements for nodes
 requirements: [ socket ]
@@ -93,6 +112,16 @@ EXAMPLES = '''
                 msg="All finished at {{ ansible_date_time.iso8601 }}"
                 color=red
                 nick=ansibleIRC
+
+- local_action:
+    module: irc
+    server: irc.example.net
+    channel:
+      - "#release"
+      - "#ops"
+    msgs:
+      - "Release 1.2.0 deployed"
+      - "Changelog: http://example.com/changelog/1.2.0"
 '''
 
 # ===========================================
@@ -100,15 +129,39 @@ EXAMPLES = '''
 #
 
 import re
+import select
 import socket
 import ssl
+import time
 
-from time import sleep
+
+def irc_read_until(irc, buf, pattern, timeout, what):
+    '''read from the connection until pattern matches, answering server PINGs'''
+    deadline = time.time() + timeout
+    while 1:
+        match = re.search(pattern, buf, flags=re.M | re.I)
+        if match:
+            return match, buf
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise Exception('Timeout waiting for IRC %s' % what)
+        # ssl sockets may hold decrypted data that select() cannot see
+        if not (hasattr(irc, 'pending') and irc.pending()):
+            readable, _, _ = select.select([irc], [], [], remaining)
+            if not readable:
+                continue
+        data = irc.recv(4096)
+        if not data:
+            raise Exception('IRC server closed the connection while waiting for %s' % what)
+        buf += data
+        for ping in re.findall('^PING (\S+)', data, flags=re.M):
+            irc.send('PONG %s\r\n' % ping)
 
 
 def send_msg(channel, msg, server='localhost', port='6667', key=None,
-             nick="ansible", color='none', passwd=False, timeout=30, use_ssl=False):
-    '''send message to IRC'''
+             nick="ansible", color='none', passwd=False, timeout=30, use_ssl=False,
+             flood_burst=5, flood_interval=1):
+    '''send one or more messages to one or more IRC channels over a single connection'''
 
     colornumbers = {
         'black': "01",
@@ -124,50 +177,62 @@ def send_msg(channel, msg, server='localhost', port='6667', key=None,
     except:
         colortext = ""
 
-    message = colortext + msg
+    channels = channel
+    if isinstance(channels, basestring):
+        channels = [channels]
+    msgs = msg
+    if isinstance(msgs, basestring):
+        msgs = [msgs]
 
     irc = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     if use_ssl:
         irc = ssl.wrap_socket(irc)
+    irc.settimeout(timeout)
     irc.connect((server, int(port)))
     if passwd:
         irc.send('PASS %s\r\n' % passwd)
     irc.send('NICK %s\r\n' % nick)
     irc.send('USER %s %s %s :ansible IRC\r\n' % (nick, nick, nick))
-    motd = ''
-    start = time.time()
-    while 1:
-        motd += irc.recv(1024)
-        # The server might send back a shorter nick than we specified (due to NICKLEN),
-        #  so grab that and use it from now on (assuming we find the 00[1-4] response).
-        match = re.search('^:\S+ 00[1-4] (?P<nick>\S+) :', motd, flags=re.M)
-        if match:
-            nick = match.group('nick')
-            break
-        elif time.time() - start > timeout:
-            raise Exception('Timeout waiting for IRC server welcome response')
-        sleep(0.5)
-
-    if key:
-        irc.send('JOIN %s %s\r\n' % (channel, key))
-    else:
-        irc.send('JOIN %s\r\n' % channel)
-
-    join = ''
-    start = time.time()
-    while 1:
-        join += irc.recv(1024)
-        if re.search('^:\S+ 366 %s %s :' % (nick, channel), join, flags=re.M):
-            break
-        elif time.time() - start > timeout:
-            raise Exception('Timeout waiting for IRC JOIN response')
-        sleep(0.5)
-
-    irc.send('PRIVMSG %s :%s\r\n' % (channel, message))
-    sleep(1)
-    irc.send('PART %s\r\n' % channel)
+
+    # The server might send back a shorter nick than we specified (due to NICKLEN),
+    #  so grab that and use it from now on (assuming we find the 00[1-4] response).
+    match, buf = irc_read_until(irc, '', '^:\S+ 00[1-4] (?P<nick>\S+) :', timeout,
+                                'server welcome response')
+    nick = match.group('nick')
+
+    for chan in channels:
+        if key:
+            irc.send('JOIN %s %s\r\n' % (chan, key))
+        else:
+            irc.send('JOIN %s\r\n' % chan)
+    for chan in channels:
+        match, buf = irc_read_until(irc, buf, '^:\S+ 366 %s %s :' % (re.escape(nick), re.escape(chan)),
+                                    timeout, 'JOIN response for %s' % chan)
+
+    # simple token bucket: flood_burst lines go out at once, then one line
+    # every flood_interval seconds
+    tokens = float(flood_burst)
+    last = time.time()
+    for text in msgs:
+        for chan in channels:
+            if flood_interval > 0:
+                now = time.time()
+                tokens = min(float(flood_burst), tokens + (now - last) / flood_interval)
+                last = now
+                if tokens < 1:
+                    time.sleep((1 - tokens) * flood_interval)
+                    tokens = 1
+                    last = time.time()
+                tokens -= 1
+            irc.send('PRIVMSG %s :%s\r\n' % (chan, colortext + text))
+
+    irc.send('PART %s\r\n' % ','.join(channels))
     irc.send('QUIT\r\n')
-    sleep(1)
+    # wait for the server to acknowledge the QUIT by closing the link
+    try:
+        irc_read_until(irc, buf, '^ERROR ', timeout, 'QUIT response')
+    except Exception:
+        pass
     irc.close()
 
 # ===========================================
@@ -181,31 +246,41 @@ def main():
             server=dict(default='localhost'),
             port=dict(default=6667),
             nick=dict(default='ansible'),
-            msg=dict(required=True),
+            msg=dict(),
+            msgs=dict(type='list'),
             color=dict(default="none", choices=["yellow", "red", "green",
                                                  "blue", "black", "none"]),
-            channel=dict(required=True),
+            channel=dict(required=True, type='list'),
             key=dict(),
             passwd=dict(),
             timeout=dict(type='int', default=30),
-            use_ssl=dict(type='bool', default=False)
+            use_ssl=dict(type='bool', default=False),
+            flood_burst=dict(type='int', default=5),
+            flood_interval=dict(type='float', default=1),
         ),
+        required_one_of=[['msg', 'msgs']],
+        mutually_exclusive=[['msg', 'msgs']],
         supports_check_mode=True
     )
 
     server = module.params["server"]
     port = module.params["port"]
     nick = module.params["nick"]
-    msg = module.params["msg"]
+    msg = module.params["msg"] or module.params["msgs"]
     color = module.params["color"]
     channel = module.params["channel"]
     key = module.params["key"]
     passwd = module.params["passwd"]
     timeout = module.params["timeout"]
     use_ssl = module.params["use_ssl"]
+    flood_burst = module.params["flood_burst"]
+    flood_interval = module.params["flood_interval"]
+    if flood_interval < 0:
+        module.fail_json(msg="flood_interval must not be negative")
 
     try:
-        send_msg(channel, msg, server, port, key, nick, color, passwd, timeout, use_ssl)
+        send_msg(channel, msg, server, port, key, nick, color, passwd, timeout, use_ssl,
+                 flood_burst, flood_interval)
     except Exception, e:
         module.fail_json(msg="unable to send to IRC: %s" % e)
 
@@ -110,6 +110,20 @@ options:
       - The character set of email being sent
     default: 'us-ascii'
     required: false
+  messages:
+    description:
+      - A list of messages sent over a single SMTP session. Each message is a
+        dict that may set C(to), C(cc), C(bcc), C(subject), C(body),
+        C(attach), C(headers) and C(charset); unset keys fall back to the
+        module options.
+    default: null
+    required: false
+    version_added: "2.0"
+notes:
+  - Attachments are base64-encoded in chunks into a temporary file that
+    stays in memory only while it is small, and the message is streamed to
+    the server from that file, so large attachments are never fully loaded
+    into memory.
 """
 
 EXAMPLES = '''
@@ -145,19 +159,34 @@ EXAMPLES = '''
     to="John Smith <john.smith@example.com>"
     subject='Ansible-report'
     body='System {{ ansible_hostname }} has been successfully provisioned.'
+
+# Send log bundles to several teams over one SMTP session
+- local_action:
+    module: mail
+    host: smtp.example.com
+    subject: Nightly logs
+    messages:
+      - to: "Ops <ops@example.com>"
+        attach: /var/tmp/logs-ops.tar.gz
+      - to: "Dev <dev@example.com>"
+        body: Application logs attached
+        attach: /var/tmp/logs-app.tar.gz
 '''
 
+import base64
 import os
+import random
 import sys
 import smtplib
 import ssl
+import tempfile
 
 try:
     from email import encoders
     import email.utils
     from email.utils import parseaddr, formataddr
     from email.mime.base import MIMEBase
-    from mail.mime.multipart import MIMEMultipart
+    from email.mime.multipart import MIMEMultipart
     from email.mime.text import MIMEText
 except ImportError:
     from email import Encoders as encoders
@@ -167,62 +196,20 @@ except ImportError:
     from email.MIMEMultipart import MIMEMultipart
     from email.MIMEText import MIMEText
 
-def main():
+# messages stay in memory until they grow past this size
+SPOOL_MAX_SIZE = 1024 * 1024
+# a multiple of 57 bytes so that every encoded chunk ends on a full 76 column line
+ENCODE_CHUNK_SIZE = 57 * 1024
+SEND_CHUNK_SIZE = 64 * 1024
 
-    module = AnsibleModule(
-        argument_spec = dict(
-            username = dict(default=None),
-            password = dict(default=None),
-            host = dict(default='localhost'),
-            port = dict(default='25'),
-            sender = dict(default='root', aliases=['from']),
-            to = dict(default='root', aliases=['recipients']),
-            cc = dict(default=None),
-            bcc = dict(default=None),
-            subject = dict(required=True, aliases=['msg']),
-            body = dict(default=None),
-            attach = dict(default=None),
-            headers = dict(default=None),
-            charset = dict(default='us-ascii')
-        )
-    )
 
-    username = module.params.get('username')
-    password = module.params.get('password')
-    host = module.params.get('host')
-    port = module.params.get('port')
-    sender = module.params.get('sender')
-    recipients = module.params.get('to')
-    copies = module.params.get('cc')
-    blindcopies = module.params.get('bcc')
-    subject = module.params.get('subject')
-    body = module.params.get('body')
-    attach_files = module.params.get('attach')
-    headers = module.params.get('headers')
-    charset = module.params.get('charset')
+def compose_message(spool, sender, subject, body, recipients, copies, blindcopies,
+                    attach_files, headers, charset):
+    '''write a multipart message to spool and return the envelope addresses'''
     sender_phrase, sender_addr = parseaddr(sender)
+    boundary = '===============%d==' % random.randrange(sys.maxint)
 
-    if not body:
-        body = subject
-
-    try:
-        try:
-            smtp = smtplib.SMTP_SSL(host, port=int(port))
-        except (smtplib.SMTPException, ssl.SSLError):
-            smtp = smtplib.SMTP(host, port=int(port))
-    except Exception, e:
-        module.fail_json(rc=1, msg='Failed to send mail to server %s on port %s: %s' % (host, port, e))
-
-    smtp.ehlo()
-    if username and password:
-        if smtp.has_extn('STARTTLS'):
-            smtp.starttls()
-        try:
-            smtp.login(username, password)
-        except smtplib.SMTPAuthenticationError:
-            module.fail_json(msg="Authentication to %s:%s failed, please check your username and/or password" % (host, port))
-
-    msg = MIMEMultipart()
+    msg = MIMEMultipart(boundary=boundary)
     msg['Subject'] = subject
     msg['From'] = formataddr((sender_phrase, sender_addr))
     msg.preamble = "Multipart message"
@@ -262,33 +249,159 @@ def main():
     part = MIMEText(body + "\n\n", _charset=charset)
     msg.attach(part)
 
+    # everything up to the closing boundary is small, the attachments are
+    # appended part by part after it
+    composed = msg.as_string()
+    spool.write(composed[:composed.rfind('--%s--' % boundary)])
+
     if attach_files is not None:
         for file in attach_files.split():
             try:
                 fp = open(file, 'rb')
 
                 part = MIMEBase('application', 'octet-stream')
-                part.set_payload(fp.read())
+                part.add_header('Content-Transfer-Encoding', 'base64')
+                part.add_header('Content-disposition', 'attachment', filename=os.path.basename(file))
+
+                spool.write('--%s\n' % boundary)
+                for h_key, h_val in part.items():
+                    spool.write('%s: %s\n' % (h_key, h_val))
+                spool.write('\n')
+                while True:
+                    chunk = fp.read(ENCODE_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    spool.write(base64.encodestring(chunk))
                 fp.close()
+                spool.write('\n')
+            except Exception, e:
+                raise Exception("can't attach file %s: %s" % (file, e))
 
-                encoders.encode_base64(part)
+    spool.write('--%s--\n' % boundary)
+    return sender_addr, set(addr_list)
 
-                part.add_header('Content-disposition', 'attachment', filename=os.path.basename(file))
-                msg.attach(part)
-            except Exception, e:
-                module.fail_json(rc=1, msg="Failed to send mail: can't attach file %s: %s" % (file, e))
-                sys.exit()
 
-    composed = msg.as_string()
+def send_spooled(smtp, sender_addr, addr_list, spool):
+    '''stream a spooled message through an open SMTP session'''
+    code, resp = smtp.mail(sender_addr)
+    if code != 250:
+        smtp.rset()
+        raise smtplib.SMTPSenderRefused(code, resp, sender_addr)
+
+    refused = {}
+    for addr in addr_list:
+        code, resp = smtp.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+    if len(refused) == len(addr_list):
+        smtp.rset()
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    code, resp = smtp.docmd('data')
+    if code != 354:
+        smtp.rset()
+        raise smtplib.SMTPDataError(code, resp)
+
+    spool.seek(0)
+    buf = []
+    size = 0
+    for line in spool:
+        line = line.rstrip('\r\n')
+        if line.startswith('.'):
+            line = '.' + line
+        buf.append(line)
+        size += len(line) + 2
+        if size >= SEND_CHUNK_SIZE:
+            smtp.send('\r\n'.join(buf) + '\r\n')
+            buf = []
+            size = 0
+    buf.append('.')
+    smtp.send('\r\n'.join(buf) + '\r\n')
+
+    code, resp = smtp.getreply()
+    if code != 250:
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
+
+
+def main():
+
+    module = AnsibleModule(
+        argument_spec = dict(
+            username = dict(default=None),
+            password = dict(default=None),
+            host = dict(default='localhost'),
+            port = dict(default='25'),
+            sender = dict(default='root', aliases=['from']),
+            to = dict(default='root', aliases=['recipients']),
+            cc = dict(default=None),
+            bcc = dict(default=None),
+            subject = dict(required=True, aliases=['msg']),
+            body = dict(default=None),
+            attach = dict(default=None),
+            headers = dict(default=None),
+            charset = dict(default='us-ascii'),
+            messages = dict(default=None, type='list'),
+        )
+    )
+
+    username = module.params.get('username')
+    password = module.params.get('password')
+    host = module.params.get('host')
+    port = module.params.get('port')
+    sender = module.params.get('sender')
+
+    messages = module.params.get('messages')
+    if not messages:
+        messages = [{}]
+    for message in messages:
+        if not isinstance(message, dict):
+            module.fail_json(rc=1, msg="Each entry in messages must be a dict")
 
     try:
-        smtp.sendmail(sender_addr, set(addr_list), composed)
+        try:
+            smtp = smtplib.SMTP_SSL(host, port=int(port))
+        except (smtplib.SMTPException, ssl.SSLError):
+            smtp = smtplib.SMTP(host, port=int(port))
     except Exception, e:
-        module.fail_json(rc=1, msg='Failed to send mail to %s: %s' % (", ".join(addr_list), e))
+        module.fail_json(rc=1, msg='Failed to send mail to server %s on port %s: %s' % (host, port, e))
+
+    smtp.ehlo()
+    if username and password:
+        if smtp.has_extn('STARTTLS'):
+            smtp.starttls()
+        try:
+            smtp.login(username, password)
+        except smtplib.SMTPAuthenticationError:
+            module.fail_json(msg="Authentication to %s:%s failed, please check your username and/or password" % (host, port))
+
+    sent = []
+    for message in messages:
+        params = dict(module.params)
+        params.update(message)
+        subject = params.get('subject')
+        body = params.get('body') or subject
+
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            try:
+                sender_addr, addr_list = compose_message(spool, sender, subject, body,
+                    params.get('to'), params.get('cc'), params.get('bcc'),
+                    params.get('attach'), params.get('headers'), params.get('charset'))
+            except Exception, e:
+                module.fail_json(rc=1, msg="Failed to send mail: %s" % e, sent=sent)
+
+            try:
+                refused = send_spooled(smtp, sender_addr, addr_list, spool)
+            except Exception, e:
+                module.fail_json(rc=1, msg='Failed to send mail to %s: %s' % (", ".join(addr_list), e), sent=sent)
+        finally:
+            spool.close()
+        sent.append(dict(subject=subject, recipients=sorted(addr_list), refused=sorted(refused)))
 
     smtp.quit()
 
-    module.exit_json(changed=False)
+    module.exit_json(changed=False, sent=sent)
 
 # import module snippets
 from ansible.module_utils.basic import *
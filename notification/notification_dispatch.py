@@ -0,0 +1,518 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# This file is part of Ansible
+#
+# Ansible is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Ansible is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Ansible.  If not, see <http://www.gnu.org/licenses/>.
+
+DOCUMENTATION = '''
+---
+module: notification_dispatch
+version_added: "2.0"
+short_description: Send a notification to several services at once
+description:
+   - Sends a message to a list of targets spread over the services supported
+     by the M(slack), M(hipchat), M(flowdock), M(grove), M(campfire),
+     M(pushover), M(sendgrid), M(twilio) and M(typetalk) modules.
+   - Targets are sent concurrently. Connections are pooled and kept alive
+     per host, so targets on the same service share one TLS handshake.
+   - Requests answered with HTTP 429, 502, 503 or 504, or that could not
+     be sent because the connection failed, are retried with exponential
+     backoff. The Retry-After header is honoured when present, up to 60
+     seconds. Other errors are not retried, so a message the service may
+     already have processed is never sent twice.
+   - A pooled connection that the server closed while it was idle is
+     replaced once by a fresh connection before the request fails.
+options:
+  msg:
+    description:
+      - The message sent to every target that does not set its own C(msg).
+    required: true
+  targets:
+    description:
+      - List of targets. Each target is a dict with a C(service) key (one of
+        C(slack), C(hipchat), C(flowdock), C(grove), C(campfire),
+        C(pushover), C(sendgrid), C(twilio) or C(typetalk)) and the options
+        of the module of the same name, e.g. C(token) and C(channel) for
+        slack, or C(account_sid), C(auth_token), C(from_number) and
+        C(to_number) for twilio. A target may also set C(name), used to
+        identify it in the results.
+    required: true
+  parallel:
+    description:
+      - Maximum number of requests in flight at the same time.
+    required: false
+    default: 5
+  retries:
+    description:
+      - Number of times a request is retried after a 429, 502, 503 or 504
+        response or a failed connection attempt.
+    required: false
+    default: 3
+  retry_delay:
+    description:
+      - Initial delay in seconds before a retry, doubled for every
+        further attempt.
+    required: false
+    default: 1
+  timeout:
+    description:
+      - Timeout in seconds for every HTTP request.
+    required: false
+    default: 10
+  validate_certs:
+    description:
+      - If C(no), SSL certificates will not be validated. This should only be used
+        on personally controlled sites using self-signed certificates.
+    required: false
+    default: 'yes'
+    choices: ['yes', 'no']
+notes:
+   - Validating certificates requires Python 2.7.9 or later. On older
+     versions the module fails unless I(validate_certs) is C(no).
+author: "agent (@agent)"
+'''
+
+EXAMPLES = '''
+- local_action:
+    module: notification_dispatch
+    msg: "Deployed {{ app_version }} to production"
+    targets:
+      - service: slack
+        token: XXXX/YYYY/ZZZZ
+        channel: "#deploys"
+      - service: slack
+        token: XXXX/YYYY/ZZZZ
+        channel: "#ops"
+        color: good
+      - service: hipchat
+        token: 0123456789abcdef
+        room: Deploys
+      - service: twilio
+        account_sid: ACXXXXXXXXXXXXXXXXX
+        auth_token: ACXXXXXXXXXXXXXXXXX
+        from_number: "+15552014545"
+        to_number: "+15553035656"
+      - service: pushover
+        name: on-call phone
+        app_token: wxfdksl
+        user_key: baa5fe97f2c5ab3ca8f0bb59
+        msg: "{{ app_version }} is live"
+'''
+
+import base64
+import cgi
+import httplib
+import Queue
+import socket
+import ssl
+import threading
+import time
+import urllib
+import urlparse
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+AGENT = 'Ansible'
+RETRY_STATUSES = (429, 502, 503, 504)
+# longest Retry-After the module is willing to wait for, in seconds
+MAX_RETRY_AFTER = 60
+
+
+class RetryableError(Exception):
+    pass
+
+
+class ConnectionPool(object):
+    ''' keeps idle keep-alive connections per (scheme, host, port) '''
+
+    def __init__(self, timeout, validate_certs):
+        self.timeout = timeout
+        self.validate_certs = validate_certs
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def _connect(self, scheme, host, port):
+        if scheme == 'http':
+            return httplib.HTTPConnection(host, port, timeout=self.timeout)
+        if self.validate_certs:
+            return httplib.HTTPSConnection(host, port, timeout=self.timeout,
+                                           context=ssl.create_default_context())
+        if hasattr(ssl, '_create_unverified_context'):
+            return httplib.HTTPSConnection(host, port, timeout=self.timeout,
+                                           context=ssl._create_unverified_context())
+        # before Python 2.7.9 certificates are never validated
+        return httplib.HTTPSConnection(host, port, timeout=self.timeout)
+
+    def get(self, key):
+        ''' returns (connection, reused), reused is True for a connection taken from the pool '''
+        self.lock.acquire()
+        try:
+            if self.idle.get(key):
+                return self.idle[key].pop(), True
+        finally:
+            self.lock.release()
+        return self._connect(*key), False
+
+    def put(self, key, conn):
+        self.lock.acquire()
+        try:
+            self.idle.setdefault(key, []).append(conn)
+        finally:
+            self.lock.release()
+
+    def close(self):
+        for conns in self.idle.values():
+            for conn in conns:
+                conn.close()
+        self.idle = {}
+
+    def request(self, method, url, body=None, headers=None):
+        ''' send one request over a pooled connection, returns (status, headers, body) '''
+        parsed = urlparse.urlparse(url)
+        port = parsed.port or (parsed.scheme == 'http' and 80 or 443)
+        key = (parsed.scheme, parsed.hostname, port)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+
+        all_headers = {'User-Agent': AGENT}
+        all_headers.update(headers or {})
+
+        conn, reused = self.get(key)
+        while True:
+            if conn.sock is None:
+                try:
+                    conn.connect()
+                except (httplib.HTTPException, socket.error), e:
+                    conn.close()
+                    # nothing has been sent yet, so trying again cannot duplicate the message
+                    raise RetryableError(str(e))
+            try:
+                conn.request(method, path, body, all_headers)
+                response = conn.getresponse()
+                break
+            except (httplib.HTTPException, socket.error), e:
+                conn.close()
+                if not reused or not stale_connection_error(e):
+                    raise
+                # the server closed the idle connection before answering,
+                # send the request once more over a fresh one
+                conn, reused = self._connect(*key), False
+
+        try:
+            data = response.read()
+        except (httplib.HTTPException, socket.error):
+            conn.close()
+            raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.put(key, conn)
+        return response.status, dict(response.getheaders()), data
+
+
+def stale_connection_error(e):
+    ''' whether e is how a kept-alive connection closed by the server fails, before any response byte '''
+    if isinstance(e, httplib.BadStatusLine):
+        return not str(e.line).strip("'\"")
+    return isinstance(e, socket.error)
+
+
+def form(params):
+    return urllib.urlencode(params), {'Content-Type': 'application/x-www-form-urlencoded'}
+
+
+def basic_auth(user, password):
+    return 'Basic %s' % base64.b64encode('%s:%s' % (user, password))
+
+
+# Each builder returns the list of requests to send for one target, as
+# (method, url, body, headers) tuples, mirroring the module of the same name.
+
+def build_slack(pool, target, msg):
+    token = target['token']
+    if token.count('/') >= 2:
+        url = 'https://hooks.slack.com/services/%s' % token
+    elif target.get('domain'):
+        url = 'https://%s/services/hooks/incoming-webhook?token=%s' % (target['domain'], token)
+    else:
+        raise Exception("Slack has updated its webhook API. You need to specify a token of the form XXXX/YYYY/ZZZZ")
+
+    color = target.get('color', 'normal')
+    if color == 'normal':
+        payload = dict(text=msg)
+    else:
+        payload = dict(attachments=[dict(text=msg, color=color)])
+    channel = target.get('channel')
+    if channel:
+        if channel[0] not in ('#', '@'):
+            channel = '#' + channel
+        payload['channel'] = channel
+    payload['username'] = target.get('username', 'Ansible')
+    if target.get('icon_emoji'):
+        payload['icon_emoji'] = target['icon_emoji']
+    else:
+        payload['icon_url'] = target.get('icon_url', 'http://www.ansible.com/favicon.ico')
+    payload['link_names'] = target.get('link_names', 1)
+    if target.get('parse'):
+        payload['parse'] = target['parse']
+    body, headers = form({'payload': json.dumps(payload)})
+    return [('POST', url, body, headers)]
+
+
+def build_hipchat(pool, target, msg):
+    api = target.get('api', 'https://api.hipchat.com/v1')
+    room = str(target['room'])
+    color = target.get('color', 'yellow')
+    msg_format = target.get('msg_format', 'text')
+    notify = target.get('notify', True)
+    if api.find('/v2') != -1:
+        path = notify and '/room/%s/notification' or '/room/%s/message'
+        url = api + path % urllib.quote(room)
+        body = json.dumps(dict(message=msg, color=color, message_format=msg_format))
+        headers = {'Authorization': 'Bearer %s' % target['token'], 'Content-Type': 'application/json'}
+        return [('POST', url, body, headers)]
+
+    url = api + '/rooms/message?auth_token=%s' % target['token']
+    body, headers = form({'room_id': room,
+                          'from': target.get('msg_from', 'Ansible')[:15],
+                          'message': msg,
+                          'message_format': msg_format,
+                          'color': color,
+                          'notify': notify and 1 or 0})
+    return [('POST', url, body, headers)]
+
+
+def build_flowdock(pool, target, msg):
+    if target.get('type') == 'inbox':
+        url = 'https://api.flowdock.com/v1/messages/team_inbox/%s' % target['token']
+        keys = ['from_address', 'source', 'subject', 'from_name', 'reply_to', 'project', 'link', 'tags']
+    elif target.get('type') == 'chat':
+        url = 'https://api.flowdock.com/v1/messages/chat/%s' % target['token']
+        keys = ['external_user_name', 'tags']
+    else:
+        raise Exception("flowdock targets require a type of inbox or chat")
+    params = dict(content=msg)
+    for key in keys:
+        if target.get(key):
+            params[key] = target[key]
+    body, headers = form(params)
+    return [('POST', url, body, headers)]
+
+
+def build_grove(pool, target, msg):
+    params = dict(service=target.get('service_name', 'ansible'), message=msg)
+    for key in ['url', 'icon_url']:
+        if target.get(key):
+            params[key] = target[key]
+    body, headers = form(params)
+    return [('POST', 'https://grove.io/api/notice/%s/' % target['channel_token'], body, headers)]
+
+
+def build_campfire(pool, target, msg):
+    url = 'https://%s.campfirenow.com/room/%s/speak.xml' % (target['subscription'], target['room'])
+    headers = {'Content-Type': 'application/xml', 'Authorization': basic_auth(target['token'], 'X')}
+    requests = []
+    if target.get('notify'):
+        requests.append(('POST', url, '<message><type>SoundMessage</type><body>%s</body></message>' %
+                         cgi.escape(target['notify']), headers))
+    requests.append(('POST', url, '<message><body>%s</body></message>' % cgi.escape(msg), headers))
+    return requests
+
+
+def build_pushover(pool, target, msg):
+    body, headers = form({'user': target['user_key'],
+                          'token': target['app_token'],
+                          'priority': target.get('pri', 0),
+                          'message': msg})
+    return [('POST', 'https://api.pushover.net/1/messages.json', body, headers)]
+
+
+def build_sendgrid(pool, target, msg):
+    params = [('api_user', target['username']),
+              ('api_key', target['password']),
+              ('from', target['from_address']),
+              ('subject', target.get('subject', msg)),
+              ('text', target.get('body', msg))]
+    to_addresses = target['to_addresses']
+    if isinstance(to_addresses, basestring):
+        to_addresses = to_addresses.split(',')
+    for recipient in to_addresses:
+        if isinstance(recipient, unicode):
+            recipient = recipient.encode('utf-8')
+        params.append(('to[]', recipient.strip()))
+    body, headers = form(params)
+    headers['Accept'] = 'application/json'
+    return [('POST', 'https://api.sendgrid.com/api/mail.send.json', body, headers)]
+
+
+def build_twilio(pool, target, msg):
+    url = 'https://api.twilio.com/2010-04-01/Accounts/%s/Messages.json' % target['account_sid']
+    to_numbers = target['to_number']
+    if not isinstance(to_numbers, list):
+        to_numbers = [to_numbers]
+    requests = []
+    for number in to_numbers:
+        params = {'From': target['from_number'], 'To': number, 'Body': msg}
+        if target.get('media_url'):
+            params['MediaUrl'] = target['media_url']
+        body, headers = form(params)
+        headers['Accept'] = 'application/json'
+        headers['Authorization'] = basic_auth(target['account_sid'], target['auth_token'])
+        requests.append(('POST', url, body, headers))
+    return requests
+
+
+def build_typetalk(pool, target, msg):
+    body, headers = form({'client_id': target['client_id'],
+                          'client_secret': target['client_secret'],
+                          'grant_type': 'client_credentials',
+                          'scope': 'topic.post'})
+    status, response_headers, data = pool.request('POST', 'https://typetalk.in/oauth2/access_token',
+                                                  body, headers)
+    if status != 200:
+        raise Exception("unable to get a typetalk access token, return status=%s" % status)
+    body, headers = form({'message': msg})
+    headers['Authorization'] = 'Bearer %s' % json.loads(data)['access_token']
+    return [('POST', 'https://typetalk.in/api/v1/topics/%d' % int(target['topic']), body, headers)]
+
+
+BUILDERS = {
+    'slack': build_slack,
+    'hipchat': build_hipchat,
+    'flowdock': build_flowdock,
+    'grove': build_grove,
+    'campfire': build_campfire,
+    'pushover': build_pushover,
+    'sendgrid': build_sendgrid,
+    'twilio': build_twilio,
+    'typetalk': build_typetalk,
+}
+
+
+def send_with_retries(pool, request, retries, retry_delay):
+    method, url, body, headers = request
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            status, response_headers, data = pool.request(method, url, body, headers)
+            if status not in RETRY_STATUSES:
+                return status, attempt, None
+            error = 'HTTP %s' % status
+            delay = response_headers.get('retry-after')
+        except RetryableError, e:
+            status, error, delay = None, str(e), None
+        if attempt > retries:
+            return status, attempt, error
+        try:
+            delay = min(float(delay), MAX_RETRY_AFTER)
+        except (TypeError, ValueError):
+            delay = retry_delay * 2 ** (attempt - 1)
+        time.sleep(max(delay, 0))
+
+
+def dispatch(pool, targets, msg, parallel, retries, retry_delay):
+    pending = Queue.Queue()
+    for index, target in enumerate(targets):
+        pending.put((index, target))
+    results = [None] * len(targets)
+
+    def worker():
+        while True:
+            try:
+                index, target = pending.get_nowait()
+            except Queue.Empty:
+                return
+            result = dict(service=target.get('service'), name=target.get('name', index))
+            try:
+                requests = BUILDERS[target['service']](pool, target, target.get('msg', msg))
+                statuses = []
+                attempts = 0
+                for request in requests:
+                    status, tries, error = send_with_retries(pool, request, retries, retry_delay)
+                    statuses.append(status)
+                    attempts += tries
+                    if error or not (200 <= status < 300):
+                        result['failed'] = True
+                        result['msg'] = error or 'HTTP %s' % status
+                        break
+                result['status'] = statuses
+                result['attempts'] = attempts
+            except KeyError, e:
+                result['failed'] = True
+                result['msg'] = 'missing option %s' % e
+            except Exception, e:
+                result['failed'] = True
+                result['msg'] = str(e)
+            results[index] = result
+
+    threads = [threading.Thread(target=worker) for i in range(max(1, min(parallel, len(targets))))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    module = AnsibleModule(
+        argument_spec=dict(
+            msg=dict(required=True),
+            targets=dict(required=True, type='list', no_log=True),
+            parallel=dict(default=5, type='int'),
+            retries=dict(default=3, type='int'),
+            retry_delay=dict(default=1, type='int'),
+            timeout=dict(default=10, type='int'),
+            validate_certs=dict(default='yes', type='bool'),
+        ),
+        supports_check_mode=True
+    )
+
+    msg = module.params['msg']
+    targets = module.params['targets']
+
+    for target in targets:
+        if not isinstance(target, dict) or target.get('service') not in BUILDERS:
+            module.fail_json(msg="every target needs a service, one of: %s" % ', '.join(sorted(BUILDERS)))
+
+    if module.params['validate_certs'] and not hasattr(ssl, 'create_default_context'):
+        module.fail_json(msg="validating certificates requires Python 2.7.9 or later, "
+                             "set validate_certs=no to send without validation")
+
+    if module.check_mode:
+        module.exit_json(changed=False, targets=len(targets))
+
+    pool = ConnectionPool(module.params['timeout'], module.params['validate_certs'])
+    try:
+        results = dispatch(pool, targets, msg, module.params['parallel'],
+                           module.params['retries'], module.params['retry_delay'])
+    finally:
+        pool.close()
+
+    failed = [result for result in results if result.get('failed')]
+    if failed:
+        module.fail_json(msg="unable to notify %d of %d targets" % (len(failed), len(results)),
+                         results=results)
+
+    module.exit_json(changed=True, msg=msg, results=results)
+
+# import module snippets
+from ansible.module_utils.basic import *
+main()